@@ -165,3 +165,78 @@ CORS_ALLOW_HEADERS = [
     'x-csrftoken',  # 允许CSRF token头
     'x-requested-with',
 ]
+
+# ==================== 数据集存储配置 ====================
+# 列式存储根目录：每个数据集以 Parquet 分片文件保存在该目录下
+DATASET_STORAGE_ROOT = os.path.join(BASE_DIR, 'media', 'datasets')
+# 每个 Parquet 分片的行数
+DATASET_ROW_GROUP_SIZE = 50000
+# 分片内每个 Parquet 行组的行数，按行号分页读取时只解码覆盖的行组
+DATASET_PART_ROW_GROUP_ROWS = 5000
+# 是否同时写入 DataRecord 兼容行（供仍直接访问 data-records 接口的旧客户端使用）
+DATASET_KEEP_RECORDS = False
+
+# ==================== 文件导入配置 ====================
+# 流式导入文件时每个数据块的行数
+DATASET_INGEST_CHUNK_SIZE = 50000
+# 用于探测文件编码的文件头字节数
+DATASET_ENCODING_SNIFF_BYTES = 64 * 1024
+
+# ==================== 数据导出配置 ====================
+# 流式导出时每个数据块的行数
+DATASET_EXPORT_BATCH_ROWS = 10000
+
+# ==================== 数据浏览配置 ====================
+# 数据集数据接口（/datasets/<id>/data/）默认每页记录数和每页上限
+DATASET_DATA_PAGE_SIZE = 100
+DATASET_DATA_MAX_PAGE_SIZE = 1000
+
+# ==================== 外部数据库连接池配置 ====================
+# 每个数据库数据源（按连接配置区分）的连接池大小和允许超出的连接数，连接配置中的 pool_size/max_overflow 只能调小
+DATA_SOURCE_POOL_SIZE = 5
+DATA_SOURCE_POOL_MAX_OVERFLOW = 5
+# 等待空闲连接的超时时间（秒）
+DATA_SOURCE_POOL_TIMEOUT = 30
+# 连接使用超过该秒数后重建，应小于数据库端的空闲超时（例如 MySQL 的 wait_timeout）
+DATA_SOURCE_POOL_RECYCLE = 1800
+# 数据源引擎空闲超过该秒数后释放全部连接
+DATA_SOURCE_ENGINE_IDLE_TIMEOUT = 600
+# 进程内最多保留的数据源引擎数，超过时释放最久未使用的引擎
+DATA_SOURCE_MAX_ENGINES = 32
+
+# ==================== 处理流程执行配置 ====================
+# 执行模式：local 在Web进程内启动本地进程池；worker 只入队，由 run_pipeline_worker 命令执行；sync 在请求中直接执行
+PIPELINE_EXECUTION_MODE = 'local'
+# 本地进程池的工作进程数
+PIPELINE_WORKER_PROCESSES = 2
+# 执行中任务的租约时长（秒），执行进程超过该时间未刷新租约时任务被判定为失败
+PIPELINE_RUN_LEASE_SECONDS = 300
+# 下推过滤后输入超过该行数时按数据块流式执行，排序和聚合溢写到磁盘
+PIPELINE_OUT_OF_CORE_ROWS = 2000000
+# 流式执行时每个数据块的行数
+PIPELINE_CHUNK_ROWS = 200000
+# 外部排序每个有序段的行数
+PIPELINE_SORT_RUN_ROWS = 1000000
+# 含中位数等无法合并的聚合时，按分组键哈希分区的分区数
+PIPELINE_SPILL_PARTITIONS = 16
+# 溢写文件目录，None 表示使用系统临时目录
+PIPELINE_SPILL_DIR = None
+# 每个流程执行进程的分区执行工作进程数，0 表示 CPU 核数除以 PIPELINE_WORKER_PROCESSES，1 表示不启用分区执行
+PIPELINE_PARALLEL_WORKERS = 0
+# 分区执行进程池空闲超过该秒数后关闭工作进程
+PIPELINE_PARALLEL_IDLE_SECONDS = 60
+# 内存执行时数据达到该行数才按行分区并行执行
+PIPELINE_PARALLEL_MIN_ROWS = 200000
+# 时间提取转换的解析结果在进程内跨执行缓存的总行数，0 表示只在单次执行内缓存
+PIPELINE_DATETIME_CACHE_ROWS = 0
+
+# ==================== 可视化缓存配置 ====================
+# 图表数据缓存的内存预算（字节，按 JSON 大小估算），0 表示不缓存
+VISUALIZATION_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# 保存可视化时为柱状图、饼图和地图构建分组汇总，图表数据从汇总生成
+VISUALIZATION_ROLLUPS_ENABLED = True
+# 折线图（LTTB）和散点图（网格分箱）的点数预算，可视化配置的 maxPoints 只能调小
+VISUALIZATION_LINE_MAX_POINTS = 2000
+VISUALIZATION_SCATTER_MAX_POINTS = 5000
+# 看板批量获取图表数据时并发计算的线程数
+VISUALIZATION_DASHBOARD_WORKERS = 4
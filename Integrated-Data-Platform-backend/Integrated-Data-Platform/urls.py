@@ -7,7 +7,7 @@ from rest_framework.routers import DefaultRouter
 
 # 导入其他应用的视图集
 from datasets.views import DataSourceViewSet, DatasetViewSet, DataRecordViewSet
-from processing.views import ProcessingPipelineViewSet
+from processing.views import ProcessingPipelineViewSet, PipelineRunViewSet
 from visualization.views import ChartTypeViewSet, VisualizationViewSet, DashboardViewSet
 from users.views import UserRegistrationView, user_login, user_logout, UserProfileView, get_csrf_token
 
@@ -23,6 +23,7 @@ router.register(r'data-records', DataRecordViewSet, basename='data-record')  # 
 
 # 注册数据处理相关的视图集
 router.register(r'processing-pipelines', ProcessingPipelineViewSet, basename='processing-pipeline')  # 处理流水线
+router.register(r'pipeline-runs', PipelineRunViewSet, basename='pipeline-run')  # 处理流程执行任务
 
 # 注册可视化相关的视图集
 router.register(r'chart-types', ChartTypeViewSet, basename='chart-type')  # 图表类型管理
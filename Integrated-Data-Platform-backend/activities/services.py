@@ -99,10 +99,11 @@ class ActivityDataAggregator:
         """获取数据集相关活动 - 保持原有格式"""
         try:
             from datasets.models import Dataset  # 延迟导入避免循环依赖
+            from datasets.catalog import get_row_count
             since_date = timezone.now() - timedelta(days=days)
             datasets = Dataset.objects.filter(
                 created_at__gte=since_date
-            ).select_related('created_by', 'data_source')
+            ).select_related('created_by', 'data_source', 'statistics')
 
             activities = []
             for dataset in datasets:
@@ -122,7 +123,7 @@ class ActivityDataAggregator:
                     'timestamp': dataset.created_at,
                     'metadata': {
                         'data_source': dataset.data_source.name if dataset.data_source else '未知',
-                        'record_count': dataset.datarecord_set.count(),
+                        'record_count': get_row_count(dataset),
                         'data_type': dataset.data_type,
                         'source': 'direct_read'
                     }
@@ -1,3 +1,30 @@
 from django.test import TestCase
 
-# Create your tests here.
+from datasets.tests import QueryCountMixin, create_dataset
+from .models import AIModel, PredictionTask
+
+
+class AIListQueryTests(QueryCountMixin, TestCase):
+
+    def create_model(self):
+        user = self.make_user()
+        return AIModel.objects.create(
+            name=f'{user.username}-model', model_type='price_prediction',
+            training_data=create_dataset(user), created_by=user
+        )
+
+    def test_model_list(self):
+        def add_rows(count):
+            for _ in range(count):
+                self.create_model()
+
+        self.assertListQueries('/api/ai/models/', 1, add_rows)
+
+    def test_task_list(self):
+        def add_rows(count):
+            for _ in range(count):
+                PredictionTask.objects.create(
+                    name='task', task_type='batch_prediction', ai_model=self.create_model(), created_by=self.make_user()
+                )
+
+        self.assertListQueries('/api/ai/tasks/', 1, add_rows)
@@ -10,7 +10,9 @@ from .serializers import (
     AIModelSerializer, PredictionTaskSerializer,
     TrainingRequestSerializer, PredictionRequestSerializer
 )
-from datasets.models import Dataset, DataRecord
+from datasets.models import Dataset
+from datasets.catalog import get_column_names, get_row_count
+from datasets.storage import DatasetStore
 from datasets.serializers import DatasetSerializer
 from activities.utils import create_ai_model_activity
 import logging
@@ -34,7 +36,7 @@ class AIModelViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         # 所有认证用户都可以看到所有AI模型
-        return AIModel.objects.all()
+        return AIModel.objects.select_related('training_data', 'created_by')
 
     def perform_create(self, serializer):
         ai_model = serializer.save(created_by=self.request.user)
@@ -51,14 +53,16 @@ class AIModelViewSet(viewsets.ModelViewSet):
         """获取可用于AI训练的数据集列表"""
         try:
             # 只返回用户有权限访问的数据集
-            datasets = Dataset.objects.filter(created_by=request.user)
-            print(f"找到的数据集数量: {datasets.count()}")
+            datasets = list(Dataset.objects.filter(created_by=request.user).select_related(
+                'created_by', 'data_source', 'statistics'
+            ))
+            print(f"找到的数据集数量: {len(datasets)}")
 
             serializer = DatasetSerializer(datasets, many=True)
             response_data = {
                 'success': True,
                 'data': serializer.data,
-                'count': datasets.count()
+                'count': len(datasets)
             }
             print(f"返回的数据: {response_data}")
             return Response(response_data)
@@ -99,7 +103,7 @@ class AIModelViewSet(viewsets.ModelViewSet):
                 'success': True,
                 'columns': columns,
                 'dataset_name': dataset.name,
-                'record_count': dataset.datarecord_set.count()
+                'record_count': get_row_count(dataset)
             })
 
         except Exception as e:
@@ -139,7 +143,7 @@ class AIModelViewSet(viewsets.ModelViewSet):
                 'success': True,
                 'columns': columns,
                 'dataset_name': dataset.name,
-                'record_count': dataset.datarecord_set.count()
+                'record_count': get_row_count(dataset)
             })
 
         except Exception as e:
@@ -152,15 +156,10 @@ class AIModelViewSet(viewsets.ModelViewSet):
     def _get_dataset_columns(self, dataset):
         """从数据集中提取列名"""
         try:
-            # 方法1: 从数据记录中提取列名
-            records = DataRecord.objects.filter(dataset=dataset)[:10]  # 取前10条记录
-            if records:
-                all_columns = set()
-                for record in records:
-                    if record.data:
-                        all_columns.update(record.data.keys())
-                columns = list(all_columns)
-                print(f"从记录中提取的列名: {columns}")  # 调试信息
+            # 方法1: 从数据集统计信息目录中获取列名
+            columns = get_column_names(dataset)
+            if columns:
+                print(f"从数据集统计信息获取的列名: {columns}")  # 调试信息
                 return columns
 
             # 方法2: 如果数据集有预定义的列信息
@@ -198,16 +197,12 @@ class AIModelViewSet(viewsets.ModelViewSet):
                 }, status=status.HTTP_404_NOT_FOUND)
 
             # 获取前20条记录作为预览
-            records = DataRecord.objects.filter(dataset=dataset)[:20]
-            preview_data = []
-
-            for record in records:
-                preview_data.append(record.data)
+            preview_data = DatasetStore.read_records(dataset, limit=20)
 
             return Response({
                 'success': True,
                 'data': preview_data,
-                'total_records': dataset.datarecord_set.count(),
+                'total_records': get_row_count(dataset),
                 'dataset_name': dataset.name
             })
 
@@ -433,7 +428,7 @@ class PredictionTaskViewSet(viewsets.ReadOnlyModelViewSet):
 
     def get_queryset(self):
         # 所有认证用户都可以看到所有预测任务
-        return PredictionTask.objects.all()
+        return PredictionTask.objects.select_related('ai_model', 'created_by')
 
 
 # 确保这些函数存在
@@ -9,6 +9,7 @@ required_packages = [
     'corsheaders',
     'pandas',
     'numpy',
+    'pyarrow',
     'sklearn',
     'joblib',
     'sqlalchemy',
@@ -8,3 +8,5 @@ from .models import *
 admin.site.register(DataSource)
 admin.site.register(Dataset)
 admin.site.register(DataRecord)
+admin.site.register(DatasetChange)
+admin.site.register(DatasetStatistics)
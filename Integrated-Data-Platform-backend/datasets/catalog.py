@@ -0,0 +1,297 @@
+# Copyright (c) 2025 YycKop
+# MIT License
+# Integrated-Data-Platform-backend/datasets/catalog.py
+"""
+数据集结构和统计信息目录
+
+每次写入数据（导入、追加、替换、流程输出）提交后计算数据集的行数和各列的
+类型、空值数、最小值、最大值和去重计数，保存在 DatasetStatistics 中。
+列名、行数等信息由各接口直接从目录读取，不再抽样记录或逐次 COUNT(*)。
+
+去重计数用 HyperLogLog 草图估算（相对误差约 2%），草图可以合并：
+自上次统计以来的变更都是列式存储上的追加且已有列的类型未变时，只统计新增的分片
+并与原统计合并；否则重新统计全部数据。旧存储格式（DataRecord）只能整体重新统计，
+单条记录的增删改和追加只递增内容版本使目录过期，由统计信息接口在下一次请求时重新统计。
+
+列表等读取接口只使用与内容版本一致的目录，目录过期或尚未统计时改为读取存储清单中的
+行数和列名（旧存储格式按内容版本缓存 COUNT(*)），不在请求中重新统计；
+尚未统计的旧数据集用 refresh_dataset_statistics 命令补全。
+"""
+import base64
+import logging
+import math
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from .models import DatasetChange, DatasetStatistics
+from .storage import ARROW_TYPES, DatasetStore, column_to_arrow, get_new_parts
+
+logger = logging.getLogger(__name__)
+
+# HyperLogLog 寄存器数为 2^SKETCH_PRECISION
+SKETCH_PRECISION = 11
+SKETCH_REGISTERS = 1 << SKETCH_PRECISION
+
+
+def _bit_length(values):
+    """uint64 数组各元素的二进制位数（按高低 32 位分别计算，避免浮点取对数的舍入误差）"""
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    with np.errstate(divide='ignore'):
+        high_bits = np.where(high > 0, np.floor(np.log2(high)) + 33, 0)
+        low_bits = np.where(low > 0, np.floor(np.log2(low)) + 1, 0)
+    return np.where(high > 0, high_bits, low_bits).astype(np.int64)
+
+
+def build_sketch(values):
+    """非空值数组的 HyperLogLog 寄存器"""
+    registers = np.zeros(SKETCH_REGISTERS, dtype=np.uint8)
+    if len(values) == 0:
+        return registers
+    hashes = pd.util.hash_array(np.asarray(values))
+    index = (hashes >> np.uint64(64 - SKETCH_PRECISION)).astype(np.int64)
+    # 剩余位左移到高位，末尾补一位保证排名有上界
+    rest = (hashes << np.uint64(SKETCH_PRECISION)) | np.uint64(1 << (SKETCH_PRECISION - 1))
+    rank = (65 - _bit_length(rest)).astype(np.uint8)
+    np.maximum.at(registers, index, rank)
+    return registers
+
+
+def estimate_distinct(registers):
+    """由寄存器估算去重计数，基数较小时使用线性计数修正"""
+    m = float(SKETCH_REGISTERS)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / float(np.sum(np.power(2.0, -registers.astype(np.float64))))
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * math.log(m / zeros)
+    return int(round(estimate))
+
+
+def _encode_sketch(registers):
+    return base64.b64encode(registers.tobytes()).decode('ascii')
+
+
+def _decode_sketch(sketch):
+    if not sketch:
+        return np.zeros(SKETCH_REGISTERS, dtype=np.uint8)
+    return np.frombuffer(base64.b64decode(sketch), dtype=np.uint8).copy()
+
+
+def _json_value(value):
+    """最小值/最大值转换为可以保存为 JSON 的值，非有限浮点数记为空"""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def column_statistics(array, type_name):
+    """一列（Arrow 数组）的统计：{'type', 'null_count', 'min', 'max', 'registers'}"""
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+    minimum = maximum = None
+    if type_name != 'null' and array.null_count < len(array):
+        result = pc.min_max(array)
+        minimum, maximum = _json_value(result['min'].as_py()), _json_value(result['max'].as_py())
+    values = array.drop_null().to_numpy(zero_copy_only=False) if type_name != 'null' else []
+    return {
+        'type': type_name,
+        'null_count': array.null_count if type_name != 'null' else len(array),
+        'min': minimum,
+        'max': maximum,
+        'registers': build_sketch(values),
+    }
+
+
+def _merge_bound(current, incoming, pick):
+    if current is None:
+        return incoming
+    if incoming is None:
+        return current
+    return pick(current, incoming)
+
+
+def merge_statistics(segments, columns):
+    """
+    合并多段数据的统计，segments 为 [(行数, {列名: 统计})]
+
+    某段中没有的列（例如之后追加的数据新增的列）按该段全部为空值计算。
+    """
+    merged = {}
+    for name, type_name in columns:
+        result = {'type': type_name, 'null_count': 0, 'min': None, 'max': None,
+                  'registers': np.zeros(SKETCH_REGISTERS, dtype=np.uint8)}
+        for rows, stats in segments:
+            column = stats.get(name)
+            if column is None:
+                result['null_count'] += rows
+                continue
+            result['null_count'] += column['null_count']
+            result['min'] = _merge_bound(result['min'], column['min'], min)
+            result['max'] = _merge_bound(result['max'], column['max'], max)
+            np.maximum(result['registers'], column['registers'], out=result['registers'])
+        merged[name] = result
+    return merged
+
+
+def _part_statistics(dataset, part, types):
+    """列式存储的一个分片的统计"""
+    table = pq.read_table(os.path.join(DatasetStore.get_storage_dir(dataset), part['file']))
+    stats = {}
+    for name in table.column_names:
+        if name in types:
+            column = table.column(name).cast(ARROW_TYPES[types[name]])
+            stats[name] = column_statistics(column, types[name])
+    return part['rows'], stats
+
+
+def _legacy_statistics(dataset):
+    """旧存储格式：读取全部记录统计，类型按写入列式存储时的规则推断"""
+    df = DatasetStore.read_dataframe(dataset)
+    stats, columns = {}, []
+    for name in df.columns:
+        type_name, array = column_to_arrow(df[name])
+        stats[str(name)] = column_statistics(array, type_name)
+        columns.append((str(name), type_name))
+    return len(df), stats, columns
+
+
+def _stored_segment(statistics):
+    stats = {
+        column['name']: dict(column, registers=_decode_sketch(column.get('sketch')))
+        for column in statistics.columns
+    }
+    return statistics.row_count, stats
+
+
+def _can_refresh_incrementally(statistics, dataset, manifest):
+    """自上次统计以来的变更是否都是对同一份列式数据的追加，且已统计的列类型未变"""
+    if manifest is None or statistics.parts is None:
+        return False
+    types = {column['name']: column['type'] for column in manifest['columns']}
+    if any(types.get(column['name']) != column['type'] for column in statistics.columns):
+        return False
+    operations = list(DatasetChange.objects.filter(
+        dataset=dataset, version__gt=statistics.content_version, version__lte=dataset.content_version
+    ).values_list('operation', flat=True))
+    if len(operations) != dataset.content_version - statistics.content_version:
+        return False
+    return all(operation == 'append' for operation in operations) \
+        and get_new_parts(manifest, statistics.parts) is not None
+
+
+def refresh_statistics(dataset):
+    """统计（或增量更新）数据集的目录信息并保存，返回 DatasetStatistics"""
+    statistics = DatasetStatistics.objects.filter(dataset=dataset).first()
+    manifest = DatasetStore.load_manifest(dataset)
+
+    if manifest is None:
+        row_count, stats, columns = _legacy_statistics(dataset)
+        merged = merge_statistics([(row_count, stats)], columns)
+        parts = None
+    else:
+        types = {column['name']: column['type'] for column in manifest['columns']}
+        columns = [(column['name'], column['type']) for column in manifest['columns']]
+        if statistics is not None and _can_refresh_incrementally(statistics, dataset, manifest):
+            segments = [_stored_segment(statistics)]
+            segments += [_part_statistics(dataset, part, types)
+                         for part in get_new_parts(manifest, statistics.parts)]
+        else:
+            segments = [_part_statistics(dataset, part, types) for part in manifest['parts']]
+        merged = merge_statistics(segments, columns)
+        row_count = manifest['row_count']
+        parts = [part['file'] for part in manifest['parts']]
+
+    column_entries = [
+        {
+            'name': name,
+            'type': stats['type'],
+            'null_count': int(stats['null_count']),
+            'min': stats['min'],
+            'max': stats['max'],
+            'distinct_count': min(estimate_distinct(stats['registers']), int(row_count - stats['null_count'])),
+            'sketch': _encode_sketch(stats['registers']),
+        }
+        for name, stats in merged.items()
+    ]
+    statistics, _ = DatasetStatistics.objects.update_or_create(
+        dataset=dataset,
+        defaults={
+            'content_version': dataset.content_version,
+            'row_count': row_count,
+            'columns': column_entries,
+            'parts': parts,
+        }
+    )
+    dataset.statistics = statistics
+    return statistics
+
+
+def update_statistics(dataset):
+    """写入数据后更新目录，统计失败只记录日志，不影响写入"""
+    try:
+        return refresh_statistics(dataset)
+    except Exception as e:
+        logger.warning(f"数据集 {dataset.pk} 的统计信息更新失败: {str(e)}")
+        return None
+
+
+def get_current_statistics(dataset):
+    """已保存且与内容版本一致的目录信息，过期或尚未统计时返回 None（不重新统计）"""
+    try:
+        statistics = dataset.statistics
+    except DatasetStatistics.DoesNotExist:
+        return None
+    if statistics.content_version != dataset.content_version:
+        return None
+    return statistics
+
+
+def get_statistics(dataset):
+    """
+    返回数据集最新的目录信息，尚未统计或内容版本已变化时先统计；统计失败时返回 None
+
+    只用于单个数据集的统计信息接口，列表等读取路径使用 get_row_count / get_column_names。
+    """
+    statistics = get_current_statistics(dataset)
+    if statistics is not None:
+        return statistics
+    return update_statistics(dataset)
+
+
+def get_column_names(dataset):
+    """数据集列名：目录过期时列式存储读取清单，旧数据集优先取 data_structure 中记录的字段，不逐个抽样记录"""
+    statistics = get_current_statistics(dataset)
+    if statistics is not None:
+        return [column['name'] for column in statistics.columns]
+    if not DatasetStore.is_columnar(dataset):
+        fields = (dataset.data_structure or {}).get('fields')
+        if isinstance(fields, list) and fields:
+            return [str(field) for field in fields]
+    return DatasetStore.get_columns(dataset)
+
+
+def get_row_count(dataset):
+    """数据集行数"""
+    statistics = get_current_statistics(dataset)
+    if statistics is None:
+        return DatasetStore.count_rows(dataset)
+    return statistics.row_count
+
+
+def describe_statistics(statistics):
+    """目录信息的接口输出（不含去重计数草图）"""
+    return {
+        'content_version': statistics.content_version,
+        'row_count': statistics.row_count,
+        'columns': [
+            {key: value for key, value in column.items() if key != 'sketch'}
+            for column in statistics.columns
+        ],
+        'computed_at': statistics.computed_at,
+    }
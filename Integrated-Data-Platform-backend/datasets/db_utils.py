@@ -1,15 +1,149 @@
 # Copyright (c) 2025 YycKop
 # MIT License
 # Integrated-Data-Platform-backend/datasets/db_utils.py
+import collections
+import hashlib
+import json
+import os
+import threading
+import time
+
 import pandas as pd
 import sqlalchemy as sa
 from sqlalchemy import create_engine, text, inspect
+from sqlalchemy.pool import QueuePool
+from django.conf import settings
 from django.utils import timezone
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def get_pool_settings():
+    """外部数据库连接池配置"""
+    return {
+        'pool_size': int(getattr(settings, 'DATA_SOURCE_POOL_SIZE', 5)),
+        'max_overflow': int(getattr(settings, 'DATA_SOURCE_POOL_MAX_OVERFLOW', 5)),
+        'pool_timeout': int(getattr(settings, 'DATA_SOURCE_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(getattr(settings, 'DATA_SOURCE_POOL_RECYCLE', 1800)),
+    }
+
+
+def get_engine_idle_timeout():
+    """引擎空闲多少秒后释放其全部连接"""
+    return int(getattr(settings, 'DATA_SOURCE_ENGINE_IDLE_TIMEOUT', 600))
+
+
+def get_max_engines():
+    return max(int(getattr(settings, 'DATA_SOURCE_MAX_ENGINES', 32)), 1)
+
+
+def get_config_key(connection_config):
+    """连接配置的哈希，作为引擎的键（不在日志等处暴露密码）"""
+    payload = json.dumps(connection_config or {}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def get_server_config(connection_config):
+    """列出数据库时使用的连接配置：连接同一服务器上的 mysql 系统库"""
+    server_config = dict(connection_config or {})
+    server_config['database'] = 'mysql'
+    return server_config
+
+
+class EngineRegistry:
+    """
+    进程内的外部数据库引擎注册表，按连接配置缓存 SQLAlchemy 引擎，线程安全
+
+    每个连接配置对应一个引擎和一个有上限的连接池（pool_size + max_overflow，
+    连接配置中的 pool_size/max_overflow 只能调小全局配置）：
+    - 取出连接时先 ping（pool_pre_ping），失效的连接自动重连；
+    - 连接使用超过 pool_recycle 秒后重建，避免被数据库端的超时断开；
+    - 引擎空闲超过 DATA_SOURCE_ENGINE_IDLE_TIMEOUT 秒、或引擎数超过 DATA_SOURCE_MAX_ENGINES 时
+      按最久未使用释放；
+    - 数据源的连接配置修改或数据源删除时释放旧配置的引擎，以及按旧配置列出数据库时
+      使用的服务器级引擎（见 signals.py）。
+    fork 出的子进程不复用父进程的连接，首次使用时丢弃继承来的引擎。
+    """
+
+    def __init__(self):
+        self._engines = collections.OrderedDict()  # 配置哈希 -> [引擎, 最近使用时间]
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _create_engine(self, connection_config):
+        connection_string = DatabaseConnector.get_connection_string(connection_config)
+        options = {'pool_pre_ping': True}
+        if connection_config.get('db_type', '').lower() in ('mysql', 'postgresql'):
+            pool = get_pool_settings()
+            for name in ('pool_size', 'max_overflow'):
+                try:
+                    requested = int(connection_config.get(name))
+                except (TypeError, ValueError):
+                    continue
+                if requested >= 0:
+                    pool[name] = min(pool[name], requested)
+            pool['pool_size'] = max(pool['pool_size'], 1)
+            options.update(pool, poolclass=QueuePool)
+        return create_engine(connection_string, **options)
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            for engine, _ in self._engines.values():
+                engine.dispose(close=False)
+            self._engines.clear()
+            self._pid = os.getpid()
+
+    def _evict_idle(self, now):
+        timeout = get_engine_idle_timeout()
+        stale = [key for key, (_, last_used) in self._engines.items() if now - last_used > timeout]
+        while len(self._engines) - len(stale) > get_max_engines():
+            key = next(key for key in self._engines if key not in stale)
+            stale.append(key)
+        return [self._engines.pop(key)[0] for key in stale]
+
+    def get_engine(self, connection_config):
+        """返回连接配置对应的引擎，不存在时创建"""
+        key = get_config_key(connection_config)
+        now = time.monotonic()
+        with self._lock:
+            self._check_fork()
+            entry = self._engines.get(key)
+            if entry is None:
+                entry = [self._create_engine(connection_config), now]
+                self._engines[key] = entry
+                logger.info(f"创建外部数据库引擎 {connection_config.get('db_type')}://"
+                            f"{connection_config.get('host', '')}/{connection_config.get('database', '')}")
+            entry[1] = now
+            self._engines.move_to_end(key)
+            released = self._evict_idle(now)
+        for engine in released:
+            engine.dispose()
+        return entry[0]
+
+    def invalidate(self, connection_config):
+        """释放连接配置对应的引擎及其连接，包括由该配置派生的服务器级引擎（get_server_config）"""
+        keys = {get_config_key(connection_config), get_config_key(get_server_config(connection_config))}
+        with self._lock:
+            entries = [self._engines.pop(key, None) for key in keys]
+        for entry in entries:
+            if entry is not None:
+                entry[0].dispose()
+
+    def clear(self):
+        with self._lock:
+            engines = [engine for engine, _ in self._engines.values()]
+            self._engines.clear()
+        for engine in engines:
+            engine.dispose()
+
+    def __len__(self):
+        return len(self._engines)
+
+
+engine_registry = EngineRegistry()
+
+
 class DatabaseConnector:
     """数据库连接器"""
 
@@ -18,17 +152,11 @@ class DatabaseConnector:
         """获取所有数据库列表"""
         try:
             # 先连接到默认数据库（如 mysql）来获取数据库列表
-            temp_config = connection_config.copy()
-            temp_config['database'] = 'mysql'  # 或者 'information_schema'
-
-            connection_string = DatabaseConnector.get_connection_string(temp_config)
-            engine = create_engine(connection_string)
+            engine = engine_registry.get_engine(get_server_config(connection_config))
 
             with engine.connect() as conn:
                 result = conn.execute(text("SHOW DATABASES"))
                 databases = [row[0] for row in result]
-
-            engine.dispose()
             return True, databases
 
         except Exception as e:
@@ -67,14 +195,11 @@ class DatabaseConnector:
     def test_connection(connection_config):
         """测试数据库连接"""
         try:
-            connection_string = DatabaseConnector.get_connection_string(connection_config)
-            engine = create_engine(connection_string)
+            engine = engine_registry.get_engine(connection_config)
 
             with engine.connect() as conn:
                 # 执行简单查询测试连接
                 conn.execute(text("SELECT 1"))
-
-            engine.dispose()
             return True, "连接测试成功"
 
         except Exception as e:
@@ -85,14 +210,11 @@ class DatabaseConnector:
     def get_tables(connection_config):
         """获取数据库中的所有表"""
         try:
-            connection_string = DatabaseConnector.get_connection_string(connection_config)
-            engine = create_engine(connection_string)
+            engine = engine_registry.get_engine(connection_config)
 
             # 使用SQLAlchemy的inspect功能获取表信息
             inspector = inspect(engine)
             tables = inspector.get_table_names()
-
-            engine.dispose()
             return True, tables
 
         except Exception as e:
@@ -103,8 +225,7 @@ class DatabaseConnector:
     def get_table_schema(connection_config, table_name):
         """获取表结构信息"""
         try:
-            connection_string = DatabaseConnector.get_connection_string(connection_config)
-            engine = create_engine(connection_string)
+            engine = engine_registry.get_engine(connection_config)
 
             inspector = inspect(engine)
             columns = inspector.get_columns(table_name)
@@ -117,8 +238,6 @@ class DatabaseConnector:
                     'nullable': column.get('nullable', True),
                     'primary_key': column.get('primary_key', False)
                 })
-
-            engine.dispose()
             return True, schema_info
 
         except Exception as e:
@@ -129,8 +248,7 @@ class DatabaseConnector:
     def get_table_preview(connection_config, table_name, limit=10):
         """获取表数据预览"""
         try:
-            connection_string = DatabaseConnector.get_connection_string(connection_config)
-            engine = create_engine(connection_string)
+            engine = engine_registry.get_engine(connection_config)
 
             # 使用pandas读取数据
             if connection_config.get('db_type') == 'mysql':
@@ -140,8 +258,6 @@ class DatabaseConnector:
 
             df = pd.read_sql(query, engine)
 
-            engine.dispose()
-
             # 转换为字典格式
             data = df.to_dict('records')
             columns = df.columns.tolist()
@@ -161,8 +277,7 @@ class DatabaseConnector:
     def get_table_row_count(connection_config, table_name):
         """获取表的行数"""
         try:
-            connection_string = DatabaseConnector.get_connection_string(connection_config)
-            engine = create_engine(connection_string)
+            engine = engine_registry.get_engine(connection_config)
 
             if connection_config.get('db_type') == 'mysql':
                 query = f"SELECT COUNT(*) as count FROM `{table_name}`"
@@ -172,8 +287,6 @@ class DatabaseConnector:
             with engine.connect() as conn:
                 result = conn.execute(text(query))
                 count = result.scalar()
-
-            engine.dispose()
             return True, count
 
         except Exception as e:
@@ -182,53 +295,58 @@ class DatabaseConnector:
 
     @staticmethod
     def import_table_data(connection_config, table_name, dataset_name, user, data_source):
-        """导入表数据到数据集"""
-        from .models import Dataset, DataRecord
+        """
+        导入表数据到数据集
 
+        通过服务端游标（stream_results，MySQL 为 SSCursor，PostgreSQL 为命名游标）按块读取查询结果，
+        每块按列规范化后直接写入数据集存储，内存占用只与块大小有关，与表的大小无关。
+        """
+        from .ingest import IngestProgress, get_ingest_chunk_size, normalize_frame
+        from .models import Dataset
+        from .storage import DatasetStore
+
+        dataset = None
         try:
-            connection_string = DatabaseConnector.get_connection_string(connection_config)
-            engine = create_engine(connection_string)
+            engine = engine_registry.get_engine(connection_config)
+            chunk_size = get_ingest_chunk_size()
 
-            # 读取整个表
             if connection_config.get('db_type') == 'mysql':
                 query = f"SELECT * FROM `{table_name}`"
             else:
                 query = f'SELECT * FROM "{table_name}"'
 
-            df = pd.read_sql(query, engine)
-            engine.dispose()
-
-            print(f"读取到 {len(df)} 条记录")  # 调试信息
-
-            # 创建数据集
-            dataset = Dataset.objects.create(
-                name=dataset_name,
-                data_source=data_source,  # 使用传入的 data_source 对象
-                data_type='database',
-                description=f'从数据库表 {table_name} 导入的数据，共 {len(df)} 条记录',
-                data_structure={'fields': df.columns.tolist()},
-                created_by=user
+            with engine.connect() as conn:
+                # 服务端游标逐块取回结果，客户端最多缓存一块的行数
+                conn = conn.execution_options(stream_results=True, max_row_buffer=chunk_size)
+                chunks = pd.read_sql(text(query), conn, chunksize=chunk_size)
+                # 空表也会产出一个只有列名的数据块
+                first_chunk = next(chunks, None)
+                if first_chunk is None:
+                    first_chunk = pd.DataFrame()
+
+                # 创建数据集，记录数在写入完成后补充到描述中
+                dataset = Dataset.objects.create(
+                    name=dataset_name,
+                    data_source=data_source,  # 使用传入的 data_source 对象
+                    data_type='database',
+                    description=f'从数据库表 {table_name} 导入的数据',
+                    data_structure={'fields': [str(column) for column in first_chunk.columns]},
+                    created_by=user
+                )
+
+                progress = IngestProgress(dataset.name)
+                with DatasetStore.open_writer(dataset) as writer:
+                    writer.write_frame(normalize_frame(first_chunk))
+                    progress.add(len(first_chunk))
+                    for chunk in chunks:
+                        writer.write_frame(normalize_frame(chunk))
+                        progress.add(len(chunk))
+                    records_created = writer.commit()
+
+            Dataset.objects.filter(pk=dataset.pk).update(
+                description=f'从数据库表 {table_name} 导入的数据，共 {records_created} 条记录'
             )
-
-            # 分批创建数据记录以避免内存问题
-            batch_size = 100
-            records_created = 0
-
-            for i in range(0, len(df), batch_size):
-                batch = df.iloc[i:i + batch_size]
-                records = []
-
-                for _, row in batch.iterrows():
-                    records.append(DataRecord(
-                        dataset=dataset,
-                        data=row.to_dict()
-                    ))
-
-                DataRecord.objects.bulk_create(records)
-                records_created += len(records)
-
-                # 记录进度
-                print(f"已导入 {records_created} 条记录")
+            logger.info(f"数据表 {table_name} 导入完成: {records_created} 条记录，{progress.summary()}")
 
             return True, f"成功导入 {records_created} 条记录", dataset.id
 
@@ -236,21 +354,22 @@ class DatabaseConnector:
             print(f"导入表数据失败: {str(e)}")
             import traceback
             print(f"错误堆栈: {traceback.format_exc()}")
+            if dataset is not None:
+                # 读取中途失败时不保留不完整的数据集
+                dataset.delete()
             return False, f"导入数据失败: {str(e)}", None
 
     @staticmethod
     def execute_query(connection_config, query, limit=100):
         """执行自定义查询"""
         try:
-            connection_string = DatabaseConnector.get_connection_string(connection_config)
-            engine = create_engine(connection_string)
+            engine = engine_registry.get_engine(connection_config)
 
             # 添加LIMIT子句（如果查询中没有）
             if 'LIMIT' not in query.upper():
                 query += f" LIMIT {limit}"
 
             df = pd.read_sql(query, engine)
-            engine.dispose()
 
             data = df.to_dict('records')
             columns = df.columns.tolist()
@@ -0,0 +1,244 @@
+# Copyright (c) 2025 YycKop
+# MIT License
+# Integrated-Data-Platform-backend/datasets/export.py
+"""
+数据集流式导出
+
+按数据块读取数据集并逐块编码输出，内存占用只与块大小有关，与数据集大小无关：
+- 列式存储按 Arrow 记录批读取（DatasetStore.iter_record_batches），只读取覆盖导出区间的分片；
+- 旧的记录存储用 DataRecord 查询的 iterator(chunk_size=...) 分块读取。
+列取自数据集的结构信息（列式存储的清单，旧数据集的 data_structure 字段或记录中的键），不再预先扫描全部数据。
+
+支持 CSV、NDJSON、JSON 和 Parquet 格式，CSV/NDJSON/JSON 可以再用 gzip 压缩。
+"""
+import csv
+import io
+import json
+import zlib
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from django.conf import settings
+
+from .storage import DatasetStore, _is_null, _stringify
+
+# 导出格式 -> (Content-Type, 文件扩展名)
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson; charset=utf-8', 'ndjson'),
+    'json': ('application/json; charset=utf-8', 'json'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+# Parquet 本身已经压缩，不再套用 gzip
+GZIP_FORMATS = ('csv', 'ndjson', 'json')
+
+
+def get_export_batch_rows():
+    """导出时每个数据块的行数"""
+    return int(getattr(settings, 'DATASET_EXPORT_BATCH_ROWS', 10000))
+
+
+def parse_export_format(export_format, compression=None):
+    """
+    解析导出格式，返回 (格式, 是否 gzip 压缩)
+
+    格式后缀 .gz（例如 csv.gz）与 compression=gzip 等价；不支持的格式抛出 ValueError。
+    """
+    export_format = (export_format or 'csv').lower()
+    use_gzip = (compression or '').lower() in ('gzip', 'gz')
+    if export_format.endswith('.gz'):
+        export_format, use_gzip = export_format[:-3], True
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f'不支持的导出格式: {export_format}，可选: {", ".join(EXPORT_FORMATS)}')
+    if use_gzip and export_format not in GZIP_FORMATS:
+        raise ValueError(f'{export_format} 格式不支持 gzip 压缩')
+    return export_format, use_gzip
+
+
+def get_export_columns(dataset):
+    """导出的列：列式存储取清单中的列，旧数据集优先取 data_structure 中记录的字段"""
+    if DatasetStore.is_columnar(dataset):
+        return DatasetStore.get_columns(dataset)
+    fields = (dataset.data_structure or {}).get('fields')
+    if isinstance(fields, list) and fields:
+        return [str(field) for field in fields]
+    return DatasetStore.get_columns(dataset)
+
+
+def _iter_legacy_rows(dataset, offset, limit, batch_size):
+    """分块读取旧记录存储的记录字典，{'RECORDS': [...]} 形式的记录展开为多行"""
+    from .models import DataRecord
+
+    queryset = DataRecord.objects.filter(dataset=dataset).order_by('id').values_list('data', flat=True)
+    queryset = queryset[offset:offset + limit] if limit is not None else queryset[offset:]
+    chunk = []
+    for data in queryset.iterator(chunk_size=batch_size):
+        if isinstance(data, dict) and 'RECORDS' in data:
+            records = data['RECORDS'] if isinstance(data['RECORDS'], list) else [data['RECORDS']]
+            chunk.extend(record for record in records if isinstance(record, dict))
+        elif isinstance(data, dict):
+            chunk.append(data)
+        if len(chunk) >= batch_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_chunks(dataset, offset=0, limit=None, batch_size=None):
+    """逐块产出导出区间内的数据：列式存储为 pyarrow.Table，旧记录存储为记录字典列表"""
+    batch_size = batch_size or get_export_batch_rows()
+    if DatasetStore.is_columnar(dataset):
+        yield from DatasetStore.iter_record_batches(dataset, offset=offset, limit=limit, batch_size=batch_size)
+    else:
+        yield from _iter_legacy_rows(dataset, offset, limit, batch_size)
+
+
+_json_encoder = json.JSONEncoder(ensure_ascii=False, default=str)
+
+
+def _encode_rows(chunk, columns):
+    """数据块中各行编码为 JSON 文本；列式存储的行已经按列结构排列，旧记录按导出的列补齐"""
+    if isinstance(chunk, pa.Table):
+        return [_json_encoder.encode(row) for row in chunk.to_pylist()]
+    return [_json_encoder.encode({column: item.get(column) for column in columns}) for item in chunk]
+
+
+def _encode_csv(chunks, columns):
+    header = True
+    for chunk in chunks:
+        if isinstance(chunk, pa.Table):
+            buffer = io.BytesIO()
+            pacsv.write_csv(chunk, buffer, write_options=pacsv.WriteOptions(include_header=header))
+            header = False
+            yield buffer.getvalue()
+            continue
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if header:
+            writer.writerow(columns)
+            header = False
+        # 确保每行都有所有列
+        writer.writerows([item.get(column, '') for column in columns] for item in chunk)
+        yield buffer.getvalue().encode('utf-8')
+
+    if header:
+        # 没有数据时只输出表头
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(columns)
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _encode_ndjson(chunks, columns):
+    for chunk in chunks:
+        lines = _encode_rows(chunk, columns)
+        if lines:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def _encode_json(chunks, columns, dataset_name):
+    """与原导出接口相同的结构 {'data': [...], 'total': 行数, 'dataset_name': 名称}，逐块输出 data 数组"""
+    yield b'{"data": ['
+    total = 0
+    for chunk in chunks:
+        rows = _encode_rows(chunk, columns)
+        if rows:
+            yield ((', ' if total else '') + ', '.join(rows)).encode('utf-8')
+            total += len(rows)
+    tail = json.dumps(dataset_name, ensure_ascii=False)
+    yield f'], "total": {total}, "dataset_name": {tail}}}'.encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """收集 Parquet 写入器输出的字节，由调用方逐段取走；位置按累计写入量计算"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _legacy_table(chunk, schema):
+    """旧记录存储的一块记录转换为字符串列的 Arrow 表（各块的值类型不一定一致）"""
+    arrays = [
+        pa.array([None if _is_null(item.get(field.name)) else _stringify(item.get(field.name)) for item in chunk],
+                 type=pa.string())
+        for field in schema
+    ]
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def _encode_parquet(chunks, schema):
+    """每个数据块写成一个行组，写完一个行组就输出已经生成的字节"""
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for chunk in chunks:
+            table = chunk if isinstance(chunk, pa.Table) else _legacy_table(chunk, schema)
+            if table.schema != schema:
+                table = table.cast(schema)
+            writer.write_table(table)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def _gzip(stream):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 生成 gzip 格式
+    for data in stream:
+        compressed = compressor.compress(data)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream_export(dataset, export_format='csv', use_gzip=False, offset=0, limit=None):
+    """
+    流式导出数据集，返回 (字节块迭代器, Content-Type, 文件名)
+
+    offset/limit 为导出的行号区间（旧记录存储按记录计），limit 为 None 时导出全部数据。
+    """
+    content_type, extension = EXPORT_FORMATS[export_format]
+    columns = get_export_columns(dataset)
+    chunks = iter_chunks(dataset, offset=offset, limit=limit)
+
+    if export_format == 'csv':
+        stream = _encode_csv(chunks, columns)
+    elif export_format == 'ndjson':
+        stream = _encode_ndjson(chunks, columns)
+    elif export_format == 'json':
+        stream = _encode_json(chunks, columns, dataset.name)
+    else:
+        schema = DatasetStore.get_arrow_schema(dataset)
+        if schema is None:
+            schema = pa.schema([(column, pa.string()) for column in columns])
+        stream = _encode_parquet(chunks, schema)
+
+    filename = f'{dataset.name}.{extension}'
+    if use_gzip:
+        stream = _gzip(stream)
+        content_type = 'application/gzip'
+        filename += '.gz'
+    return stream, content_type, filename
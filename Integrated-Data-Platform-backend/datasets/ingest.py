@@ -0,0 +1,323 @@
+# Copyright (c) 2025 YycKop
+# MIT License
+# Integrated-Data-Platform-backend/datasets/ingest.py
+"""
+文件流式导入工具
+
+上传文件不再整体读入内存：先根据文件头探测编码，再按固定行数分块解析，
+每块直接写入数据集存储，内存占用与文件大小无关。
+"""
+import codecs
+import io
+import json
+import logging
+import math
+import re
+import time
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .storage import datetime_to_iso
+
+logger = logging.getLogger(__name__)
+
+# 依次尝试的文件编码
+CSV_ENCODINGS = ['utf-8', 'gbk', 'gb2312', 'latin-1']
+
+
+def get_ingest_chunk_size():
+    """流式导入时每个数据块的行数"""
+    return int(getattr(settings, 'DATASET_INGEST_CHUNK_SIZE', 50000))
+
+
+def get_sniff_bytes():
+    """编码探测读取的文件头字节数"""
+    return int(getattr(settings, 'DATASET_ENCODING_SNIFF_BYTES', 64 * 1024))
+
+
+def read_prefix(file, size=None):
+    """读取文件头用于探测，读取后把文件指针恢复到开头"""
+    file.seek(0)
+    prefix = file.read(size or get_sniff_bytes())
+    file.seek(0)
+    return prefix
+
+
+def candidate_encodings(prefix, encodings=None):
+    """
+    返回按可能性排序的候选编码列表
+
+    带 BOM 的 UTF-8 文件优先使用 utf-8-sig；其余按 encodings 顺序选出第一个能解码文件头的编码，
+    它之后的编码保留为后续解码失败时的备选。
+    """
+    encodings = list(encodings or CSV_ENCODINGS)
+    if prefix.startswith(codecs.BOM_UTF8):
+        return ['utf-8-sig'] + [encoding for encoding in encodings if encoding != 'utf-8']
+
+    for index, encoding in enumerate(encodings):
+        try:
+            # 文件头可能截断在多字节字符中间，使用增量解码器且不要求结束
+            codecs.getincrementaldecoder(encoding)().decode(prefix, final=False)
+        except UnicodeDecodeError:
+            continue
+        return encodings[index:]
+    return encodings[-1:]
+
+
+def iter_csv_chunks(file, encoding, chunk_size=None):
+    """按块解析 CSV 文件，逐块返回 DataFrame"""
+    file.seek(0)
+    # 上传文件对象不一定能被 pandas 识别为二进制流，显式按编码包装为文本流
+    stream = io.TextIOWrapper(getattr(file, 'file', file), encoding=encoding, newline='')
+    try:
+        with pd.read_csv(stream, chunksize=chunk_size or get_ingest_chunk_size()) as reader:
+            for chunk in reader:
+                yield chunk
+    finally:
+        # 只解除包装，不关闭上传文件本身
+        stream.detach()
+
+
+# JSON 对象中按顺序查找的数据数组字段
+JSON_DATA_FIELDS = ['RECORDS', 'records', 'data', 'items', 'results']
+
+# 增量解析 JSON 时每次读取的字符数
+JSON_READ_SIZE = 1024 * 1024
+# 单个 JSON 值（一条记录）允许的最大字符数，超过时认为文件格式有误
+JSON_MAX_VALUE_SIZE = 64 * 1024 * 1024
+
+_JSON_WHITESPACE = ' \t\n\r'
+_JSON_NUMBER_TAIL = re.compile(r'[0-9+\-.eE]*')
+
+
+class _JsonTextBuffer:
+    """带滑动缓冲区的 JSON 文本读取器，每次只解码一个完整的 JSON 值"""
+
+    def __init__(self, stream, read_size=JSON_READ_SIZE):
+        self.stream = stream
+        self.read_size = read_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        data = self.stream.read(self.read_size)
+        if not data:
+            self.eof = True
+            return
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+
+    def peek(self):
+        """跳过空白并返回下一个字符，文件结束时返回 None"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _JSON_WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if self.eof:
+                return None
+            self._fill()
+
+    def expect(self, chars):
+        char = self.peek()
+        if char is None or char not in chars:
+            raise json.JSONDecodeError(f"期望 {' 或 '.join(chars)}", self.buffer, self.pos)
+        self.pos += 1
+        return char
+
+    def decode_value(self):
+        """解码下一个完整的 JSON 值"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof or len(self.buffer) - self.pos > JSON_MAX_VALUE_SIZE:
+                    raise
+                self._fill()
+                continue
+            # 数字可能被缓冲区截断（"123" 或 "12."、"1e" 只解码出前半部分），
+            # 值之后直到缓冲区末尾都可能是数字的一部分时读入更多内容再解码
+            if not self.eof and _JSON_NUMBER_TAIL.match(self.buffer, end).end() == len(self.buffer):
+                self._fill()
+                continue
+            self.pos = end
+            return value
+
+    def iter_array(self):
+        """逐个返回数组元素，调用前当前字符应为 '['"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.decode_value()
+            if self.expect(',]') == ']':
+                return
+
+
+def _iter_json_object(reader):
+    """
+    增量解析顶层对象：第一个值为数组的数据字段（RECORDS、data 等）逐条返回其中的记录，
+    没有数据字段时整个对象作为一条记录返回
+    """
+    reader.expect('{')
+    others = {}
+    found_data = False
+    if reader.peek() == '}':
+        reader.pos += 1
+    else:
+        while True:
+            key = reader.decode_value()
+            reader.expect(':')
+            if not found_data and key in JSON_DATA_FIELDS and reader.peek() == '[':
+                logger.info(f"找到数据字段 '{key}'，逐条解析记录")
+                found_data = True
+                yield from reader.iter_array()
+            else:
+                value = reader.decode_value()
+                if not found_data:
+                    others[key] = value
+            if reader.expect(',}') == '}':
+                break
+
+    if not found_data:
+        logger.info("对象格式，作为单条记录处理")
+        yield others
+
+
+def iter_json_records(file, ndjson=False, read_size=JSON_READ_SIZE):
+    """
+    增量解析 JSON / NDJSON 文件，逐条返回记录，不会把整个文档读入内存
+
+    支持记录数组、{"RECORDS": [...]} 等包含数据数组的对象，以及每行一个 JSON 值的 NDJSON；
+    ndjson 为 False 时若顶层对象之后还有其他值，也按 NDJSON 继续解析。
+    """
+    file.seek(0)
+    stream = io.TextIOWrapper(getattr(file, 'file', file), encoding='utf-8-sig')
+    try:
+        reader = _JsonTextBuffer(stream, read_size)
+        first = reader.peek()
+        if first is None:
+            return
+
+        if first == '[' and not ndjson:
+            logger.info("数组格式，逐条解析记录")
+            yield from reader.iter_array()
+        elif first == '{' and not ndjson:
+            yield from _iter_json_object(reader)
+        elif not ndjson:
+            raise ValueError('不支持的JSON格式')
+
+        # NDJSON：剩余内容是以空白分隔的一系列 JSON 值
+        while reader.peek() is not None:
+            yield reader.decode_value()
+    finally:
+        stream.detach()
+
+
+def iter_batches(iterable, size):
+    """把可迭代对象按 size 分批，逐批返回列表"""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _normalize_value(value):
+    """规范化单个值，只用于无法按列整体处理的混合类型列"""
+    if value is None or value is pd.NaT:
+        return None
+    if isinstance(value, float):
+        return None if math.isnan(value) else value
+    if isinstance(value, (str, bool, int)):
+        return value
+    if isinstance(value, np.generic):
+        value = value.item()
+        return None if isinstance(value, float) and math.isnan(value) else value
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def normalize_column(series):
+    """
+    按列规范化数据类型：空值为 None/NaN，日期时间转为 ISO 字符串，
+    数值和布尔列保持 numpy 类型，混合类型列逐值转换为 JSON 可序列化的值
+    """
+    dtype = series.dtype
+
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        iso = datetime_to_iso(series)
+        return iso.astype(object).where(series.notna(), None)
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_numeric_dtype(dtype):
+        return series
+    if isinstance(dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+    elif dtype != object:
+        # timedelta、period 等类型保存为字符串
+        return series.astype(str).where(series.notna(), None)
+
+    inferred = pd.api.types.infer_dtype(series, skipna=True)
+    if inferred in ('string', 'integer', 'floating', 'boolean', 'mixed-integer-float', 'empty'):
+        return series.where(series.notna(), None)
+    return series.map(_normalize_value)
+
+
+def normalize_frame(df):
+    """按列规范化整个 DataFrame，列名统一转换为字符串"""
+    return pd.DataFrame(
+        {str(name): normalize_column(df.iloc[:, index]) for index, name in enumerate(df.columns)},
+        index=df.index
+    )
+
+
+def frame_to_records(df):
+    """把 DataFrame 批量转换为 JSON 可序列化的记录字典列表，数值均为 Python 原生类型"""
+    normalized = normalize_frame(df)
+    columns = []
+    for name in normalized.columns:
+        series = normalized[name]
+        # tolist() 会把 numpy 标量转换为 Python 原生类型
+        values = series.tolist()
+        if pd.api.types.is_float_dtype(series.dtype) and series.isna().any():
+            values = [None if value != value else value for value in values]
+        columns.append(values)
+    names = normalized.columns.tolist()
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+class IngestProgress:
+    """记录导入进度和吞吐量"""
+
+    def __init__(self, label):
+        self.label = label
+        self.rows = 0
+        self.started = time.perf_counter()
+
+    def add(self, rows):
+        self.rows += rows
+        logger.debug(f"[{self.label}] 已导入 {self.rows} 行，{self.rows_per_second:.0f} 行/秒")
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        elapsed = self.elapsed
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def summary(self):
+        return {
+            'elapsed_seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+        }
@@ -0,0 +1,90 @@
+# Copyright (c) 2025 YycKop
+# MIT License
+# Integrated-Data-Platform-backend/datasets/management/commands/benchmark_ingest.py
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+
+from datasets.ingest import frame_to_records, normalize_frame
+from datasets.storage import column_to_arrow
+
+
+def build_frame(rows, seed=0):
+    """构造包含常见列类型的测试数据"""
+    rng = np.random.default_rng(seed)
+    price = rng.random(rows) * 100
+    price[rng.random(rows) < 0.05] = np.nan
+    return pd.DataFrame({
+        'id': np.arange(rows),
+        'name': rng.choice(['北京', '上海', '广州', '深圳', None], rows),
+        'price': price,
+        'volume': rng.integers(0, 10000, rows),
+        'active': rng.random(rows) < 0.5,
+        'date': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 86400 * 365, rows), unit='s'),
+    })
+
+
+def legacy_convert(df, batch_size=50):
+    """原 _handle_dataframe 中逐行 iterrows 的转换方式，作为对比基准"""
+    df_cleaned = df.where(pd.notnull(df), None)
+    for col in df_cleaned.columns:
+        if df_cleaned[col].dtype == 'object':
+            df_cleaned[col] = df_cleaned[col].apply(
+                lambda x: str(x) if not isinstance(x, (str, int, float, bool, type(None))) else x
+            )
+
+    records = []
+    for i in range(0, len(df_cleaned), batch_size):
+        for _, row in df_cleaned.iloc[i:i + batch_size].iterrows():
+            cleaned_data = {}
+            for key, value in row.to_dict().items():
+                if pd.isna(value) or value is None:
+                    cleaned_data[key] = None
+                elif isinstance(value, (pd.Timestamp, pd.DatetimeIndex)):
+                    cleaned_data[key] = value.isoformat()
+                elif isinstance(value, (int, float, str, bool)):
+                    cleaned_data[key] = value
+                else:
+                    cleaned_data[key] = str(value)
+            json.dumps(cleaned_data)
+            records.append(cleaned_data)
+    return records
+
+
+def vectorized_columns(df):
+    """按列规范化后直接转换为 Arrow 列，即上传时写入列式存储的路径"""
+    normalized = normalize_frame(df)
+    return [column_to_arrow(normalized[name]) for name in normalized.columns]
+
+
+class Command(BaseCommand):
+    help = '对比逐行 iterrows 与按列向量化的 DataFrame 转换吞吐量（行/秒）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help='测试数据行数')
+        parser.add_argument('--legacy-rows', type=int, default=None,
+                            help='逐行方式只转换前 N 行再按比例计算吞吐量，默认转换全部行')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        df = build_frame(rows)
+        self.stdout.write(f'测试数据: {rows} 行, {len(df.columns)} 列')
+
+        legacy_rows = min(options['legacy_rows'] or rows, rows)
+        results = [
+            ('iterrows 逐行转换（原实现）', legacy_rows, lambda: legacy_convert(df.iloc[:legacy_rows])),
+            ('按列规范化 -> 记录字典', rows, lambda: frame_to_records(df)),
+            ('按列规范化 -> Arrow 列', rows, lambda: vectorized_columns(df)),
+        ]
+
+        baseline = None
+        for label, count, func in results:
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            rate = count / elapsed if elapsed > 0 else float('inf')
+            baseline = baseline or rate
+            self.stdout.write(f'{label}: {count} 行, {elapsed:.2f} 秒, {rate:,.0f} 行/秒, {rate / baseline:.1f}x')
@@ -0,0 +1,40 @@
+# Copyright (c) 2025 YycKop
+# MIT License
+# Integrated-Data-Platform-backend/datasets/management/commands/migrate_dataset_storage.py
+from django.core.management.base import BaseCommand
+
+from datasets.models import Dataset, DataRecord
+from datasets.storage import DatasetStore
+
+
+class Command(BaseCommand):
+    help = '把仍以 DataRecord 行保存的数据集迁移到列式存储'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset_ids', nargs='*', type=int, help='只迁移指定ID的数据集')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='每次读取的记录数')
+        parser.add_argument('--drop-records', action='store_true', help='迁移完成后删除原有的 DataRecord 行')
+
+    def handle(self, *args, **options):
+        datasets = Dataset.objects.filter(storage_format='records')
+        if options['dataset_ids']:
+            datasets = datasets.filter(id__in=options['dataset_ids'])
+
+        for dataset in datasets:
+            records = DataRecord.objects.filter(dataset=dataset).order_by('id').values_list('data', flat=True)
+            # 追加模式提交，不删除也不重复写入原有的 DataRecord 行
+            writer = DatasetStore.open_writer(dataset, append=True, compat_records=False)
+            with writer:
+                batch = []
+                for data in records.iterator(chunk_size=options['chunk_size']):
+                    batch.append(data if isinstance(data, dict) else {'value': data})
+                    if len(batch) >= options['chunk_size']:
+                        writer.write_records(batch)
+                        batch = []
+                writer.write_records(batch)
+                row_count = writer.commit()
+
+            if options['drop_records']:
+                DataRecord.objects.filter(dataset=dataset).delete()
+
+            self.stdout.write(self.style.SUCCESS(f'数据集 {dataset.id} ({dataset.name}) 已迁移，共 {row_count} 行'))
@@ -0,0 +1,33 @@
+# Copyright (c) 2025 YycKop
+# MIT License
+# Integrated-Data-Platform-backend/datasets/management/commands/refresh_dataset_statistics.py
+from django.core.management.base import BaseCommand
+
+from datasets.catalog import refresh_statistics
+from datasets.models import Dataset
+
+
+class Command(BaseCommand):
+    help = '计算数据集的结构和统计信息目录（为已有数据集补全统计信息）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset_ids', nargs='*', type=int, help='只统计指定ID的数据集')
+        parser.add_argument('--all', action='store_true', help='重新统计所有数据集，包括统计信息已是最新的数据集')
+
+    def handle(self, *args, **options):
+        datasets = Dataset.objects.select_related('statistics').order_by('id')
+        if options['dataset_ids']:
+            datasets = datasets.filter(id__in=options['dataset_ids'])
+
+        for dataset in datasets:
+            current = getattr(dataset, 'statistics', None)
+            if not options['all'] and current is not None and current.content_version == dataset.content_version:
+                continue
+            try:
+                statistics = refresh_statistics(dataset)
+            except Exception as e:
+                self.stderr.write(self.style.ERROR(f'数据集 {dataset.id} ({dataset.name}) 统计失败: {str(e)}'))
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f'数据集 {dataset.id} ({dataset.name}) 已统计: {statistics.row_count} 行, {len(statistics.columns)} 列'
+            ))
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("datasets", "0003_datasource_error_message_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dataset",
+            name="storage_format",
+            field=models.CharField(
+                choices=[("records", "JSON记录"), ("parquet", "Parquet列式")],
+                default="records",
+                max_length=20,
+                verbose_name="存储格式",
+            ),
+        ),
+        migrations.AddField(
+            model_name="dataset",
+            name="storage_path",
+            field=models.CharField(blank=True, max_length=500, verbose_name="存储路径"),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("datasets", "0004_dataset_storage_format_dataset_storage_path"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dataset",
+            name="content_updated_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="内容更新时间"
+            ),
+        ),
+        migrations.AddField(
+            model_name="dataset",
+            name="content_version",
+            field=models.PositiveBigIntegerField(default=0, verbose_name="内容版本"),
+        ),
+        migrations.CreateModel(
+            name="DatasetChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("version", models.PositiveBigIntegerField(verbose_name="内容版本")),
+                (
+                    "operation",
+                    models.CharField(
+                        choices=[
+                            ("replace", "替换全部数据"),
+                            ("append", "追加数据"),
+                            ("records", "修改记录"),
+                        ],
+                        max_length=20,
+                        verbose_name="变更类型",
+                    ),
+                ),
+                (
+                    "row_count",
+                    models.BigIntegerField(
+                        blank=True, null=True, verbose_name="变更后行数"
+                    ),
+                ),
+                (
+                    "rows_added",
+                    models.BigIntegerField(default=0, verbose_name="新增行数"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="变更时间"),
+                ),
+                (
+                    "dataset",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="changes",
+                        to="datasets.dataset",
+                        verbose_name="数据集",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "数据集变更记录",
+                "verbose_name_plural": "数据集变更记录",
+                "ordering": ["dataset", "version"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("dataset", "version"),
+                        name="unique_dataset_change_version",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("datasets", "0005_dataset_content_version"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="datarecord",
+            index=models.Index(
+                fields=["dataset", "id"], name="datarecord_dataset_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("datasets", "0006_datarecord_dataset_id_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DatasetStatistics",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "content_version",
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name="统计时的内容版本"
+                    ),
+                ),
+                ("row_count", models.BigIntegerField(default=0, verbose_name="行数")),
+                ("columns", models.JSONField(default=list, verbose_name="列统计信息")),
+                (
+                    "parts",
+                    models.JSONField(
+                        blank=True, null=True, verbose_name="已统计的分片"
+                    ),
+                ),
+                (
+                    "computed_at",
+                    models.DateTimeField(auto_now=True, verbose_name="统计时间"),
+                ),
+                (
+                    "dataset",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="statistics",
+                        to="datasets.dataset",
+                        verbose_name="数据集",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "数据集统计信息",
+                "verbose_name_plural": "数据集统计信息",
+            },
+        ),
+    ]
@@ -1,8 +1,10 @@
 # Copyright (c) 2025 YycKop
 # MIT License
 # Integrated-Data-Platform-backend/datasets/models.py
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.conf import settings  # 添加这行
+from django.utils import timezone
 
 
 class DataSource(models.Model):
@@ -44,11 +46,22 @@ class Dataset(models.Model):
         ('excel', 'Excel'),
     ]
 
+    STORAGE_FORMATS = [
+        ('records', 'JSON记录'),
+        ('parquet', 'Parquet列式'),
+    ]
+
     name = models.CharField(max_length=200, verbose_name="数据集名称")
     description = models.TextField(blank=True, verbose_name="描述")
     data_source = models.ForeignKey(DataSource, on_delete=models.CASCADE, verbose_name="数据源")
     data_type = models.CharField(max_length=20, choices=DATA_TYPES, verbose_name="数据类型")
     data_structure = models.JSONField(default=dict, verbose_name="数据结构")
+    storage_format = models.CharField(max_length=20, choices=STORAGE_FORMATS, default='records',
+                                      verbose_name="存储格式")
+    storage_path = models.CharField(max_length=500, blank=True, verbose_name="存储路径")
+    # 数据内容每次变化（导入、追加、替换、流程输出、记录修改）时加一，元数据修改不影响
+    content_version = models.PositiveBigIntegerField(default=0, verbose_name="内容版本")
+    content_updated_at = models.DateTimeField(null=True, blank=True, verbose_name="内容更新时间")
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name="创建者")  # 修改这行
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
@@ -60,6 +73,77 @@ class Dataset(models.Model):
     def __str__(self):
         return self.name
 
+    def bump_content_version(self, operation, row_count=None, rows_added=0):
+        """
+        数据内容变化后把内容版本加一并写入变更记录，返回新的版本号
+
+        应在写入数据的同一事务中调用；版本号由数据库原子递增，并发写入时也保持单调。
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            Dataset.objects.filter(pk=self.pk).update(
+                content_version=F('content_version') + 1,
+                content_updated_at=now
+            )
+            version = Dataset.objects.filter(pk=self.pk).values_list('content_version', flat=True).get()
+            DatasetChange.objects.create(
+                dataset=self,
+                version=version,
+                operation=operation,
+                row_count=row_count,
+                rows_added=rows_added
+            )
+        self.content_version = version
+        self.content_updated_at = now
+        return version
+
+
+class DatasetChange(models.Model):
+    """数据集内容的变更记录，与内容版本一一对应"""
+    OPERATIONS = [
+        ('replace', '替换全部数据'),
+        ('append', '追加数据'),
+        ('records', '修改记录'),
+    ]
+
+    dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name='changes', verbose_name="数据集")
+    version = models.PositiveBigIntegerField(verbose_name="内容版本")
+    operation = models.CharField(max_length=20, choices=OPERATIONS, verbose_name="变更类型")
+    row_count = models.BigIntegerField(null=True, blank=True, verbose_name="变更后行数")
+    rows_added = models.BigIntegerField(default=0, verbose_name="新增行数")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="变更时间")
+
+    class Meta:
+        verbose_name = "数据集变更记录"
+        verbose_name_plural = verbose_name
+        ordering = ['dataset', 'version']
+        constraints = [
+            models.UniqueConstraint(fields=['dataset', 'version'], name='unique_dataset_change_version')
+        ]
+
+    def __str__(self):
+        return f"{self.dataset} v{self.version} {self.operation}"
+
+
+class DatasetStatistics(models.Model):
+    """数据集的结构和统计信息目录，写入数据时计算，供各接口直接读取而不必重新扫描数据"""
+    dataset = models.OneToOneField(Dataset, on_delete=models.CASCADE, related_name='statistics',
+                                   verbose_name="数据集")
+    content_version = models.PositiveBigIntegerField(default=0, verbose_name="统计时的内容版本")
+    row_count = models.BigIntegerField(default=0, verbose_name="行数")
+    # [{'name', 'type', 'null_count', 'min', 'max', 'distinct_count', 'sketch'}]，按列顺序排列
+    columns = models.JSONField(default=list, verbose_name="列统计信息")
+    # 已统计的列式存储分片文件名，旧存储格式为空
+    parts = models.JSONField(null=True, blank=True, verbose_name="已统计的分片")
+    computed_at = models.DateTimeField(auto_now=True, verbose_name="统计时间")
+
+    class Meta:
+        verbose_name = "数据集统计信息"
+        verbose_name_plural = verbose_name
+
+    def __str__(self):
+        return f"{self.dataset} v{self.content_version} 统计信息"
+
 
 class DataRecord(models.Model):
     dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, verbose_name="数据集")
@@ -69,3 +153,7 @@ class DataRecord(models.Model):
     class Meta:
         verbose_name = "数据记录"
         verbose_name_plural = verbose_name
+        # 数据集数据接口按 (数据集, id) 键集分页
+        indexes = [
+            models.Index(fields=['dataset', 'id'], name='datarecord_dataset_id_idx')
+        ]
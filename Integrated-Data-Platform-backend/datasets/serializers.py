@@ -3,6 +3,7 @@
 # Integrated-Data-Platform-backend/datasets/serializers.py
 from rest_framework import serializers
 from .models import DataSource, Dataset, DataRecord
+from .catalog import get_row_count
 
 
 class DataSourceSerializer(serializers.ModelSerializer):
@@ -23,12 +24,12 @@ class DatasetSerializer(serializers.ModelSerializer):
             'id', 'name', 'description', 'data_source', 'data_source_name',
             'data_type',  # 确保包含这个字段
             'created_by', 'created_by_name', 'created_at', 'updated_at',
-            'record_count'
+            'content_version', 'content_updated_at', 'record_count'
         ]
-        read_only_fields = ['created_by', 'created_at', 'updated_at']
+        read_only_fields = ['created_by', 'created_at', 'updated_at', 'content_version', 'content_updated_at']
 
     def get_record_count(self, obj):
-        return obj.datarecord_set.count()
+        return get_row_count(obj)
 
 class DataRecordSerializer(serializers.ModelSerializer):
     class Meta:
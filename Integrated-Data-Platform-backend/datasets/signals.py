@@ -0,0 +1,34 @@
+# Copyright (c) 2025 YycKop
+# MIT License
+# Integrated-Data-Platform-backend/datasets/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, pre_save
+from django.dispatch import receiver
+
+from .db_utils import engine_registry
+from .models import DataSource, Dataset
+from .storage import DatasetStore
+
+
+@receiver(post_delete, sender=Dataset)
+def remove_dataset_storage(sender, instance, **kwargs):
+    """数据集删除后清理其列式存储文件（包括级联删除的情况）"""
+    dataset_id = instance.pk
+    transaction.on_commit(lambda: DatasetStore.delete_storage(dataset_id))
+
+
+@receiver(pre_save, sender=DataSource)
+def invalidate_changed_engine(sender, instance, **kwargs):
+    """数据源的连接配置修改后释放按旧配置创建的数据库引擎"""
+    if instance.pk is None:
+        return
+    old_config = DataSource.objects.filter(pk=instance.pk).values_list('connection_config', flat=True).first()
+    if old_config is not None and old_config != instance.connection_config:
+        transaction.on_commit(lambda: engine_registry.invalidate(old_config))
+
+
+@receiver(post_delete, sender=DataSource)
+def invalidate_deleted_engine(sender, instance, **kwargs):
+    """数据源删除后释放其数据库引擎"""
+    connection_config = instance.connection_config
+    transaction.on_commit(lambda: engine_registry.invalidate(connection_config))
@@ -0,0 +1,974 @@
+# Copyright (c) 2025 YycKop
+# MIT License
+# Integrated-Data-Platform-backend/datasets/storage.py
+"""
+数据集列式存储引擎
+
+每个数据集以一组 Parquet 分片文件保存在 DATASET_STORAGE_ROOT/<dataset_id>/<version>/ 目录下，
+每个分片按 DATASET_PART_ROW_GROUP_ROWS 行划分为多个行组，目录中的 _manifest.json 记录统一后的列结构和各分片的行数。
+写入总是生成新的版本目录，提交时再把 Dataset.storage_path 原子地切换过去；
+storage_format 仍为 'records' 的旧数据集继续从 DataRecord 读取。
+"""
+import json
+import logging
+import math
+import os
+import shutil
+import uuid
+import warnings
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as pads
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = '_manifest.json'
+
+# 尚未保存到数据库的数据集先写入该暂存目录，提交时再移动到数据集目录下
+STAGING_DIR_NAME = '_staging'
+
+# 追加写入时末尾连续的未满分片达到该数量就合并
+COMPACT_SMALL_PARTS = 8
+
+# 存储中使用的列类型
+ARROW_TYPES = {
+    'null': pa.null(),
+    'bool': pa.bool_(),
+    'int64': pa.int64(),
+    'double': pa.float64(),
+    'string': pa.string(),
+}
+
+
+def get_storage_root():
+    """列式存储根目录"""
+    return str(getattr(settings, 'DATASET_STORAGE_ROOT', os.path.join(settings.BASE_DIR, 'media', 'datasets')))
+
+
+def get_row_group_size():
+    """每个分片的行数"""
+    return int(getattr(settings, 'DATASET_ROW_GROUP_SIZE', 50000))
+
+
+def get_part_row_group_rows():
+    """分片内每个 Parquet 行组的行数，不超过分片行数"""
+    return max(1, min(int(getattr(settings, 'DATASET_PART_ROW_GROUP_ROWS', 5000)), get_row_group_size()))
+
+
+def keep_compat_records():
+    """是否同时写入 DataRecord 兼容行"""
+    return bool(getattr(settings, 'DATASET_KEEP_RECORDS', False))
+
+
+def promote_type(current, incoming):
+    """合并两个列类型：null 可提升为任意类型，整数与浮点提升为 double，其余冲突统一为 string"""
+    if current is None or current == incoming:
+        return incoming
+    if current == 'null':
+        return incoming
+    if incoming == 'null':
+        return current
+    if {current, incoming} == {'int64', 'double'}:
+        return 'double'
+    return 'string'
+
+
+def _is_null(value):
+    if value is None or value is pd.NaT:
+        return True
+    return isinstance(value, float) and math.isnan(value)
+
+
+def _stringify(value):
+    """把任意值转换为字符串，嵌套结构保存为 JSON 文本"""
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def datetime_to_iso(series):
+    """将 datetime64 列转换为 ISO 格式字符串，空值为 None"""
+    if getattr(series.dt, 'tz', None) is not None:
+        return series.map(lambda v: None if _is_null(v) else v.isoformat())
+    values = series.to_numpy(dtype='datetime64[ns]')
+    # 整列都没有小数秒时只保留到秒，与 Timestamp.isoformat() 的输出一致
+    has_fraction = bool((values.astype('int64') % 1_000_000_000 != 0)[~np.isnat(values)].any())
+    strings = np.datetime_as_string(values, unit='us' if has_fraction else 's').astype(object)
+    strings[np.isnat(values)] = None
+    return pd.Series(strings, index=series.index)
+
+
+def _string_array(values):
+    return pa.array(
+        [None if _is_null(v) else _stringify(v) for v in values],
+        type=pa.string()
+    )
+
+
+def column_to_arrow(series):
+    """将一列 pandas 数据转换为 (类型名, Arrow 数组)"""
+    dtype = series.dtype
+
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'bool', pa.array(series, type=pa.bool_(), from_pandas=True)
+    if pd.api.types.is_integer_dtype(dtype):
+        return 'int64', pa.array(series, type=pa.int64(), from_pandas=True)
+    if pd.api.types.is_float_dtype(dtype):
+        return 'double', pa.array(series, type=pa.float64(), from_pandas=True)
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return 'string', pa.array(datetime_to_iso(series), type=pa.string(), from_pandas=True)
+
+    values = series if dtype == object else series.astype(object)
+    inferred = pd.api.types.infer_dtype(values, skipna=True)
+
+    try:
+        if inferred == 'empty':
+            return 'null', pa.nulls(len(values))
+        if inferred == 'string':
+            return 'string', pa.array(values, type=pa.string(), from_pandas=True)
+        if inferred == 'boolean':
+            return 'bool', pa.array(values, type=pa.bool_(), from_pandas=True)
+        if inferred == 'integer':
+            return 'int64', pa.array(values, type=pa.int64(), from_pandas=True)
+        if inferred in ('floating', 'mixed-integer-float', 'decimal'):
+            numeric = pd.to_numeric(values, errors='coerce')
+            return 'double', pa.array(numeric, type=pa.float64(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError, TypeError, ValueError):
+        pass
+
+    # 混合类型、日期对象、嵌套结构等统一保存为字符串
+    return 'string', _string_array(values)
+
+
+def cast_array(array, type_name):
+    """把数组转换为目标存储类型"""
+    target = ARROW_TYPES[type_name]
+    if array.type == target:
+        return array
+    if array.type == pa.null():
+        return pa.nulls(len(array), type=target)
+    if type_name == 'string':
+        # 与 str() 的结果保持一致，例如 1.0 -> '1.0'、True -> 'True'
+        return _string_array(array.to_pylist())
+    return pc.cast(array, target)
+
+
+# 读取时支持的过滤条件运算符，语义与 pandas 比较一致：空值满足 != 和 not in，不满足其他比较
+FILTER_OPERATORS = ('==', '!=', '>', '>=', '<', '<=', 'in', 'not in', 'is_null', 'not_null')
+
+
+def _filter_expression(column, operator, value, available):
+    """把单个过滤条件转换为 Arrow 表达式"""
+    if operator not in FILTER_OPERATORS:
+        raise ValueError(f"不支持的过滤运算符: {operator}")
+
+    if column not in available:
+        # 不存在的列视为全部为空
+        return pc.scalar(operator in ('!=', 'not in', 'is_null'))
+
+    field = pc.field(column)
+    if operator == '==':
+        return field == value
+    if operator == '!=':
+        return (field != value) | field.is_null()
+    if operator == '>':
+        return field > value
+    if operator == '>=':
+        return field >= value
+    if operator == '<':
+        return field < value
+    if operator == '<=':
+        return field <= value
+    if operator == 'in':
+        return field.isin(list(value))
+    if operator == 'not in':
+        return ~field.isin(list(value)) | field.is_null()
+    if operator == 'is_null':
+        return field.is_null(nan_is_null=True)
+    return ~field.is_null(nan_is_null=True)
+
+
+def build_filter_expression(filters, columns):
+    """把 [(列名, 运算符, 值), ...] 转换为 AND 连接的 Arrow 表达式，filters 为空时返回 None"""
+    if not filters:
+        return None
+    available = set(columns)
+    expression = None
+    for column, operator, value in filters:
+        condition = _filter_expression(column, operator, value, available)
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def get_new_parts(manifest, known):
+    """
+    清单中相对已处理的分片（文件名集合 known）新增的分片，供统计信息和图表汇总增量刷新
+
+    合并小分片得到的分片记录了来源分片（merged_from），来源都已处理时视为已处理；
+    已处理的分片既不在清单中、也没有被合并时（数据被替换或改写），返回 None。
+    """
+    known = set(known)
+    covered, new_parts = set(), []
+    for part in manifest['parts']:
+        sources = set(part.get('merged_from') or [])
+        if part['file'] in known:
+            covered.add(part['file'])
+        elif sources and sources <= known:
+            covered.update(sources)
+        elif sources & known:
+            return None
+        else:
+            new_parts.append(part)
+    return new_parts if known <= covered else None
+
+
+def filter_dataframe(df, filters):
+    """在 DataFrame 上应用与 build_filter_expression 相同语义的过滤条件"""
+    if not filters or df.empty:
+        return df
+
+    mask = pd.Series(True, index=df.index)
+    for column, operator, value in filters:
+        if operator not in FILTER_OPERATORS:
+            raise ValueError(f"不支持的过滤运算符: {operator}")
+        if column not in df.columns:
+            if operator not in ('!=', 'not in', 'is_null'):
+                mask[:] = False
+            continue
+
+        series = df[column]
+        if operator == '==':
+            mask &= series == value
+        elif operator == '!=':
+            mask &= series != value
+        elif operator == '>':
+            mask &= series > value
+        elif operator == '>=':
+            mask &= series >= value
+        elif operator == '<':
+            mask &= series < value
+        elif operator == '<=':
+            mask &= series <= value
+        elif operator == 'in':
+            mask &= series.isin(list(value))
+        elif operator == 'not in':
+            mask &= ~series.isin(list(value))
+        elif operator == 'is_null':
+            mask &= series.isna()
+        else:
+            mask &= series.notna()
+    return df[mask]
+
+
+class DatasetWriter:
+    """
+    数据集写入器：缓冲写入的数据块，按行组大小落盘为 Parquet 分片，
+    commit() 时原子地把数据集切换到新版本目录
+    """
+
+    def __init__(self, dataset, append=False, compat_records=None):
+        self.dataset = dataset
+        self.append = append
+        self.compat_records = keep_compat_records() if compat_records is None else compat_records
+        self.part_rows = get_row_group_size()
+        self.group_rows = get_part_row_group_rows()
+        self.root = get_storage_root()
+        # 数据集还没有主键时（例如流程的新输出数据集）先写入暂存目录
+        owner = str(dataset.pk) if dataset.pk is not None else STAGING_DIR_NAME
+        self.version_dir = os.path.join(self.root, owner, uuid.uuid4().hex)
+        os.makedirs(self.version_dir, exist_ok=True)
+        self._manifest = None
+
+        self.columns = []  # 按首次出现顺序记录的列名
+        self.types = {}  # 列名 -> 存储类型
+        self.parts = []  # [{'file': ..., 'rows': ...}]
+        self.new_parts = []
+        self.rows_written = 0
+        self._pending = []
+        self._pending_rows = 0
+        self._finished = False
+        # 追加写入所基于的版本，提交时与数据库中的当前版本比较
+        self.base_path = dataset.storage_path if append and DatasetStore.is_columnar(dataset) else None
+
+        if self.base_path:
+            self._link_existing_parts()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if not self._finished:
+            self.abort()
+        return False
+
+    @property
+    def row_count(self):
+        return sum(part['rows'] for part in self.parts) + self._pending_rows
+
+    def _link_existing_parts(self):
+        """追加模式：把当前版本的分片以硬链接方式带入新版本目录"""
+        manifest = DatasetStore.load_manifest(self.dataset)
+        if not manifest:
+            return
+        source_dir = DatasetStore.get_storage_dir(self.dataset)
+        for column in manifest['columns']:
+            self.columns.append(column['name'])
+            self.types[column['name']] = column['type']
+        for part in manifest['parts']:
+            source = os.path.join(source_dir, part['file'])
+            target = os.path.join(self.version_dir, part['file'])
+            try:
+                os.link(source, target)
+            except OSError:
+                shutil.copyfile(source, target)
+            self.parts.append(dict(part))
+        self._compact_tail()
+
+    def _compact_tail(self):
+        """
+        末尾连续的未满分片达到 COMPACT_SMALL_PARTS 个时合并为满分片，逐条追加记录不会留下大量小文件
+
+        合并得到的分片记录来源分片的文件名，统计信息和图表汇总据此继续增量刷新（见 get_new_parts）。
+        """
+        start = len(self.parts)
+        while start > 0 and self.parts[start - 1]['rows'] < self.part_rows:
+            start -= 1
+        tail = self.parts[start:]
+        if len(tail) < COMPACT_SMALL_PARTS:
+            return
+
+        paths = [os.path.join(self.version_dir, part['file']) for part in tail]
+        table = pa.concat_tables([pq.read_table(path) for path in paths], promote_options='default')
+        schema = pa.schema([(name, ARROW_TYPES[self.types[name]]) for name in self.columns
+                            if name in table.column_names])
+        table = table.select(schema.names).cast(schema)
+
+        sources = [part['file'] for part in tail]
+        merged = []
+        for offset in range(0, table.num_rows, self.part_rows):
+            piece = table.slice(offset, self.part_rows)
+            file_name = self._part_name()
+            pq.write_table(piece, os.path.join(self.version_dir, file_name), row_group_size=self.group_rows)
+            merged.append({'file': file_name, 'rows': piece.num_rows, 'merged_from': sources})
+        for path in paths:
+            os.remove(path)
+        self.parts = self.parts[:start] + merged
+        logger.info(f"数据集 {self.dataset.pk} 合并了 {len(tail)} 个未满分片")
+
+    def write_records(self, records):
+        """写入一批字典记录"""
+        if not records:
+            return
+        # 以 object 类型构建，避免缺失键把整数列变成浮点列，列类型由 column_to_arrow 推断
+        self.write_frame(pd.DataFrame(records, dtype=object))
+
+    def write_frame(self, df):
+        """写入一个 DataFrame 数据块"""
+        if df is None or df.empty:
+            return
+        if not all(isinstance(name, str) for name in df.columns):
+            df = df.rename(columns=str)
+        self._pending.append(df)
+        self._pending_rows += len(df)
+        if self._pending_rows >= self.part_rows:
+            self._flush(final=False)
+
+    def _flush(self, final):
+        if not self._pending:
+            return
+        if len(self._pending) == 1:
+            buffered = self._pending[0]
+        else:
+            with warnings.catch_warnings():
+                # 各数据块列类型不一致时由 _write_part 统一处理类型，忽略 pandas 的合并类型提示
+                warnings.simplefilter('ignore', FutureWarning)
+                buffered = pd.concat(self._pending, ignore_index=True, sort=False)
+        self._pending = []
+        self._pending_rows = 0
+
+        start = 0
+        while len(buffered) - start >= self.part_rows:
+            self._write_part(buffered.iloc[start:start + self.part_rows])
+            start += self.part_rows
+
+        remainder = buffered.iloc[start:]
+        if len(remainder) == 0:
+            return
+        if final:
+            self._write_part(remainder)
+        else:
+            self._pending = [remainder]
+            self._pending_rows = len(remainder)
+
+    @staticmethod
+    def _part_name():
+        """分片文件名，同一文件名在各版本中总是指向相同的内容"""
+        return f'part-{uuid.uuid4().hex}.parquet'
+
+    def _write_part(self, df):
+        arrays = {}
+        for name in df.columns:
+            type_name, array = column_to_arrow(df[name])
+            current = self.types.get(name)
+            promoted = promote_type(current, type_name)
+            if current is None:
+                self.columns.append(name)
+            elif promoted != current:
+                self._promote_column(name, promoted)
+            self.types[name] = promoted
+            arrays[name] = cast_array(array, promoted)
+
+        table = pa.table(arrays)
+        file_name = self._part_name()
+        pq.write_table(table, os.path.join(self.version_dir, file_name), row_group_size=self.group_rows)
+
+        part = {'file': file_name, 'rows': table.num_rows}
+        self.parts.append(part)
+        self.new_parts.append(part)
+        self.rows_written += table.num_rows
+
+    def _promote_column(self, name, type_name):
+        """列类型发生提升时，改写已写出分片中的该列"""
+        logger.info(f"数据集 {self.dataset.pk} 的列 '{name}' 类型提升为 {type_name}")
+        for part in self.parts:
+            path = os.path.join(self.version_dir, part['file'])
+            table = pq.read_table(path)
+            if name not in table.column_names:
+                continue
+            index = table.column_names.index(name)
+            column = cast_array(table.column(index).combine_chunks(), type_name)
+            table = table.set_column(index, name, column)
+            # 改写后的分片换用新文件名，只删除本版本目录中的目录项，硬链接来源的旧版本文件不受影响
+            file_name = self._part_name()
+            pq.write_table(table, os.path.join(self.version_dir, file_name), row_group_size=self.group_rows)
+            os.remove(path)
+            part['file'] = file_name
+
+    def _write_manifest(self):
+        manifest = {
+            'format': 'parquet',
+            'columns': [{'name': name, 'type': self.types[name]} for name in self.columns],
+            'parts': self.parts,
+            'row_count': sum(part['rows'] for part in self.parts),
+        }
+        path = os.path.join(self.version_dir, MANIFEST_NAME)
+        with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(f'{path}.tmp', path)
+        return manifest
+
+    def stage(self):
+        """
+        落盘剩余数据并写出清单，不修改数据库
+
+        耗时的文件写入可以在数据库事务之外完成，之后的 commit() 只需要切换存储路径。
+        """
+        if self._manifest is None:
+            try:
+                self._flush(final=True)
+                self._manifest = self._write_manifest()
+            except Exception:
+                self.abort()
+                raise
+        return self._manifest['row_count']
+
+    def _move_staged_version(self):
+        """数据集保存后，把暂存目录中的版本移动到数据集目录下"""
+        target = os.path.join(self.root, str(self.dataset.pk), os.path.basename(self.version_dir))
+        if self.version_dir != target:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(self.version_dir, target)
+            self.version_dir = target
+
+    def _rebase(self, current):
+        """
+        追加期间数据集已被其他写入切换到新版本：改为在数据集的当前版本之上追加本次新写入的分片
+
+        当前版本中与本次写入共有的列类型不一致时无法合并，抛出 ValueError。
+        """
+        manifest = DatasetStore.load_manifest(current) or {'columns': [], 'parts': []}
+        types = {column['name']: column['type'] for column in manifest['columns']}
+        written = set()
+        for part in self.new_parts:
+            written.update(pq.read_schema(os.path.join(self.version_dir, part['file'])).names)
+        written = [name for name in self.columns if name in written]
+        conflicts = [name for name in written if name in types and types[name] != self.types[name]]
+        if conflicts:
+            raise ValueError(f"数据集在写入期间被修改，字段类型不一致: {', '.join(conflicts)}，请重试")
+
+        source_dir = DatasetStore.get_storage_dir(current) if manifest['parts'] else None
+        parts = [dict(part) for part in manifest['parts']] + self.new_parts
+        files = {part['file'] for part in parts}
+        for part in self.parts:
+            if part['file'] not in files:
+                os.remove(os.path.join(self.version_dir, part['file']))
+        for part in manifest['parts']:
+            target = os.path.join(self.version_dir, part['file'])
+            if not os.path.exists(target):
+                try:
+                    os.link(os.path.join(source_dir, part['file']), target)
+                except OSError:
+                    shutil.copyfile(os.path.join(source_dir, part['file']), target)
+
+        self.columns = list(types) + [name for name in written if name not in types]
+        self.types = {name: types.get(name, self.types.get(name)) for name in self.columns}
+        self.parts = parts
+        self._manifest = self._write_manifest()
+
+    def commit(self):
+        """
+        切换数据集到新版本（未调用 stage() 时先落盘）并更新统计信息目录，返回数据集总行数
+
+        切换时锁定数据集记录；追加写入所基于的版本已被并发写入替换时，在当前版本之上重新组织清单（见 _rebase）。
+        """
+        from .catalog import update_statistics
+        from .models import Dataset, DataRecord
+
+        self.stage()
+
+        dataset = self.dataset
+        if dataset.pk is None:
+            self.abort()
+            raise ValueError('提交列式存储前数据集必须先保存')
+        self._move_staged_version()
+        storage_path = os.path.relpath(self.version_dir, self.root)
+
+        try:
+            with transaction.atomic():
+                current = Dataset.objects.select_for_update().get(pk=dataset.pk)
+                current_path = current.storage_path if DatasetStore.is_columnar(current) else None
+                if self.append and current_path != self.base_path:
+                    logger.info(f"数据集 {dataset.pk} 在追加期间被其他写入修改，在当前版本之上追加")
+                    self._rebase(current)
+                manifest = self._manifest
+
+                old_dir = DatasetStore.get_storage_dir(current) if current_path else None
+                # 只有在已有列式数据后追加才是追加变更，从旧记录存储迁移过来的数据相当于整体替换
+                appended = self.append and old_dir is not None
+
+                data_structure = dict(current.data_structure or {})
+                data_structure['fields'] = list(self.columns)
+                data_structure['column_types'] = dict(self.types)
+
+                Dataset.objects.filter(pk=dataset.pk).update(
+                    storage_format='parquet',
+                    storage_path=storage_path,
+                    data_structure=data_structure
+                )
+                if not self.append:
+                    DataRecord.objects.filter(dataset=dataset).delete()
+                if self.compat_records:
+                    self._write_compat_records()
+                if old_dir:
+                    transaction.on_commit(lambda: shutil.rmtree(old_dir, ignore_errors=True))
+                dataset.bump_content_version(
+                    'append' if appended else 'replace',
+                    row_count=manifest['row_count'],
+                    rows_added=self.rows_written if appended else manifest['row_count']
+                )
+        except Exception:
+            self.abort()
+            raise
+
+        dataset.storage_format = 'parquet'
+        dataset.storage_path = storage_path
+        dataset.data_structure = data_structure
+        self._finished = True
+        update_statistics(dataset)
+        return manifest['row_count']
+
+    def _write_compat_records(self):
+        """按分片把新写入的数据同步为 DataRecord 兼容行"""
+        from .models import DataRecord
+
+        for part in self.new_parts:
+            table = pq.read_table(os.path.join(self.version_dir, part['file']))
+            records = [DataRecord(dataset=self.dataset, data=row) for row in table.to_pylist()]
+            DataRecord.objects.bulk_create(records, batch_size=1000)
+
+    def abort(self):
+        """放弃本次写入"""
+        self._pending = []
+        self._finished = True
+        shutil.rmtree(self.version_dir, ignore_errors=True)
+
+
+class DatasetStore:
+    """数据集存储访问入口，统一处理列式存储和旧的 DataRecord 存储"""
+
+    @staticmethod
+    def is_columnar(dataset):
+        return dataset.storage_format == 'parquet' and bool(dataset.storage_path)
+
+    @staticmethod
+    def get_storage_dir(dataset):
+        return os.path.join(get_storage_root(), dataset.storage_path)
+
+    @staticmethod
+    def load_manifest(dataset):
+        """读取数据集当前版本的清单"""
+        if not DatasetStore.is_columnar(dataset):
+            return None
+        path = os.path.join(DatasetStore.get_storage_dir(dataset), MANIFEST_NAME)
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            logger.error(f"数据集 {dataset.pk} 的存储清单不存在: {path}")
+            return None
+
+    @staticmethod
+    def _arrow_dataset(dataset, manifest, parts=None):
+        storage_dir = DatasetStore.get_storage_dir(dataset)
+        schema = pa.schema([(column['name'], ARROW_TYPES[column['type']]) for column in manifest['columns']])
+        files = [os.path.join(storage_dir, part['file']) for part in (manifest['parts'] if parts is None else parts)]
+        return pads.dataset(files, schema=schema, format='parquet')
+
+    @staticmethod
+    def _project(manifest, columns):
+        if columns is None:
+            return None
+        available = {column['name'] for column in manifest['columns']}
+        return [name for name in columns if name in available]
+
+    @staticmethod
+    def read_dataframe(dataset, columns=None, filters=None):
+        """
+        读取数据集为 DataFrame
+
+        columns 指定时只读取这些列；filters 为 [(列名, 运算符, 值), ...]，
+        列式存储会把条件下推到扫描中，借助行组统计信息跳过不满足条件的行组。
+        """
+        manifest = DatasetStore.load_manifest(dataset)
+        if manifest is None:
+            return DatasetStore._read_legacy_dataframe(dataset, columns, filters)
+        if not manifest['parts']:
+            return pd.DataFrame(columns=DatasetStore._project(manifest, columns) or [c['name'] for c in manifest['columns']])
+
+        table = DatasetStore._arrow_dataset(dataset, manifest).to_table(
+            columns=DatasetStore._project(manifest, columns),
+            filter=build_filter_expression(filters, [c['name'] for c in manifest['columns']])
+        )
+        return table.to_pandas()
+
+    @staticmethod
+    def iter_dataframes(dataset, columns=None, filters=None, batch_size=None, parts=None):
+        """
+        按数据块读取数据集，参数与 read_dataframe 相同，每块约 batch_size 行
+
+        各数据块的列类型保持一致：整数列和布尔列只要可能含有空值，每一块都分别转换为浮点列和 object 列，
+        而不是只有含空值的块才转换。是否含有空值由 Parquet 行组元数据中的空值数判断，不额外扫描数据；
+        没有 filters 时与一次性读取的列类型相同，有 filters 时按整个数据集判断（过滤后没有空值的列也可能被转换）。
+        parts 为清单中分片的子集时只读取这些分片（列类型仍按整个数据集确定），旧存储格式忽略该参数。
+        """
+        batch_size = batch_size or get_row_group_size()
+        manifest = DatasetStore.load_manifest(dataset)
+        if manifest is None:
+            df = DatasetStore._read_legacy_dataframe(dataset, columns, filters)
+            for start in range(0, len(df), batch_size):
+                yield df.iloc[start:start + batch_size].reset_index(drop=True)
+            return
+        if not manifest['parts']:
+            return
+
+        types = {column['name']: column['type'] for column in manifest['columns']}
+        names = DatasetStore._project(manifest, columns) or list(types)
+        nullable = DatasetStore._nullable_columns(
+            dataset, manifest, [name for name in names if types[name] in ('int64', 'bool')]
+        )
+        widened = {name: 'float64' if types[name] == 'int64' else object for name in nullable}
+
+        if parts is not None and not parts:
+            return
+        scanner = DatasetStore._arrow_dataset(dataset, manifest, parts).scanner(
+            columns=names,
+            filter=build_filter_expression(filters, list(types)),
+            batch_size=batch_size
+        )
+
+        def to_frame(batches):
+            df = pa.Table.from_batches(batches).to_pandas()
+            for name, dtype in widened.items():
+                df[name] = df[name].astype(dtype)
+            return df
+
+        pending, pending_rows = [], 0
+        for batch in scanner.to_batches():
+            if batch.num_rows == 0:
+                continue
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            if pending_rows >= batch_size:
+                yield to_frame(pending)
+                pending, pending_rows = [], 0
+        if pending:
+            yield to_frame(pending)
+
+    @staticmethod
+    def _nullable_columns(dataset, manifest, names):
+        """根据各分片行组元数据中的空值数，返回 names 中可能含有空值的列（缺少空值统计的按可能含有空值处理）"""
+        storage_dir = DatasetStore.get_storage_dir(dataset)
+        nullable = set()
+        for part in manifest['parts']:
+            remaining = [name for name in names if name not in nullable]
+            if not remaining:
+                break
+            metadata = pq.ParquetFile(os.path.join(storage_dir, part['file'])).metadata
+            present = set()
+            for index in range(metadata.num_row_groups):
+                row_group = metadata.row_group(index)
+                for position in range(row_group.num_columns):
+                    column = row_group.column(position)
+                    if column.path_in_schema not in remaining:
+                        continue
+                    present.add(column.path_in_schema)
+                    statistics = column.statistics
+                    if statistics is None or not statistics.has_null_count or statistics.null_count:
+                        nullable.add(column.path_in_schema)
+            # 分片中没有的列（之后追加的数据新增的列）在该分片中全为空值
+            if part['rows']:
+                nullable.update(name for name in remaining if name not in present)
+        return nullable
+
+    @staticmethod
+    def _read_legacy_dataframe(dataset, columns=None, filters=None):
+        from .models import DataRecord
+
+        rows = DataRecord.objects.filter(dataset=dataset).order_by('id').values_list('data', flat=True)
+        df = pd.DataFrame(list(rows.iterator(chunk_size=2000)))
+        if filters:
+            df = filter_dataframe(df, filters).reset_index(drop=True)
+        if columns is not None:
+            df = df[[name for name in columns if name in df.columns]]
+        return df
+
+    @staticmethod
+    def read_records(dataset, offset=0, limit=None, columns=None):
+        """按行号区间读取记录字典列表"""
+        return [row['data'] for row in DatasetStore.read_rows(dataset, offset, limit, columns)]
+
+    @staticmethod
+    def _select_ranges(sizes, offset=0, limit=None):
+        """按各段行数定位覆盖行号区间的段，返回 (段的位置列表, 第一个段的起始行号)"""
+        selected = []
+        start = 0
+        first_start = None
+        end = None if limit is None else offset + limit
+        for index, rows in enumerate(sizes):
+            if start + rows > offset and (end is None or start < end):
+                if first_start is None:
+                    first_start = start
+                selected.append(index)
+            start += rows
+        return selected, first_start
+
+    @staticmethod
+    def _select_parts(manifest, offset=0, limit=None):
+        """根据清单中的分片行数定位覆盖行号区间的分片，返回 (分片列表, 第一个分片的起始行号)"""
+        parts = manifest['parts']
+        selected, first_start = DatasetStore._select_ranges([part['rows'] for part in parts], offset, limit)
+        return [parts[index] for index in selected], first_start
+
+    @staticmethod
+    def iter_record_batches(dataset, offset=0, limit=None, columns=None, batch_size=None):
+        """
+        按行号区间逐块读取列式存储的数据集，产出保留存储类型的 pyarrow.Table，每块最多 batch_size 行
+
+        只读取覆盖区间的分片，分片内只解码覆盖区间的行组，内存占用与数据集大小无关；旧存储格式的数据集不产出任何数据。
+        """
+        manifest = DatasetStore.load_manifest(dataset)
+        if manifest is None:
+            return
+        selected, first_part_start = DatasetStore._select_parts(manifest, offset, limit)
+        if not selected:
+            return
+
+        # 逐个分片按批读取（数据集扫描器的预读和缓冲会让内存随读取量增长）
+        schema = DatasetStore.get_arrow_schema(dataset, columns)
+        storage_dir = DatasetStore.get_storage_dir(dataset)
+        batch_size = batch_size or get_row_group_size()
+        skip, remaining = offset - first_part_start, limit
+        for part in selected:
+            if skip >= part['rows']:
+                skip -= part['rows']
+                continue
+            parquet_file = pq.ParquetFile(os.path.join(storage_dir, part['file']))
+            available = set(parquet_file.schema_arrow.names)
+            metadata = parquet_file.metadata
+            row_groups, group_start = DatasetStore._select_ranges(
+                [metadata.row_group(index).num_rows for index in range(metadata.num_row_groups)], skip, remaining
+            )
+            skip -= group_start or 0
+            for batch in parquet_file.iter_batches(batch_size=batch_size, row_groups=row_groups,
+                                                   columns=[name for name in schema.names if name in available]):
+                if skip >= batch.num_rows:
+                    skip -= batch.num_rows
+                    continue
+                # 分片中缺少的列（之后追加的数据新增的列）补为空值，类型统一为清单中的类型
+                arrays = [
+                    batch.column(field.name).cast(field.type)
+                    if field.name in available else pa.nulls(batch.num_rows, type=field.type)
+                    for field in schema
+                ]
+                table = pa.Table.from_arrays(arrays, schema=schema).slice(skip)
+                skip = 0
+                if remaining is not None:
+                    table = table.slice(0, remaining)
+                    remaining -= table.num_rows
+                if table.num_rows:
+                    yield table
+                if remaining == 0:
+                    return
+
+    @staticmethod
+    def get_arrow_schema(dataset, columns=None):
+        """列式存储的 Arrow 结构（按 columns 投影），旧数据集返回 None"""
+        manifest = DatasetStore.load_manifest(dataset)
+        if manifest is None:
+            return None
+        types = {column['name']: column['type'] for column in manifest['columns']}
+        names = DatasetStore._project(manifest, columns) or list(types)
+        return pa.schema([(name, ARROW_TYPES[types[name]]) for name in names])
+
+    @staticmethod
+    def read_rows(dataset, offset=0, limit=None, columns=None):
+        """按行号区间读取记录，返回 [{'id', 'data', 'created_at'}]，列式存储的 id 为从 1 开始的行号"""
+        from .models import DataRecord
+
+        manifest = DatasetStore.load_manifest(dataset)
+        if manifest is None:
+            queryset = DataRecord.objects.filter(dataset=dataset).order_by('id')
+            queryset = queryset[offset:offset + limit] if limit is not None else queryset[offset:]
+            return DatasetStore._legacy_rows(queryset, columns)
+
+        created_at = dataset.created_at
+        rows = [
+            row
+            for table in DatasetStore.iter_record_batches(dataset, offset=offset, limit=limit, columns=columns)
+            for row in table.to_pylist()
+        ]
+        return [{'id': offset + index + 1, 'data': row, 'created_at': created_at} for index, row in enumerate(rows)]
+
+    @staticmethod
+    def _legacy_rows(queryset, columns=None):
+        rows = []
+        for record in queryset.values('id', 'data', 'created_at'):
+            if columns is not None and isinstance(record['data'], dict):
+                record['data'] = {name: record['data'].get(name) for name in columns}
+            rows.append(record)
+        return rows
+
+    @staticmethod
+    def read_rows_after(dataset, after=0, limit=100, columns=None):
+        """
+        键集分页：读取 id 大于 after 的前 limit 条记录，返回格式与 read_rows 相同
+
+        旧存储格式按 DataRecord 主键范围查询，不需要跳过前面的记录；列式存储的 id 就是行号，
+        按清单中各分片的行数直接定位到所在分片。因此翻到多深的页开销都与第一页相同。
+        """
+        from .models import DataRecord
+
+        if DatasetStore.is_columnar(dataset):
+            return DatasetStore.read_rows(dataset, offset=after, limit=limit, columns=columns)
+        queryset = DataRecord.objects.filter(dataset=dataset, id__gt=after).order_by('id')[:limit]
+        return DatasetStore._legacy_rows(queryset, columns)
+
+    @staticmethod
+    def _count_legacy_records(dataset):
+        """旧存储格式的记录数，按 (数据集, 内容版本) 缓存，记录变化后内容版本变化，缓存自然失效"""
+        key = f'dataset-row-count:{dataset.pk}:{dataset.content_version}'
+        count = cache.get(key)
+        if count is None:
+            count = dataset.datarecord_set.count()
+            cache.set(key, count, timeout=None)
+        return count
+
+    @staticmethod
+    def count_rows(dataset, filters=None):
+        """数据集行数，指定 filters 时返回满足条件的行数"""
+        manifest = DatasetStore.load_manifest(dataset)
+        if manifest is None:
+            if filters:
+                columns = [column for column, _, _ in filters]
+                return len(DatasetStore._read_legacy_dataframe(dataset, columns, filters))
+            return DatasetStore._count_legacy_records(dataset)
+        if not filters:
+            return manifest['row_count']
+        if not manifest['parts']:
+            return 0
+        return DatasetStore._arrow_dataset(dataset, manifest).count_rows(
+            filter=build_filter_expression(filters, [c['name'] for c in manifest['columns']])
+        )
+
+    @staticmethod
+    def get_columns(dataset):
+        """数据集列名"""
+        manifest = DatasetStore.load_manifest(dataset)
+        if manifest is not None:
+            return [column['name'] for column in manifest['columns']]
+
+        # 旧数据集：从前10条记录中收集列名
+        columns = []
+        for data in dataset.datarecord_set.order_by('id').values_list('data', flat=True)[:10]:
+            if isinstance(data, dict):
+                for key in data.keys():
+                    if key not in columns:
+                        columns.append(key)
+        return columns
+
+    @staticmethod
+    def get_column_types(dataset):
+        """列式存储的列类型 {列名: 类型名}，旧数据集返回 None"""
+        manifest = DatasetStore.load_manifest(dataset)
+        if manifest is None:
+            return None
+        return {column['name']: column['type'] for column in manifest['columns']}
+
+    @staticmethod
+    def open_writer(dataset, append=False, compat_records=None):
+        """打开写入器，append=False 时提交后替换数据集的全部数据"""
+        return DatasetWriter(dataset, append=append, compat_records=compat_records)
+
+    @staticmethod
+    def write_dataframe(dataset, df):
+        """用 DataFrame 替换数据集的全部数据，返回写入行数"""
+        with DatasetStore.open_writer(dataset) as writer:
+            writer.write_frame(df)
+            return writer.commit()
+
+    @staticmethod
+    def append_records(dataset, records):
+        """向数据集追加记录，返回追加的行数"""
+        from .models import DataRecord
+
+        if not records:
+            return 0
+
+        if not DatasetStore.is_columnar(dataset) and dataset.datarecord_set.exists():
+            # 已有 DataRecord 数据的旧数据集继续按行追加；旧存储只能整体重新统计，目录随内容版本过期，按需重新统计
+            with transaction.atomic():
+                DataRecord.objects.bulk_create(
+                    [DataRecord(dataset=dataset, data=record) for record in records],
+                    batch_size=1000
+                )
+                dataset.bump_content_version('append', rows_added=len(records))
+            return len(records)
+
+        with DatasetStore.open_writer(dataset, append=True) as writer:
+            writer.write_records(records)
+            writer.commit()
+            return writer.rows_written
+
+    @staticmethod
+    def delete_storage(dataset_id):
+        """删除数据集的全部列式存储文件"""
+        shutil.rmtree(os.path.join(get_storage_root(), str(dataset_id)), ignore_errors=True)
@@ -1,6 +1,719 @@
 # Copyright (c) 2025 YycKop
 # MIT License
 # Integrated-Data-Platform-backend/datasets/tests.py
-from django.test import TestCase
+import codecs
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+import pandas as pd
+import pyarrow.parquet as pq
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from users.models import UserProfile
+from . import catalog, ingest
+from .catalog import get_row_count, refresh_statistics
+from .db_utils import DatabaseConnector, engine_registry, get_server_config
+from .export import parse_export_format, stream_export
+from .ingest import CSV_ENCODINGS, candidate_encodings, iter_csv_chunks, iter_json_records
+from .models import DataSource, Dataset, DataRecord, DatasetChange, DatasetStatistics
+from .storage import COMPACT_SMALL_PARTS, DatasetStore, get_new_parts
+
+
+class QueryCountMixin:
+    """
+    列表接口查询数的回归检查
+
+    同一接口在数据条数增加前后各请求一次，两次的查询数必须相同（没有按行查询），
+    且不超过给定的上限。每次计数前先请求一次，首次请求时才计算的统计信息等不计入。
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = UserProfile.objects.create(username='admin', role='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self._user_count = 0
+
+    def make_user(self):
+        """每条数据使用不同的创建者，按行查询创建者时查询数会随条数增长"""
+        self._user_count += 1
+        return UserProfile.objects.create(username=f'user{self._user_count}')
+
+    def count_queries(self, url):
+        self.assertEqual(self.client.get(url).status_code, 200)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), [query['sql'] for query in context.captured_queries]
+
+    def assertListQueries(self, url, max_queries, add_rows):
+        """add_rows(n) 新增 n 条数据"""
+        add_rows(2)
+        before, _ = self.count_queries(url)
+        add_rows(8)
+        after, queries = self.count_queries(url)
+        detail = '\n'.join(queries)
+        self.assertEqual(before, after, f'{url} 的查询数随条数增长: {before} -> {after}\n{detail}')
+        self.assertLessEqual(after, max_queries, f'{url} 的查询数超过上限 {max_queries}: {after}\n{detail}')
+
+
+def create_dataset(user, data_source=None, records=2):
+    """创建带有若干条 DataRecord 记录的数据集"""
+    if data_source is None:
+        data_source = DataSource.objects.create(name=f'{user.username}-source', type='file', created_by=user)
+    dataset = Dataset.objects.create(
+        name=f'{user.username}-dataset', data_source=data_source, data_type='csv',
+        data_structure={'fields': ['name', 'value']}, created_by=user
+    )
+    DataRecord.objects.bulk_create([
+        DataRecord(dataset=dataset, data={'name': f'row{i}', 'value': i}) for i in range(records)
+    ])
+    return dataset
+
+
+class DatasetListQueryTests(QueryCountMixin, TestCase):
+
+    def add_datasets(self, count):
+        for _ in range(count):
+            create_dataset(self.make_user())
+
+    def test_data_source_list(self):
+        def add_rows(count):
+            for _ in range(count):
+                user = self.make_user()
+                DataSource.objects.create(name=f'{user.username}-source', type='file', created_by=user)
+
+        self.assertListQueries('/api/data-sources/', 1, add_rows)
+
+    def test_dataset_list(self):
+        self.assertListQueries('/api/datasets/', 1, self.add_datasets)
+
+    def test_data_source_files(self):
+        data_source = DataSource.objects.create(name='files', type='file', created_by=self.user)
+
+        def add_rows(count):
+            for _ in range(count):
+                create_dataset(self.make_user(), data_source)
+
+        self.assertListQueries(f'/api/data-sources/{data_source.id}/files/', 2, add_rows)
+
+    def test_ai_dataset_list(self):
+        def add_rows(count):
+            for _ in range(count):
+                create_dataset(self.user, DataSource.objects.create(name='ai', type='file', created_by=self.make_user()))
+
+        self.assertListQueries('/api/ai/datasets/', 1, add_rows)
+
+
+class StorageTestMixin:
+    """列式存储写入临时目录"""
+
+    def setUp(self):
+        super().setUp()
+        self.storage_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.storage_root, ignore_errors=True)
+        storage_settings = override_settings(DATASET_STORAGE_ROOT=self.storage_root, DATASET_KEEP_RECORDS=False)
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+
+
+class ColumnarDataRecordTests(StorageTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = UserProfile.objects.create(username='admin', role='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        data_source = DataSource.objects.create(name='files', type='file', created_by=self.user)
+        self.dataset = Dataset.objects.create(name='columnar', data_source=data_source, data_type='csv',
+                                              created_by=self.user)
+        DatasetStore.write_dataframe(self.dataset, pd.DataFrame({'name': ['a', 'b', 'c'], 'value': [1, 2, 3]}))
+
+    def test_create_appends_to_store(self):
+        response = self.client.post('/api/data-records/', {'dataset': self.dataset.id, 'data': {'name': 'd', 'value': 4}},
+                                    format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['id'], 4)
+
+        self.dataset.refresh_from_db()
+        self.assertEqual(get_row_count(self.dataset), 4)
+        self.assertEqual(DatasetStore.read_records(self.dataset, offset=3), [{'name': 'd', 'value': 4}])
+        self.assertFalse(DataRecord.objects.filter(dataset=self.dataset).exists())
+
+    def test_list_reads_store(self):
+        response = self.client.get('/api/data-records/', {'dataset': self.dataset.id, 'page': 2, 'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual([row['id'] for row in response.data['results']], [3])
+        self.assertEqual(response.data['results'][0]['data'], {'name': 'c', 'value': 3})
+
+    def test_update_and_delete_rejected(self):
+        other = create_dataset(self.user)
+        record = other.datarecord_set.first()
+
+        # 列式存储的行号与其他数据集的 DataRecord 主键相同时也不能误删
+        response = self.client.delete(f'/api/data-records/{record.id}/?dataset={self.dataset.id}')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(DataRecord.objects.filter(pk=record.id).exists())
+
+        # 列式存储数据集的兼容记录
+        compat = DataRecord.objects.create(dataset=self.dataset, data={'name': 'a', 'value': 1})
+        self.assertEqual(self.client.delete(f'/api/data-records/{compat.id}/').status_code, 400)
+        response = self.client.patch(f'/api/data-records/{compat.id}/', {'data': {'name': 'x'}}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(DataRecord.objects.get(pk=compat.id).data, {'name': 'a', 'value': 1})
+
+
+class CatalogReadPathTests(StorageTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = UserProfile.objects.create(username='admin', role='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_does_not_build_statistics(self):
+        legacy = create_dataset(self.user, records=3)
+        columnar = create_dataset(self.user, records=0)
+        DatasetStore.write_dataframe(columnar, pd.DataFrame({'name': ['a', 'b'], 'value': [1, 2]}))
+        # 模拟目录过期
+        Dataset.objects.filter(pk=columnar.pk).update(content_version=99)
+
+        response = self.client.get('/api/datasets/')
+        self.assertEqual(response.status_code, 200)
+        counts = {item['id']: item['record_count'] for item in response.data}
+        self.assertEqual(counts, {legacy.id: 3, columnar.id: 2})
+        self.assertFalse(DatasetStatistics.objects.filter(dataset=legacy).exists())
+        self.assertNotEqual(DatasetStatistics.objects.get(dataset=columnar).content_version, 99)
+
+    def test_record_change_invalidates_without_rescan(self):
+        dataset = create_dataset(self.user, records=2)
+        refresh_statistics(dataset)
+        with mock.patch('datasets.catalog._legacy_statistics', wraps=catalog._legacy_statistics) as legacy_statistics:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/api/data-records/',
+                                            {'dataset': dataset.id, 'data': {'name': 'x', 'value': 9}}, format='json')
+            self.assertEqual(response.status_code, 201)
+            DatasetStore.append_records(dataset, [{'name': 'y', 'value': 10}])
+            self.assertEqual(legacy_statistics.call_count, 0)
+
+            # 目录过期后列表读取仍得到最新行数，统计信息接口按需重新统计
+            response = self.client.get('/api/datasets/')
+            self.assertEqual(response.data[0]['record_count'], 4)
+            self.assertEqual(legacy_statistics.call_count, 0)
+            response = self.client.get(f'/api/datasets/{dataset.id}/statistics/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(legacy_statistics.call_count, 1)
+        dataset.refresh_from_db()
+        statistics = DatasetStatistics.objects.get(dataset=dataset)
+        self.assertEqual((statistics.content_version, statistics.row_count), (dataset.content_version, 4))
+
+
+class DataEndpointTests(StorageTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        # 旧存储格式的行数按 (数据集 id, 内容版本) 缓存，测试之间数据集 id 会重复
+        cache.clear()
+        self.user = UserProfile.objects.create(username='admin', role='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.legacy = create_dataset(self.user, records=5)
+        self.columnar = create_dataset(self.user, records=0)
+        DatasetStore.write_dataframe(self.columnar, pd.DataFrame({
+            'name': [f'row{i}' for i in range(5)], 'value': list(range(5))
+        }))
+
+    def get_data(self, dataset, **params):
+        return self.client.get(f'/api/datasets/{dataset.id}/data/', params)
+
+    def read_all_pages(self, dataset, **params):
+        """沿着 next_cursor 翻完所有页，返回每页的响应数据"""
+        pages = []
+        cursor = None
+        while True:
+            if cursor is not None:
+                params['cursor'] = cursor
+            response = self.get_data(dataset, **params)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data)
+            if not response.data['has_more']:
+                return pages
+            cursor = response.data['next_cursor']
+
+    def test_cursor_pages_through_both_layouts(self):
+        legacy_ids = list(DataRecord.objects.filter(dataset=self.legacy).order_by('id').values_list('id', flat=True))
+        for dataset, ids in [(self.legacy, legacy_ids), (self.columnar, [1, 2, 3, 4, 5])]:
+            with self.subTest(dataset=dataset.id):
+                pages = self.read_all_pages(dataset, page_size=2)
+                self.assertEqual([[row['id'] for row in page['records']] for page in pages],
+                                 [ids[0:2], ids[2:4], ids[4:5]])
+                self.assertEqual([page['has_more'] for page in pages], [True, True, False])
+                self.assertEqual([page['next_cursor'] for page in pages], [ids[1], ids[3], None])
+                self.assertIsNone(pages[-1]['next'])
+                self.assertEqual({page['total_count'] for page in pages}, {5})
+                self.assertEqual([row['data']['value'] for page in pages for row in page['records']],
+                                 [0, 1, 2, 3, 4])
+
+    def test_exact_last_page_has_no_more(self):
+        response = self.get_data(self.columnar, page_size=5)
+        self.assertEqual(len(response.data['records']), 5)
+        self.assertFalse(response.data['has_more'])
+        self.assertIsNone(response.data['next_cursor'])
+
+    def test_invalid_cursor_rejected(self):
+        for dataset in [self.legacy, self.columnar]:
+            for cursor in ['-1', 'abc']:
+                with self.subTest(dataset=dataset.id, cursor=cursor):
+                    self.assertEqual(self.get_data(dataset, cursor=cursor).status_code, 400)
+
+    def test_columns_projection(self):
+        for dataset in [self.legacy, self.columnar]:
+            with self.subTest(dataset=dataset.id):
+                response = self.get_data(dataset, columns='name', page_size=2)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([row['data'] for row in response.data['records']],
+                                 [{'name': 'row0'}, {'name': 'row1'}])
+
+    @override_settings(DATASET_ROW_GROUP_SIZE=10, DATASET_PART_ROW_GROUP_ROWS=2)
+    def test_page_reads_only_covering_row_groups(self):
+        dataset = create_dataset(self.user, records=0)
+        DatasetStore.write_dataframe(dataset, pd.DataFrame({'value': list(range(25))}))
+        storage_dir = DatasetStore.get_storage_dir(dataset)
+        part = DatasetStore.load_manifest(dataset)['parts'][0]
+        self.assertEqual(pq.ParquetFile(os.path.join(storage_dir, part['file'])).metadata.num_row_groups, 5)
+
+        with mock.patch.object(pq.ParquetFile, 'iter_batches', autospec=True,
+                               side_effect=pq.ParquetFile.iter_batches) as iter_batches:
+            # 第 9~13 行跨越第一、二个分片的行组边界
+            rows = DatasetStore.read_rows(dataset, offset=8, limit=5)
+        self.assertEqual([row['id'] for row in rows], [9, 10, 11, 12, 13])
+        self.assertEqual([row['data']['value'] for row in rows], [8, 9, 10, 11, 12])
+        self.assertEqual([call.kwargs['row_groups'] for call in iter_batches.call_args_list], [[4], [0, 1]])
+
+        rows = DatasetStore.read_rows(dataset, offset=23)
+        self.assertEqual([row['data']['value'] for row in rows], [23, 24])
+
+
+class DatasetChangeTests(StorageTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = UserProfile.objects.create(username='admin', role='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def changes(self, dataset):
+        return list(DatasetChange.objects.filter(dataset=dataset).values_list(
+            'version', 'operation', 'row_count', 'rows_added'
+        ))
+
+    def test_columnar_write_paths(self):
+        dataset = create_dataset(self.user, records=0)
+        DatasetStore.write_dataframe(dataset, pd.DataFrame({'name': ['a', 'b'], 'value': [1, 2]}))
+        DatasetStore.append_records(dataset, [{'name': 'c', 'value': 3}])
+        DatasetStore.write_dataframe(dataset, pd.DataFrame({'name': ['x'], 'value': [9]}))
+
+        self.assertEqual(self.changes(dataset), [(1, 'replace', 2, 2), (2, 'append', 3, 1), (3, 'replace', 1, 1)])
+        dataset.refresh_from_db()
+        self.assertEqual(dataset.content_version, 3)
+
+    def test_legacy_write_paths(self):
+        dataset = create_dataset(self.user, records=2)
+        DatasetStore.append_records(dataset, [{'name': 'c', 'value': 3}, {'name': 'd', 'value': 4}])
+
+        response = self.client.post('/api/data-records/', {'dataset': dataset.id, 'data': {'name': 'e', 'value': 5}},
+                                    format='json')
+        self.assertEqual(response.status_code, 201)
+        record_url = f'/api/data-records/{response.data["id"]}/'
+        response = self.client.patch(record_url, {'data': {'name': 'e', 'value': 6}}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.delete(record_url).status_code, 204)
+
+        self.assertEqual(self.changes(dataset), [
+            (1, 'append', None, 2), (2, 'records', None, 0), (3, 'records', None, 0), (4, 'records', None, 0)
+        ])
+        dataset.refresh_from_db()
+        self.assertEqual(dataset.content_version, 4)
+
+    def test_failed_write_records_nothing(self):
+        dataset = create_dataset(self.user, records=0)
+        DatasetStore.write_dataframe(dataset, pd.DataFrame({'name': ['a'], 'value': [1]}))
+        with self.assertRaises(RuntimeError):
+            with DatasetStore.open_writer(dataset) as writer:
+                writer.write_records([{'name': 'b', 'value': 2}])
+                raise RuntimeError('interrupted')
+
+        self.assertEqual(self.changes(dataset), [(1, 'replace', 1, 1)])
+
+
+@override_settings(DATASET_ROW_GROUP_SIZE=2)
+class IterDataframesTests(StorageTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = UserProfile.objects.create(username='admin', role='admin')
+        self.dataset = create_dataset(self.user, records=0)
+
+    def test_widening_from_row_group_metadata(self):
+        DatasetStore.write_dataframe(self.dataset, pd.DataFrame({
+            'full': [1, 2, 3, 4],
+            'sparse': pd.array([1, 2, 3, None], dtype='Int64'),
+            'flag': [True, False, True, False],
+        }))
+        DatasetStore.append_records(self.dataset, [{'full': 5, 'sparse': 5, 'flag': True, 'added': 1}])
+
+        chunks = list(DatasetStore.iter_dataframes(self.dataset, batch_size=2))
+        self.assertEqual(sum(len(chunk) for chunk in chunks), 5)
+        for chunk in chunks:
+            self.assertEqual(str(chunk['full'].dtype), 'int64')
+            self.assertEqual(str(chunk['flag'].dtype), 'bool')
+            # 空值只在第二个分片中，新增的列在前两个分片中没有
+            self.assertEqual(str(chunk['sparse'].dtype), 'float64')
+            self.assertEqual(str(chunk['added'].dtype), 'float64')
+        self.assertEqual(
+            {name: str(dtype) for name, dtype in DatasetStore.read_dataframe(self.dataset).dtypes.items()},
+            {name: str(dtype) for name, dtype in chunks[0].dtypes.items()}
+        )
+
+
+class ConcurrentWriteTests(StorageTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = UserProfile.objects.create(username='admin', role='admin')
+        self.dataset = create_dataset(self.user, records=0)
+        DatasetStore.write_dataframe(self.dataset, pd.DataFrame({'name': ['a'], 'value': [1]}))
+
+    def stale_writer(self):
+        # 每个请求各自读取数据集记录
+        return DatasetStore.open_writer(Dataset.objects.get(pk=self.dataset.pk), append=True)
+
+    def test_concurrent_appends_keep_both(self):
+        with self.stale_writer() as first, self.stale_writer() as second:
+            first.write_records([{'name': 'b', 'value': 2}])
+            second.write_records([{'name': 'c', 'value': 3, 'extra': 'x'}])
+            with self.captureOnCommitCallbacks(execute=True):
+                first.commit()
+            with self.captureOnCommitCallbacks(execute=True):
+                second.commit()
+
+        self.dataset.refresh_from_db()
+        df = DatasetStore.read_dataframe(self.dataset)
+        self.assertEqual(df['name'].tolist(), ['a', 'b', 'c'])
+        self.assertEqual(df['extra'].tolist(), [None, None, 'x'])
+        self.assertEqual(os.listdir(os.path.join(self.storage_root, str(self.dataset.pk))),
+                         [os.path.basename(self.dataset.storage_path)])
+        files = [part['file'] for part in DatasetStore.load_manifest(self.dataset)['parts']]
+        self.assertEqual(len(set(files)), 3)
+
+    def test_conflicting_types_fail(self):
+        with self.stale_writer() as first, self.stale_writer() as second:
+            first.write_records([{'name': 'b', 'value': 2.5}])
+            second.write_records([{'name': 'c', 'value': 3}])
+            first.commit()
+            version_dir = second.version_dir
+            with self.assertRaises(ValueError):
+                second.commit()
+        self.assertFalse(os.path.exists(version_dir))
+        self.dataset.refresh_from_db()
+        self.assertEqual(DatasetStore.read_dataframe(self.dataset)['value'].tolist(), [1.0, 2.5])
+
+
+@override_settings(DATASET_ROW_GROUP_SIZE=4)
+class CompactionTests(StorageTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = UserProfile.objects.create(username='admin', role='admin')
+        self.dataset = create_dataset(self.user, records=0)
+        DatasetStore.write_dataframe(self.dataset, pd.DataFrame({'name': ['a', 'b', 'c', 'd'], 'value': [0, 1, 2, 3]}))
+
+    def test_single_record_appends_are_merged(self):
+        statistics = refresh_statistics(self.dataset)
+        for value in range(4, 30):
+            DatasetStore.append_records(self.dataset, [{'name': None if value % 5 == 0 else 'x', 'value': value}])
+            self.dataset.refresh_from_db()
+            parts = DatasetStore.load_manifest(self.dataset)['parts']
+            self.assertLessEqual(len(parts), COMPACT_SMALL_PARTS + 7)
+            self.assertEqual(len(os.listdir(DatasetStore.get_storage_dir(self.dataset))), len(parts) + 1)
+
+        self.assertTrue(any(part.get('merged_from') for part in parts))
+        with mock.patch('datasets.catalog._part_statistics', wraps=catalog._part_statistics) as part_statistics:
+            DatasetStore.append_records(self.dataset, [{'name': 'y', 'value': 30}])
+        self.assertEqual(part_statistics.call_count, 1)
+        self.dataset.refresh_from_db()
+        parts = DatasetStore.load_manifest(self.dataset)['parts']
+        self.assertEqual(DatasetStore.read_dataframe(self.dataset)['value'].tolist(), list(range(31)))
+        # 合并后统计信息仍按新增分片增量刷新，结果与重新统计相同
+        statistics = DatasetStatistics.objects.get(dataset=self.dataset)
+        self.assertEqual(statistics.parts, [part['file'] for part in parts])
+        incremental = {column['name']: column for column in statistics.columns}
+        DatasetStatistics.objects.all().delete()
+        rebuilt = {column['name']: column for column in refresh_statistics(self.dataset).columns}
+        self.assertEqual(incremental, rebuilt)
+        self.assertEqual(statistics.row_count, 31)
+
+    def test_new_parts_after_merge(self):
+        manifest = {'parts': [{'file': 'a', 'rows': 4}, {'file': 'm', 'rows': 3, 'merged_from': ['b', 'c']},
+                              {'file': 'd', 'rows': 1}]}
+        self.assertEqual(get_new_parts(manifest, ['a', 'b', 'c']), [{'file': 'd', 'rows': 1}])
+        self.assertEqual(get_new_parts(manifest, ['a', 'm']), [{'file': 'd', 'rows': 1}])
+        self.assertIsNone(get_new_parts(manifest, ['a', 'b']))
+        self.assertIsNone(get_new_parts(manifest, ['a', 'x']))
+
+
+class JsonIngestTests(TestCase):
+
+    RECORDS = [
+        {'id': 1, 'name': '中文名称', 'value': 12345.678, 'big': 2 ** 62, 'neg': -1e-10},
+        {'id': 2, 'name': 'emoji 😀 \\ "quoted"', 'value': None, 'flag': True, 'nested': {'a': [1, 2.5]}},
+        {'id': 3, 'name': '中', 'value': 0, 'flag': False},
+    ]
+
+    def parse(self, text, read_size, ndjson=False):
+        return list(iter_json_records(io.BytesIO(text.encode('utf-8')), ndjson=ndjson, read_size=read_size))
+
+    def test_buffer_boundaries(self):
+        # ensure_ascii=False 保留多字节字符，ensure_ascii=True 产生 \\uXXXX 转义
+        for ensure_ascii in [False, True]:
+            text = json.dumps(self.RECORDS, ensure_ascii=ensure_ascii, indent=1)
+            for read_size in [1, 2, 3, 5, 7, 64, len(text)]:
+                self.assertEqual(self.parse(text, read_size), self.RECORDS, (ensure_ascii, read_size))
+
+    def test_data_wrapper(self):
+        text = json.dumps({'total': 3, 'data': self.RECORDS, 'page': {'next': None}}, ensure_ascii=False)
+        for read_size in [1, 4, 1024]:
+            self.assertEqual(self.parse(text, read_size), self.RECORDS)
+        # 没有数据数组时整个对象作为一条记录
+        self.assertEqual(self.parse('{"data": 5, "name": "x"}', 3), [{'data': 5, 'name': 'x'}])
+        self.assertEqual(self.parse('{}', 1), [{}])
+
+    def test_empty_inputs(self):
+        for text in ['[]', ' [ ] ', '﻿[]', '', '  \n']:
+            self.assertEqual(self.parse(text, 1), [], repr(text))
+        self.assertEqual(self.parse('{"records": []}', 2), [])
+
+    def test_ndjson(self):
+        text = '\n'.join(json.dumps(record, ensure_ascii=False) for record in self.RECORDS) + '\n'
+        for read_size in [1, 6, 1024]:
+            self.assertEqual(self.parse(text, read_size, ndjson=True), self.RECORDS)
+            # 未声明 NDJSON 时，第一个对象之后的值同样按 NDJSON 解析
+            self.assertEqual(self.parse(text, read_size), self.RECORDS)
+
+    def test_invalid_json(self):
+        for text in ['[1, 2', '[1 2]', '{"a" 1}', '"text"']:
+            with self.assertRaises(ValueError, msg=text):
+                self.parse(text, 2)
+
+
+class CsvIngestTests(TestCase):
+
+    def test_candidate_encodings(self):
+        text = '名称,数值\n苹果,1\n'
+        self.assertEqual(candidate_encodings(codecs.BOM_UTF8 + text.encode('utf-8')),
+                         ['utf-8-sig', 'gbk', 'gb2312', 'latin-1'])
+        self.assertEqual(candidate_encodings(text.encode('utf-8')), CSV_ENCODINGS)
+        # 文件头截断在多字节字符中间时仍识别为 UTF-8
+        self.assertEqual(candidate_encodings(text.encode('utf-8')[:4])[0], 'utf-8')
+        self.assertEqual(candidate_encodings(text.encode('gbk')), ['gbk', 'gb2312', 'latin-1'])
+        self.assertEqual(candidate_encodings(b'\x81\xff\xfe'), ['latin-1'])
+
+    def test_iter_csv_chunks(self):
+        rows = [f'名称{index},{index}' for index in range(5)]
+        for encoding in ['utf-8', 'gbk']:
+            file = io.BytesIO(('name,value\n' + '\n'.join(rows) + '\n').encode(encoding))
+            chunks = list(iter_csv_chunks(file, encoding, chunk_size=2))
+            self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+            df = pd.concat(chunks, ignore_index=True)
+            self.assertEqual(df['name'].tolist(), [f'名称{index}' for index in range(5)])
+            self.assertEqual(df['value'].tolist(), list(range(5)))
+            # 只解除包装，上传文件仍可继续读取
+            self.assertFalse(file.closed)
+
+    def test_wrong_encoding_raises(self):
+        file = io.BytesIO('名称\n苹果\n'.encode('gbk'))
+        with self.assertRaises(UnicodeDecodeError):
+            list(iter_csv_chunks(file, 'utf-8'))
+        self.assertEqual(len(list(iter_csv_chunks(file, 'gbk'))), 1)
+
+
+@override_settings(DATASET_ROW_GROUP_SIZE=3, DATASET_EXPORT_BATCH_ROWS=2)
+class ExportTests(StorageTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = UserProfile.objects.create(username='admin', role='admin')
+        self.legacy = create_dataset(self.user, records=5)
+        self.columnar = create_dataset(self.user, records=0)
+        DatasetStore.write_dataframe(self.columnar, pd.DataFrame({
+            'name': [f'row{i}' for i in range(5)], 'value': list(range(5)),
+        }))
+        self.columnar.refresh_from_db()
+
+    def export(self, dataset, export_format, offset=0, limit=None):
+        export_format, use_gzip = parse_export_format(export_format)
+        stream, _, filename = stream_export(dataset, export_format, use_gzip, offset=offset, limit=limit)
+        data = b''.join(stream)
+        return (gzip.decompress(data) if use_gzip else data), filename
+
+    def expected(self, start=0, stop=5):
+        return [{'name': f'row{i}', 'value': i} for i in range(start, stop)]
+
+    def parse_csv(self, data):
+        rows = list(csv.reader(io.StringIO(data.decode('utf-8'))))
+        return rows[0], [{'name': name, 'value': int(value)} for name, value in rows[1:]]
+
+    def test_formats(self):
+        for dataset in [self.legacy, self.columnar]:
+            label = dataset.storage_format
+            data, filename = self.export(dataset, 'csv')
+            self.assertEqual(self.parse_csv(data), (['name', 'value'], self.expected()), label)
+            self.assertEqual(filename, f'{dataset.name}.csv')
+
+            data, _ = self.export(dataset, 'ndjson')
+            self.assertEqual([json.loads(line) for line in data.decode('utf-8').splitlines()], self.expected(), label)
+
+            data, _ = self.export(dataset, 'json')
+            self.assertEqual(json.loads(data), {'data': self.expected(), 'total': 5, 'dataset_name': dataset.name},
+                             label)
+
+            data, _ = self.export(dataset, 'parquet')
+            table = pq.read_table(io.BytesIO(data))
+            self.assertEqual(table.column_names, ['name', 'value'], label)
+            # 旧记录存储的值类型不统一，按字符串导出
+            values = table.column('value').to_pylist()
+            self.assertEqual(values, list(range(5)) if dataset is self.columnar else [str(i) for i in range(5)], label)
+
+    def test_gzip(self):
+        for dataset in [self.legacy, self.columnar]:
+            data, filename = self.export(dataset, 'csv.gz')
+            self.assertEqual(data, self.export(dataset, 'csv')[0])
+            self.assertEqual(filename, f'{dataset.name}.csv.gz')
+        with self.assertRaises(ValueError):
+            parse_export_format('parquet', 'gzip')
+        with self.assertRaises(ValueError):
+            parse_export_format('xlsx')
+
+    def test_offset_and_limit(self):
+        for dataset in [self.legacy, self.columnar]:
+            for offset, limit in [(1, 3), (2, None), (4, 10), (0, 0)]:
+                stop = 5 if limit is None else min(offset + limit, 5)
+                data, _ = self.export(dataset, 'ndjson', offset=offset, limit=limit)
+                rows = [json.loads(line) for line in data.decode('utf-8').splitlines()]
+                self.assertEqual(rows, self.expected(offset, stop), (dataset.storage_format, offset, limit))
+
+    def test_empty_csv_has_header(self):
+        empty = create_dataset(self.user, records=0)
+        self.assertEqual(self.export(empty, 'csv')[0].decode('utf-8').splitlines(), ['name,value'])
+        data, _ = self.export(self.columnar, 'csv', offset=10)
+        self.assertEqual(self.parse_csv(data), (['name', 'value'], []))
+        self.assertEqual(json.loads(self.export(empty, 'json')[0])['data'], [])
+
+
+class EngineRegistryTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        engine_registry.clear()
+        self.addCleanup(engine_registry.clear)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.user = UserProfile.objects.create(username='admin', role='admin')
+        self.config = {'db_type': 'sqlite', 'database': os.path.join(directory, 'source.sqlite3')}
+        self.other_config = {'db_type': 'sqlite', 'database': os.path.join(directory, 'other.sqlite3')}
+
+    def test_engine_reused_per_config(self):
+        engine = engine_registry.get_engine(self.config)
+        self.assertIs(engine_registry.get_engine(dict(self.config)), engine)
+        self.assertIsNot(engine_registry.get_engine(self.other_config), engine)
+        self.assertEqual(len(engine_registry), 2)
+
+    def test_config_change_invalidates_engines(self):
+        data_source = DataSource.objects.create(name='db', type='database', connection_config=self.config,
+                                                created_by=self.user)
+        engine = engine_registry.get_engine(self.config)
+        server_engine = engine_registry.get_engine(get_server_config(self.config))
+        other_engine = engine_registry.get_engine(self.other_config)
+
+        # 只修改名称不释放引擎
+        with self.captureOnCommitCallbacks(execute=True):
+            data_source.name = 'renamed'
+            data_source.save()
+        self.assertIs(engine_registry.get_engine(self.config), engine)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            data_source.connection_config = dict(self.config, password='changed')
+            data_source.save()
+        self.assertEqual(len(engine_registry), 1)
+        self.assertIsNot(engine_registry.get_engine(self.config), engine)
+        self.assertIsNot(engine_registry.get_engine(get_server_config(self.config)), server_engine)
+        self.assertIs(engine_registry.get_engine(self.other_config), other_engine)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            new_engine = engine_registry.get_engine(data_source.connection_config)
+            data_source.delete()
+        self.assertIsNot(engine_registry.get_engine(data_source.connection_config), new_engine)
+
+
+@override_settings(DATASET_INGEST_CHUNK_SIZE=3)
+class ImportTableDataTests(StorageTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        engine_registry.clear()
+        self.addCleanup(engine_registry.clear)
+        self.user = UserProfile.objects.create(username='admin', role='admin')
+        self.data_source = DataSource.objects.create(name='db', type='database', created_by=self.user)
+        self.config = {'db_type': 'sqlite', 'database': os.path.join(self.storage_root, 'source.sqlite3')}
+        with sqlite3.connect(self.config['database']) as conn:
+            conn.execute('CREATE TABLE items (name TEXT, value INTEGER)')
+            conn.executemany('INSERT INTO items VALUES (?, ?)', [(f'row{i}', i) for i in range(7)])
+        conn.close()
+
+    def import_items(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return DatabaseConnector.import_table_data(self.config, 'items', 'items', self.user, self.data_source)
+
+    def test_chunked_import(self):
+        with mock.patch('datasets.ingest.normalize_frame', wraps=ingest.normalize_frame) as normalize_frame:
+            success, message, dataset_id = self.import_items()
+        self.assertTrue(success, message)
+        self.assertEqual([len(call.args[0]) for call in normalize_frame.call_args_list], [3, 3, 1])
+
+        dataset = Dataset.objects.get(pk=dataset_id)
+        self.assertTrue(DatasetStore.is_columnar(dataset))
+        self.assertEqual(dataset.data_structure['fields'], ['name', 'value'])
+        self.assertEqual(dataset.description, '从数据库表 items 导入的数据，共 7 条记录')
+        frame = DatasetStore.read_dataframe(dataset)
+        self.assertEqual(frame['value'].tolist(), list(range(7)))
+        self.assertEqual(str(frame['value'].dtype), 'int64')
+
+    def test_failure_mid_stream_removes_dataset(self):
+        calls = []
+
+        def fail_on_second_chunk(frame):
+            calls.append(len(frame))
+            if len(calls) == 2:
+                raise RuntimeError('connection lost')
+            return ingest.normalize_frame(frame)
+
+        with mock.patch('datasets.ingest.normalize_frame', side_effect=fail_on_second_chunk):
+            success, message, dataset_id = self.import_items()
+        self.assertFalse(success)
+        self.assertIsNone(dataset_id)
+        self.assertIn('connection lost', message)
+        self.assertEqual(calls, [3, 3])
+        self.assertFalse(Dataset.objects.exists())
+        self.assertEqual(os.listdir(self.storage_root), ['source.sqlite3'])
@@ -4,23 +4,51 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.utils import timezone
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.utils.urls import replace_query_param
+from django.db import transaction
+from django.conf import settings
 from django.db.models import Q
+from django.http import StreamingHttpResponse
 import json
+import math
 import pandas as pd
-from io import StringIO, BytesIO
+from io import BytesIO
 
 # 确保正确导入 DatabaseConnector
 from .models import DataSource, Dataset, DataRecord
 from .serializers import DataSourceSerializer, DatasetSerializer, DataRecordSerializer
 from .db_utils import DatabaseConnector
+from .storage import DatasetStore
+from .catalog import describe_statistics, get_column_names, get_row_count, get_statistics
+from .export import parse_export_format, stream_export
+from .ingest import (
+    IngestProgress,
+    candidate_encodings,
+    get_ingest_chunk_size,
+    iter_batches,
+    iter_csv_chunks,
+    iter_json_records,
+    normalize_frame,
+    read_prefix
+)
 
 # 导入活动记录功能
 from activities.utils import create_dataset_activity, create_data_source_activity
 
 
+def get_data_page_size(value):
+    """每页记录数，不超过 DATASET_DATA_MAX_PAGE_SIZE"""
+    max_page_size = int(getattr(settings, 'DATASET_DATA_MAX_PAGE_SIZE', 1000))
+    page_size = int(value) if value else int(getattr(settings, 'DATASET_DATA_PAGE_SIZE', 100))
+    if page_size <= 0:
+        raise ValueError('page_size 必须大于 0')
+    return min(page_size, max_page_size)
+
+
 class IsAdminOrReadOnly(permissions.BasePermission):
     """管理员可以编辑，其他认证用户只能查看"""
 
@@ -45,7 +73,7 @@ class DataSourceViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         # 所有认证用户都可以看到所有数据源
-        return DataSource.objects.all()
+        return DataSource.objects.select_related('created_by')
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve', 'files']:
@@ -117,14 +145,14 @@ class DataSourceViewSet(viewsets.ModelViewSet):
             }
 
             # 根据文件类型处理
-            if file.name.lower().endswith('.json'):
+            if file.name.lower().endswith(('.json', '.ndjson', '.jsonl')):
                 return self._handle_json_file(file, data_source, request.user, file_info)
             elif file.name.lower().endswith('.csv'):
                 return self._handle_csv_file(file, data_source, request.user, file_info)
             elif file.name.lower().endswith(('.xlsx', '.xls')):
                 return self._handle_excel_file(file, data_source, request.user, file_info)
             else:
-                return Response({'error': '不支持的文件格式，仅支持 CSV、Excel、JSON'},
+                return Response({'error': '不支持的文件格式，仅支持 CSV、Excel、JSON、NDJSON'},
                                 status=status.HTTP_400_BAD_REQUEST)
 
         except Exception as e:
@@ -135,63 +163,15 @@ class DataSourceViewSet(viewsets.ModelViewSet):
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     def _handle_json_file(self, file, data_source, user, file_info):
-        """处理JSON文件 - 修复版本"""
+        """处理JSON/NDJSON文件 - 增量解析，记录逐条清理后分批写入"""
         try:
-            # 重置文件指针
-            file.seek(0)
-
-            # 读取文件内容
-            file_content = file.read().decode('utf-8')
-
-            if not file_content.strip():
-                return Response({'error': 'JSON文件为空'}, status=status.HTTP_400_BAD_REQUEST)
-
-            # 解析JSON
-            json_data = json.loads(file_content)
-            print(f"原始JSON数据类型: {type(json_data)}")
-
-            # 统一处理为记录列表
-            records_to_save = []
-
-            if isinstance(json_data, list):
-                # 如果是数组格式，直接使用
-                records_to_save = json_data
-                print(f"数组格式，记录数: {len(records_to_save)}")
-
-            elif isinstance(json_data, dict):
-                # 如果是对象格式，查找常见的数据字段
-                data_fields = ['RECORDS', 'records', 'data', 'items', 'results']
-                found_data = False
-
-                for field in data_fields:
-                    if field in json_data and isinstance(json_data[field], list):
-                        records_to_save = json_data[field]
-                        print(f"找到数据字段 '{field}'，记录数: {len(records_to_save)}")
-                        found_data = True
-                        break
-
-                if not found_data:
-                    # 如果没有找到数据字段，将整个对象作为单条记录
-                    records_to_save = [json_data]
-                    print("对象格式，作为单条记录处理")
-            else:
-                return Response({'error': '不支持的JSON格式'}, status=status.HTTP_400_BAD_REQUEST)
+            ndjson = file.name.lower().endswith(('.ndjson', '.jsonl'))
+            cleaned_records = self._iter_cleaned_json_records(iter_json_records(file, ndjson=ndjson))
 
-            if not records_to_save:
-                return Response({'error': 'JSON数据为空'}, status=status.HTTP_400_BAD_REQUEST)
-
-            # 清理数据，确保JSON可序列化
-            cleaned_records = []
-            for record in records_to_save:
-                try:
-                    cleaned_record = self._clean_json_data(record)
-                    cleaned_records.append(cleaned_record)
-                except Exception as e:
-                    print(f"清理记录时出错，跳过: {str(e)}")
-                    continue
-
-            if not cleaned_records:
-                return Response({'error': '所有数据记录都无法处理'}, status=status.HTTP_400_BAD_REQUEST)
+            first_record = next(cleaned_records, None)
+            if first_record is None:
+                return Response({'error': 'JSON数据为空或所有数据记录都无法处理'},
+                                status=status.HTTP_400_BAD_REQUEST)
 
             # 创建数据集
             dataset_name = f"{data_source.name} - {file.name}"
@@ -200,22 +180,24 @@ class DataSourceViewSet(viewsets.ModelViewSet):
                 data_source=data_source,
                 data_type='json',
                 description=f'从文件 {file.name} 导入的JSON数据，大小: {file.size} 字节',
-                data_structure={'fields': list(cleaned_records[0].keys())} if cleaned_records else {},
+                data_structure={'fields': list(first_record.keys())},
                 created_by=user
             )
 
-            # 批量创建数据记录
-            records_created = 0
-            batch_size = 50
-
-            for i in range(0, len(cleaned_records), batch_size):
-                batch = cleaned_records[i:i + batch_size]
-                data_records = [
-                    DataRecord(dataset=dataset, data=record)
-                    for record in batch
-                ]
-                DataRecord.objects.bulk_create(data_records)
-                records_created += len(batch)
+            progress = IngestProgress(dataset.name)
+            try:
+                # 写入数据集列式存储
+                with DatasetStore.open_writer(dataset) as writer:
+                    writer.write_records([first_record])
+                    progress.add(1)
+                    for batch in iter_batches(cleaned_records, get_ingest_chunk_size()):
+                        writer.write_records(batch)
+                        progress.add(len(batch))
+                    records_created = writer.commit()
+            except Exception:
+                # 文件后半部分解析失败时不保留不完整的数据集
+                dataset.delete()
+                raise
 
             # 创建数据集活动记录
             create_dataset_activity(
@@ -227,53 +209,132 @@ class DataSourceViewSet(viewsets.ModelViewSet):
 
             file_info['records_created'] = records_created
             file_info['dataset_id'] = dataset.id
-            file_info['total_records'] = len(cleaned_records)
+            file_info['total_records'] = progress.rows
+            file_info.update(progress.summary())
+
+            print(f"✅ JSON导入完成: {progress.rows} 条记录, {progress.rows_per_second:.0f} 条/秒")
 
             return Response({
                 'message': 'JSON文件上传成功',
                 'file_info': file_info,
                 'data_source_id': data_source.id,
                 'records_created': records_created,
-                'total_records': len(cleaned_records),
+                'total_records': progress.rows,
                 'dataset_id': dataset.id
             })
 
         except json.JSONDecodeError as e:
             return Response({'error': f'JSON文件解析失败: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             print(f"处理JSON文件时出错: {str(e)}")
             import traceback
             print(f"详细错误: {traceback.format_exc()}")
             return Response({'error': f'处理JSON文件时出错: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def _iter_cleaned_json_records(self, records):
+        """逐条清理记录，跳过无法处理的记录"""
+        for record in records:
+            try:
+                yield self._clean_json_data(record)
+            except Exception as e:
+                print(f"清理记录时出错，跳过: {str(e)}")
+                continue
+
+    def _clean_json_data(self, record):
+        """清理单条记录，确保JSON可序列化；非对象记录保存为 {'value': 记录}"""
+        if not isinstance(record, dict):
+            record = {'value': record}
+        return {str(key): self._clean_json_value(value) for key, value in record.items()}
+
+    def _clean_json_value(self, value):
+        if isinstance(value, dict):
+            return {str(key): self._clean_json_value(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._clean_json_value(item) for item in value]
+        if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+            return None
+        if value is None or isinstance(value, (str, int, float, bool)):
+            return value
+        return str(value)
+
     def _handle_csv_file(self, file, data_source, user, file_info):
-        """处理CSV文件 - 修复版本"""
+        """处理CSV文件 - 流式分块导入，按文件头探测编码"""
         try:
-            # 重置文件指针
-            file.seek(0)
-
-            # 使用pandas读取CSV文件，处理各种编码
-            file_content = file.read()
-
-            # 尝试不同编码
-            encodings = ['utf-8', 'gbk', 'gb2312', 'latin-1']
-            df = None
+            encodings = candidate_encodings(read_prefix(file))
 
-            for encoding in encodings:
+            for index, encoding in enumerate(encodings):
                 try:
-                    file_content_decoded = file_content.decode(encoding)
-                    df = pd.read_csv(StringIO(file_content_decoded))
-                    print(f"成功使用 {encoding} 编码读取CSV文件")
-                    break
-                except (UnicodeDecodeError, Exception) as e:
+                    chunks = iter_csv_chunks(file, encoding)
+                    first_chunk = next(chunks, None)
+                except UnicodeDecodeError as e:
                     print(f"编码 {encoding} 失败: {str(e)}")
                     continue
+                except pd.errors.EmptyDataError:
+                    return Response({'error': '文件数据为空'}, status=status.HTTP_400_BAD_REQUEST)
+
+                if first_chunk is None or first_chunk.empty:
+                    return Response({'error': '文件数据为空'}, status=status.HTTP_400_BAD_REQUEST)
+
+                print(f"使用 {encoding} 编码流式读取CSV文件")
+
+                # 创建数据集
+                dataset_name = f"{data_source.name} - {file.name}"
+                dataset = Dataset.objects.create(
+                    name=dataset_name,
+                    data_source=data_source,
+                    data_type='csv',
+                    description=f'从文件 {file.name} 导入的数据，大小: {file.size} 字节',
+                    data_structure={'fields': first_chunk.columns.tolist()},
+                    created_by=user
+                )
 
-            if df is None:
-                return Response({'error': '无法解析CSV文件，请检查文件编码'},
-                                status=status.HTTP_400_BAD_REQUEST)
+                progress = IngestProgress(dataset.name)
+                try:
+                    # 每个数据块直接写入数据集列式存储
+                    with DatasetStore.open_writer(dataset) as writer:
+                        writer.write_frame(first_chunk)
+                        progress.add(len(first_chunk))
+                        for chunk in chunks:
+                            writer.write_frame(chunk)
+                            progress.add(len(chunk))
+                        records_created = writer.commit()
+                except UnicodeDecodeError as e:
+                    # 文件后半部分无法用探测到的编码解码，换下一个编码重新导入
+                    print(f"编码 {encoding} 在第 {progress.rows} 行之后失败: {str(e)}")
+                    dataset.delete()
+                    if index == len(encodings) - 1:
+                        raise
+                    continue
 
-            return self._handle_dataframe(df, file, data_source, user, file_info, 'csv')
+                # 创建数据集活动记录
+                create_dataset_activity(
+                    user=user,
+                    dataset_name=dataset.name,
+                    dataset_id=dataset.id,
+                    action='created'
+                )
+
+                file_info['records_created'] = records_created
+                file_info['dataset_id'] = dataset.id
+                file_info['total_rows'] = progress.rows
+                file_info['encoding'] = encoding
+                file_info.update(progress.summary())
+
+                print(f"✅ CSV导入完成: {progress.rows} 行, {progress.rows_per_second:.0f} 行/秒")
+
+                return Response({
+                    'message': 'CSV文件上传成功',
+                    'file_info': file_info,
+                    'data_source_id': data_source.id,
+                    'records_created': records_created,
+                    'total_rows': progress.rows,
+                    'rows_per_second': file_info['rows_per_second']
+                })
+
+            return Response({'error': '无法解析CSV文件，请检查文件编码'},
+                            status=status.HTTP_400_BAD_REQUEST)
 
         except Exception as e:
             print(f"处理CSV文件时出错: {str(e)}")
@@ -299,16 +360,8 @@ class DataSourceViewSet(viewsets.ModelViewSet):
             if df.empty:
                 return Response({'error': '文件数据为空'}, status=status.HTTP_400_BAD_REQUEST)
 
-            # 清理数据：处理NaN值和非JSON可序列化类型
-            df_cleaned = df.where(pd.notnull(df), None)
-
-            # 确保所有数据都是JSON可序列化的
-            for col in df_cleaned.columns:
-                # 转换非JSON可序列化的类型
-                if df_cleaned[col].dtype == 'object':
-                    df_cleaned[col] = df_cleaned[col].apply(
-                        lambda x: str(x) if not isinstance(x, (str, int, float, bool, type(None))) else x
-                    )
+            # 按列一次性规范化数据类型：空值、日期时间和非JSON可序列化类型
+            df_cleaned = normalize_frame(df)
 
             # 创建数据集
             dataset_name = f"{data_source.name} - {file.name}"
@@ -336,49 +389,15 @@ class DataSourceViewSet(viewsets.ModelViewSet):
             else:
                 print(f"❌ [Dataset] 创建数据集活动记录失败")
 
-            # 批量创建数据记录 - 使用更小的批次大小
-            records_created = 0
-            batch_size = 50  # 减小批次大小以避免JSON验证问题
-
-            for i in range(0, len(df_cleaned), batch_size):
-                batch_df = df_cleaned.iloc[i:i + batch_size]
-                data_records = []
-
-                for _, row in batch_df.iterrows():
-                    try:
-                        # 确保数据是有效的JSON
-                        row_data = row.to_dict()
-
-                        # 进一步清理数据
-                        cleaned_data = {}
-                        for key, value in row_data.items():
-                            if pd.isna(value) or value is None:
-                                cleaned_data[key] = None
-                            elif isinstance(value, (pd.Timestamp, pd.DatetimeIndex)):
-                                cleaned_data[key] = value.isoformat()
-                            elif isinstance(value, (int, float, str, bool)):
-                                cleaned_data[key] = value
-                            else:
-                                # 其他类型转换为字符串
-                                cleaned_data[key] = str(value)
-
-                        # 验证JSON可序列化
-                        import json
-                        json.dumps(cleaned_data)  # 如果失败会抛出异常
-
-                        data_records.append(DataRecord(
-                            dataset=dataset,
-                            data=cleaned_data
-                        ))
-
-                    except Exception as e:
-                        print(f"处理行数据时出错: {str(e)}")
-                        # 跳过有问题的行，继续处理其他行
-                        continue
-
-                if data_records:
-                    DataRecord.objects.bulk_create(data_records)
-                    records_created += len(data_records)
+            # 分块写入数据集列式存储
+            progress = IngestProgress(dataset.name)
+            chunk_size = get_ingest_chunk_size()
+            with DatasetStore.open_writer(dataset) as writer:
+                for i in range(0, len(df_cleaned), chunk_size):
+                    chunk = df_cleaned.iloc[i:i + chunk_size]
+                    writer.write_frame(chunk)
+                    progress.add(len(chunk))
+                records_created = writer.commit()
 
             # 创建数据集活动记录
             create_dataset_activity(
@@ -391,6 +410,7 @@ class DataSourceViewSet(viewsets.ModelViewSet):
             file_info['records_created'] = records_created
             file_info['dataset_id'] = dataset.id
             file_info['total_rows'] = len(df_cleaned)
+            file_info.update(progress.summary())
 
             return Response({
                 'message': f'{data_type.upper()}文件上传成功',
@@ -471,11 +491,11 @@ class DataSourceViewSet(viewsets.ModelViewSet):
         # 所有认证用户都可以查看文件列表，不需要权限检查
         try:
             # 获取该数据源下的所有数据集
-            datasets = Dataset.objects.filter(data_source=data_source)
+            datasets = Dataset.objects.filter(data_source=data_source).select_related('statistics')
 
             file_list = []
             for dataset in datasets:
-                records_count = DataRecord.objects.filter(dataset=dataset).count()
+                records_count = get_row_count(dataset)
 
                 # 从描述中提取原始文件大小
                 original_size = 0
@@ -651,12 +671,12 @@ class DatasetViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated, IsAdminOrReadOnly]
 
     def get_queryset(self):
-        # 所有认证用户都可以看到所有数据集
-        return Dataset.objects.all()
+        # 所有认证用户都可以看到所有数据集；创建者、数据源和记录数（统计信息目录）一并查询
+        return Dataset.objects.select_related('created_by', 'data_source', 'statistics')
 
     # 确保查看用户有读取权限
     def get_permissions(self):
-        if self.action in ['list', 'retrieve', 'preview', 'data']:
+        if self.action in ['list', 'retrieve', 'preview', 'data', 'statistics']:
             # 对于读取操作，所有认证用户都有权限
             return [permissions.IsAuthenticated()]
         # 对于修改操作，保持原有权限控制
@@ -701,22 +721,42 @@ class DatasetViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'])
     def data(self, request, pk=None):
-        """获取数据集的数据记录"""
+        """
+        按记录 id 键集分页获取数据集的数据记录
+
+        ?cursor= 为上一页最后一条记录的 id（即响应中的 next_cursor），不指定时从第一条记录开始；
+        ?page_size= 为每页记录数；?columns=a,b 只返回指定的列。
+        总数取自数据集的元数据（列式存储的清单，旧存储格式按内容版本缓存），不在每次请求时统计。
+        """
         dataset = self.get_object()
-        records = DataRecord.objects.filter(dataset=dataset)
+        try:
+            cursor = int(request.query_params.get('cursor') or 0)
+            page_size = get_data_page_size(request.query_params.get('page_size'))
+            if cursor < 0:
+                raise ValueError('cursor 不能为负数')
+        except ValueError as e:
+            return Response({'error': f'分页参数错误: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        columns = request.query_params.get('columns')
+        if columns:
+            columns = [column.strip() for column in columns.split(',') if column.strip()]
+
+        # 多取一条判断是否还有下一页
+        rows = DatasetStore.read_rows_after(dataset, after=cursor, limit=page_size + 1, columns=columns or None)
+        records = rows[:page_size]
+        has_more = len(rows) > page_size
+        next_cursor = records[-1]['id'] if has_more else None
 
-        # 返回数据记录
         data = {
             'dataset_id': dataset.id,
             'dataset_name': dataset.name,
-            'records': [
-                {
-                    'id': record.id,
-                    'data': record.data,
-                    'created_at': record.created_at
-                } for record in records
-            ],
-            'total_count': records.count()
+            'records': records,
+            'total_count': get_row_count(dataset),
+            'page_size': page_size,
+            'cursor': cursor,
+            'next_cursor': next_cursor,
+            'next': replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor) if has_more else None,
+            'has_more': has_more
         }
 
         return Response(data)
@@ -729,14 +769,12 @@ class DatasetViewSet(viewsets.ModelViewSet):
             limit = int(request.query_params.get('limit', 100))
 
             # 获取限制数量的记录
-            records = DataRecord.objects.filter(dataset=dataset)[:limit]
+            records = DatasetStore.read_records(dataset, limit=limit)
 
             # 处理数据格式
             all_data = []
-            columns_set = set()
 
-            for record in records:
-                record_data = record.data
+            for record_data in records:
                 if isinstance(record_data, dict) and 'RECORDS' in record_data:
                     if isinstance(record_data['RECORDS'], list):
                         all_data.extend(record_data['RECORDS'])
@@ -745,19 +783,15 @@ class DatasetViewSet(viewsets.ModelViewSet):
                 else:
                     all_data.append(record_data)
 
-                # 收集所有列名
-                if all_data:
-                    columns_set.update(all_data[-1].keys())
-
-            # 转换为列表并排序
-            columns = sorted(list(columns_set))
+            # 列名取自统计信息目录
+            columns = get_column_names(dataset)
 
             return Response({
                 'dataset_id': dataset.id,
                 'dataset_name': dataset.name,
                 'columns': columns,
                 'data': all_data,
-                'total_records': DataRecord.objects.filter(dataset=dataset).count(),
+                'total_records': get_row_count(dataset),
                 'preview_count': len(all_data),
                 'limit': limit
             })
@@ -766,9 +800,26 @@ class DatasetViewSet(viewsets.ModelViewSet):
             print(f"预览错误: {str(e)}")
             return Response({'error': f'获取预览数据失败: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(detail=True, methods=['get'])
+    def statistics(self, request, pk=None):
+        """获取数据集的结构和统计信息（行数，各列的类型、空值数、最小值、最大值和去重计数）"""
+        dataset = self.get_object()
+        statistics = get_statistics(dataset)
+        if statistics is None:
+            return Response({'error': '统计信息计算失败'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        data = describe_statistics(statistics)
+        data.update({'dataset_id': dataset.id, 'dataset_name': dataset.name})
+        return Response(data)
+
     @action(detail=True, methods=['get'])
     def export(self, request, pk=None):
-        """导出数据集数据"""
+        """
+        流式导出数据集数据
+
+        ?format= 为 csv（默认）、ndjson、json 或 parquet，compression=gzip 或格式后缀 .gz 时 gzip 压缩；
+        page/page_size 或 limit 指定导出区间，不指定时导出全部数据。
+        """
         try:
             dataset = self.get_object()
 
@@ -777,88 +828,141 @@ class DatasetViewSet(viewsets.ModelViewSet):
                 return Response({'error': '没有权限访问此数据集'}, status=status.HTTP_403_FORBIDDEN)
 
             # 获取查询参数
-            export_format = request.query_params.get('format', 'csv')
+            export_format, use_gzip = parse_export_format(
+                request.query_params.get('format'), request.query_params.get('compression')
+            )
             limit = request.query_params.get('limit')
             page = request.query_params.get('page')
             page_size = request.query_params.get('page_size')
 
-            # 构建查询
-            records_query = DataRecord.objects.filter(dataset=dataset)
-
             # 应用分页
+            offset = 0
             if page and page_size:
-                paginator = StandardPagination()
-                page_size = int(page_size)
-                page = int(page)
-                start = (page - 1) * page_size
-                end = start + page_size
-                records = records_query[start:end]
+                limit = int(page_size)
+                offset = (int(page) - 1) * limit
             elif limit:
-                records = records_query[:int(limit)]
+                limit = int(limit)
             else:
-                records = records_query[:1000]  # 默认最多1000条
+                limit = None
+            if offset < 0 or (limit is not None and limit < 0):
+                raise ValueError('分页参数不能为负数')
 
-            # 处理数据
-            all_data = []
-            for record in records:
-                record_data = record.data
-                if isinstance(record_data, dict) and 'RECORDS' in record_data:
-                    if isinstance(record_data['RECORDS'], list):
-                        all_data.extend(record_data['RECORDS'])
-                    else:
-                        all_data.append(record_data['RECORDS'])
-                else:
-                    all_data.append(record_data)
-
-            # 根据格式返回数据
-            if export_format == 'csv':
-                return self._export_to_csv(all_data, dataset.name)
-            else:
-                return Response({
-                    'data': all_data,
-                    'total': len(all_data),
-                    'dataset_name': dataset.name
-                })
+            stream, content_type, filename = stream_export(
+                dataset, export_format, use_gzip=use_gzip, offset=offset, limit=limit
+            )
+            response = StreamingHttpResponse(stream, content_type=content_type)
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            return response
 
+        except ValueError as e:
+            return Response({'error': f'导出参数错误: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({'error': f'导出数据失败: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    def _export_to_csv(self, data, dataset_name):
-        """导出为CSV格式"""
-        import csv
-        from django.http import HttpResponse
-
-        if not data:
-            return HttpResponse('No data to export', status=400)
-
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="{dataset_name}.csv"'
-
-        # 获取所有列名
-        columns = set()
-        for item in data:
-            columns.update(item.keys())
-        columns = sorted(list(columns))
-
-        writer = csv.DictWriter(response, fieldnames=columns)
-        writer.writeheader()
-
-        for item in data:
-            # 确保每行都有所有列
-            row = {col: item.get(col, '') for col in columns}
-            writer.writerow(row)
-
-        return response
+    def perform_content_negotiation(self, request, force=False):
+        # 导出接口的 ?format= 是导出文件格式，与 DRF 按 format 参数选择响应渲染器的约定冲突，
+        # 选不到渲染器时使用默认渲染器（错误信息仍以 JSON 返回）
+        if self.action == 'export':
+            force = True
+        return super().perform_content_negotiation(request, force=force)
 
 
 class DataRecordViewSet(viewsets.ModelViewSet):
+    """
+    单条数据记录接口
+
+    列式存储的数据集以 Parquet 分片为准（DataRecord 至多是兼容副本）：记录列表从 DatasetStore 读取，
+    新增记录追加到列式存储，不支持按条修改和删除。
+    """
     queryset = DataRecord.objects.all()
     serializer_class = DataRecordSerializer
     permission_classes = [permissions.IsAuthenticated, IsAdminOrReadOnly]
 
     def get_queryset(self):
-        # 所有认证用户都可以看到所有数据记录
-        return DataRecord.objects.all()
+        # 所有认证用户都可以看到所有数据记录，指定 ?dataset= 时只返回该数据集的记录
+        queryset = DataRecord.objects.all()
+        dataset_id = self.request.query_params.get('dataset')
+        if dataset_id:
+            queryset = queryset.filter(dataset_id=dataset_id)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        dataset_id = request.query_params.get('dataset')
+        dataset = Dataset.objects.filter(pk=dataset_id).first() if dataset_id and dataset_id.isdigit() else None
+        if dataset is None or not DatasetStore.is_columnar(dataset):
+            return super().list(request, *args, **kwargs)
+
+        # 列式存储的数据集按 ?page=&page_size= 从存储中分页读取，记录 id 为从 1 开始的行号
+        try:
+            page = int(request.query_params.get('page', 1))
+            page_size = get_data_page_size(request.query_params.get('page_size'))
+            if page <= 0:
+                raise ValueError('page 必须大于 0')
+        except ValueError as e:
+            return Response({'error': f'分页参数错误: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = DatasetStore.read_rows(dataset, offset=(page - 1) * page_size, limit=page_size)
+        return Response({
+            'results': [dict(row, dataset=dataset.id) for row in rows],
+            'total': get_row_count(dataset),
+            'page': page,
+            'page_size': page_size,
+        })
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        dataset = serializer.validated_data['dataset']
+        if not DatasetStore.is_columnar(dataset):
+            self.perform_create(serializer)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+        data = serializer.validated_data['data']
+        if not isinstance(data, dict):
+            return Response({'error': '列式存储的数据集只接受字典形式的记录'}, status=status.HTTP_400_BAD_REQUEST)
+        DatasetStore.append_records(dataset, [data])
+        return Response({
+            'id': DatasetStore.count_rows(dataset),
+            'dataset': dataset.id,
+            'data': data,
+            'created_at': timezone.now(),
+        }, status=status.HTTP_201_CREATED)
+
+    def _check_editable(self, dataset):
+        if DatasetStore.is_columnar(dataset):
+            raise ValidationError({'error': '列式存储的数据集不支持修改或删除单条记录，请重新导入数据'})
+
+    def get_object(self):
+        # 列式存储的记录 id 是行号而不是 DataRecord 主键，带 ?dataset= 修改或删除时先拒绝，避免误删其他记录
+        dataset_id = self.request.query_params.get('dataset')
+        if self.request.method not in permissions.SAFE_METHODS and dataset_id and dataset_id.isdigit():
+            dataset = Dataset.objects.filter(pk=dataset_id).first()
+            if dataset is not None:
+                self._check_editable(dataset)
+        return super().get_object()
+
+    # 单条记录的增删改同样是数据内容变化，需要更新所属数据集的内容版本使目录过期（统计信息接口按需重新统计）
+    def _records_changed(self, dataset):
+        dataset.bump_content_version('records')
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            record = serializer.save()
+            self._records_changed(record.dataset)
+
+    def perform_update(self, serializer):
+        self._check_editable(serializer.instance.dataset)
+        self._check_editable(serializer.validated_data.get('dataset', serializer.instance.dataset))
+        with transaction.atomic():
+            record = serializer.save()
+            self._records_changed(record.dataset)
+
+    def perform_destroy(self, instance):
+        self._check_editable(instance.dataset)
+        with transaction.atomic():
+            dataset = instance.dataset
+            instance.delete()
+            self._records_changed(dataset)
 
     @action(detail=False, methods=['post'])
     def bulk_create(self, request):
@@ -871,18 +975,9 @@ class DataRecordViewSet(viewsets.ModelViewSet):
 
         try:
             dataset = Dataset.objects.get(id=dataset_id, created_by=request.user)
-            records_to_create = [
-                DataRecord(dataset=dataset, data=record_data)
-                for record_data in records_data
-            ]
-
-            # 使用批量创建，设置合适的批次大小
-            batch_size = 100
-            created_count = 0
-            for i in range(0, len(records_to_create), batch_size):
-                batch = records_to_create[i:i + batch_size]
-                DataRecord.objects.bulk_create(batch)
-                created_count += len(batch)
+
+            # 追加到数据集存储
+            created_count = DatasetStore.append_records(dataset, records_data)
 
             return Response({
                 'message': f'成功创建 {created_count} 条记录',
@@ -6,4 +6,5 @@ from .models import *
 # Register your models here.
 
 admin.site.register(ProcessingPipeline)
-admin.site.register(PipelineModule)
\ No newline at end of file
+admin.site.register(PipelineModule)
+admin.site.register(PipelineRun)
\ No newline at end of file
@@ -0,0 +1,210 @@
+# Copyright (c) 2025 YycKop
+# MIT License
+# Integrated-Data-Platform-backend/processing/datetimes.py
+"""
+时间提取转换的日期时间解析
+
+自动格式只从列的一小段样本推断一次固定格式，再按该格式整列解析；推断不出格式时才逐个值解析。
+同一次执行中从同一字段提取年、月、日、星期等多个时间组件时，DatetimeCache 保证该字段只解析一次；
+配置了 PIPELINE_DATETIME_CACHE_ROWS 时，未被改写的输入列的解析结果还会在进程内跨执行复用。
+"""
+import collections
+import threading
+import warnings
+import weakref
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from pandas.api.types import is_datetime64_any_dtype
+from pandas.tseries.api import guess_datetime_format
+
+from datasets.storage import DatasetStore
+
+# 转换模块的时间格式 -> strptime 格式
+TIME_FORMATS = {
+    'YYYYmmdd': '%Y%m%d',
+    'YYYY-mm-dd': '%Y-%m-%d',
+    'YYYY/mm/dd': '%Y/%m/%d',
+    'YYYY年mm月dd日': '%Y年%m月%d日',
+    'hhMMss': '%H%M%S',
+    'hh:MM:ss': '%H:%M:%S',
+    'hh时MM分ss秒': '%H时%M分%S秒',
+    'YYYYmmdd hhMMss': '%Y%m%d %H%M%S',
+    'YYYY-mm-dd hh:MM:ss': '%Y-%m-%d %H:%M:%S',
+}
+
+# 推断格式时使用的样本行数、为凑够样本最多查看的开头行数，以及参与比较的候选格式数
+SAMPLE_ROWS = 1000
+SAMPLE_SCAN_ROWS = SAMPLE_ROWS * 10
+SAMPLE_CANDIDATES = 20
+
+_shared = collections.OrderedDict()
+_shared_rows = 0
+_shared_lock = threading.Lock()
+
+
+def get_datetime_cache_rows():
+    """跨执行缓存的解析结果总行数上限，0 表示不跨执行缓存"""
+    return int(getattr(settings, 'PIPELINE_DATETIME_CACHE_ROWS', 0))
+
+
+def infer_datetime_format(text):
+    """从文本列开头的非空样本推断固定格式，选择能解析最多样本的候选格式，都无法解析时返回 None"""
+    sample = text.head(SAMPLE_SCAN_ROWS)
+    sample = sample[~sample.isin(['nan', 'None', 'NaT', '<NA>', ''])].head(SAMPLE_ROWS)
+    if sample.empty:
+        return None
+
+    # pandas 按样本值猜测的格式，加上转换模块支持的格式（pandas 猜不出中文日期等格式）
+    with warnings.catch_warnings():
+        # 样本值按日在前解析时 pandas 会给出提示，候选格式之后统一比较，忽略该提示
+        warnings.simplefilter('ignore', UserWarning)
+        candidates = {guess_datetime_format(value) for value in sample.drop_duplicates().head(SAMPLE_CANDIDATES)}
+    candidates.update(TIME_FORMATS.values())
+    best_format, best_count = None, 0
+    for candidate in sorted(candidates - {None}):
+        count = pd.to_datetime(sample, format=candidate, errors='coerce').notna().sum()
+        if count > best_count:
+            best_format, best_count = candidate, count
+    return best_format
+
+
+def parse_datetimes(series, time_format='auto', stats=None):
+    """
+    按转换模块的时间格式解析整列，无法解析的值为 NaT
+
+    stats 为流式执行时预先统计的整列统计量：时间戳取其中的最大值判断单位，自动格式取其中从整列开头推断的格式。
+    """
+    if time_format == 'timestamp':
+        # 处理时间戳（假设是秒级或毫秒级）
+        numeric_series = pd.to_numeric(series, errors='coerce')
+        # 判断是秒级还是毫秒级时间戳
+        max_value = stats['max'] if stats else numeric_series.max()
+        unit = 'ms' if max_value > 1e10 else 's'  # 大于 1e10 可能是毫秒级
+        return pd.to_datetime(numeric_series, unit=unit, errors='coerce')
+
+    if time_format == 'auto' and is_datetime64_any_dtype(series):
+        return series
+
+    text = series.astype(str)
+    if time_format != 'auto':
+        pandas_format = TIME_FORMATS.get(time_format)
+    elif stats and 'format' in stats:
+        pandas_format = stats['format']
+    else:
+        pandas_format = infer_datetime_format(text)
+    if pandas_format:
+        return pd.to_datetime(text, format=pandas_format, errors='coerce')
+
+    with warnings.catch_warnings():
+        # 推断不出统一格式时逐个值解析，忽略 pandas 的相应提示
+        warnings.simplefilter('ignore', UserWarning)
+        return pd.to_datetime(text, errors='coerce')
+
+
+def get_scan_key(dataset, filters):
+    """输入数据集内容版本和读取条件的标识；旧的记录存储可以绕过内容版本直接修改，返回 None"""
+    if not DatasetStore.is_columnar(dataset):
+        return None
+    return dataset.pk, dataset.content_version, repr(list(filters or []))
+
+
+def _source(series):
+    """
+    列数据的来源：底层数组的弱引用和内存位置
+
+    底层数组仍然存在且位置、形状相同时两列的数据相同，弱引用保证缓存不会延长数组的生命周期。
+    需要复制才能得到 numpy 数组的列（扩展类型）每次都得到新的数组，不会命中缓存。
+    """
+    values = np.asarray(series)
+    owner = values
+    while isinstance(owner.base, np.ndarray):
+        owner = owner.base
+    try:
+        ref = weakref.ref(owner)
+    except TypeError:
+        return None
+    interface = values.__array_interface__
+    return ref, (interface['data'][0], values.shape, values.strides, values.dtype.str)
+
+
+def _same_source(left, right):
+    if left is None or right is None:
+        return False
+    owner = left[0]()
+    return owner is not None and owner is right[0]() and left[1] == right[1]
+
+
+def _shared_get(key):
+    with _shared_lock:
+        parsed = _shared.get(key)
+        if parsed is not None:
+            _shared.move_to_end(key)
+        return parsed
+
+
+def _shared_put(key, parsed):
+    global _shared_rows
+    budget = get_datetime_cache_rows()
+    if len(parsed) > budget:
+        return
+    with _shared_lock:
+        if key in _shared:
+            return
+        _shared[key] = parsed
+        _shared_rows += len(parsed)
+        while _shared_rows > budget:
+            _, evicted = _shared.popitem(last=False)
+            _shared_rows -= len(evicted)
+
+
+class DatetimeCache:
+    """
+    一次流程执行中的日期时间解析缓存
+
+    以 (字段, 时间格式) 为键保存最近一次解析的来源和结果，来源相同（同一份数据且未被改写）时直接复用。
+    bind_scan 登记读取的输入数据后，未被改写的输入列还以 (数据集版本, 读取条件, 字段, 时间格式)
+    为键放入进程内共享缓存，之后的执行读取同一版本的同一列时不再解析。
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._scan_key = None
+        self._scan_sources = {}
+        self.parses = 0
+        self.hits = 0
+
+    def bind_scan(self, df, scan_key):
+        """登记从输入数据集读取的数据，scan_key 由 get_scan_key 得到"""
+        if scan_key is None or get_datetime_cache_rows() <= 0:
+            return
+        self._scan_key = scan_key
+        self._scan_sources = {name: _source(df[name]) for name in df.columns}
+
+    def parse(self, series, time_format='auto', stats=None):
+        """解析一列，来源与之前解析过的列相同时直接返回之前的结果"""
+        key = (series.name, time_format)
+        source = _source(series)
+        entry = self._entries.get(key)
+        parsed = entry[1] if entry is not None and _same_source(entry[0], source) else None
+
+        shared_key = None
+        if parsed is None and self._scan_key is not None \
+                and _same_source(self._scan_sources.get(series.name), source):
+            shared_key = (self._scan_key, series.name, time_format)
+            parsed = _shared_get(shared_key)
+
+        if parsed is None:
+            parsed = parse_datetimes(series, time_format, stats)
+            self.parses += 1
+            if shared_key is not None:
+                _shared_put(shared_key, parsed)
+        else:
+            self.hits += 1
+
+        self._entries[key] = (source, parsed)
+        if not parsed.index.equals(series.index):
+            # 数据相同但行索引被重置过，按位置对应
+            parsed = parsed.set_axis(series.index)
+        return parsed
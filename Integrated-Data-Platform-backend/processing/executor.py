@@ -0,0 +1,838 @@
+# Copyright (c) 2025 YycKop
+# MIT License
+# Integrated-Data-Platform-backend/processing/executor.py
+"""
+处理流程执行器
+
+PipelineExecutor 负责一次完整的流程执行：读取输入数据集、验证、按顺序执行各模块并写入输出数据集。
+执行过程中通过 on_progress 回调报告阶段和每个模块的进度，并在模块之间调用 should_cancel 检查是否需要取消。
+同步调用和后台任务队列（processing.jobs）共用这一实现。
+"""
+import itertools
+import logging
+import time
+
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import PipelineModule
+from .datetimes import SAMPLE_SCAN_ROWS, DatetimeCache, get_scan_key, infer_datetime_format
+from .external import (
+    MERGEABLE_AGGREGATIONS, SpillArea, combine_states, concat_frames, drop_duplicates_stream, external_sort,
+    get_chunk_rows, get_out_of_core_rows, limited_sort, partial_aggregate, partitioned_aggregate, peek,
+    spill_with_stats, split_frame
+)
+from .kernels import decimal_to_percent, percent_to_decimal
+from .parallel import (
+    aggregate_partitioned, apply_partitioned, is_parallel_enabled, map_partial_states, map_partitions
+)
+from .plan import build_plan, is_row_local, is_row_wise_transform
+from .schema import (
+    AGGREGATE_OPERATIONS, get_aggregate_config, get_aggregate_output_name, get_transform_config,
+    infer_pipeline_schema, resolve_aggregations
+)
+from datasets.models import Dataset
+from datasets.storage import DatasetStore
+from activities.utils import create_pipeline_activity
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineCancelled(Exception):
+    """流程执行被取消"""
+
+
+class PipelineExecutor:
+    """执行一个处理流程"""
+
+    def __init__(self, pipeline, user, on_progress=None, should_cancel=None):
+        self.pipeline = pipeline
+        self.user = user
+        self.on_progress = on_progress
+        self.should_cancel = should_cancel
+        self.progress = {'phase': 'queued', 'modules': []}
+        self.datetime_cache = DatetimeCache()
+
+    @staticmethod
+    def initial_progress(pipeline_modules):
+        """流程开始前的进度结构，每个模块一项"""
+        return {
+            'phase': 'queued',
+            'completed_modules': 0,
+            'total_modules': len(pipeline_modules),
+            'modules': [
+                {
+                    'module': pipeline_module.name,
+                    'type': pipeline_module.type,
+                    'status': 'pending',
+                    'before_count': None,
+                    'after_count': None,
+                    'records_affected': None,
+                    'duration': None
+                }
+                for pipeline_module in pipeline_modules
+            ]
+        }
+
+    def _report(self, phase=None):
+        if phase:
+            self.progress['phase'] = phase
+        if self.on_progress:
+            self.on_progress(self.progress)
+
+    def _check_cancelled(self):
+        if self.should_cancel and self.should_cancel():
+            raise PipelineCancelled('处理流程已取消')
+
+    def _finish_module(self, index, status, before_count, after_count, duration):
+        entry = self.progress['modules'][index]
+        entry.update({
+            'status': status,
+            'before_count': before_count,
+            'after_count': after_count,
+            'records_affected': before_count - after_count,
+            'duration': round(duration, 3)
+        })
+        self.progress['completed_modules'] += 1
+        self._report()
+
+    def run(self):
+        """执行流程并返回执行结果，验证失败时抛出 ValidationError"""
+        pipeline = self.pipeline
+
+        if not pipeline.input_dataset:
+            raise ValidationError('输入数据集未设置')
+
+        if DatasetStore.count_rows(pipeline.input_dataset) == 0:
+            raise ValidationError('输入数据集为空')
+
+        # 按顺序执行处理模块
+        pipeline_modules = list(PipelineModule.objects.filter(
+            pipeline=pipeline
+        ).order_by('order'))
+        self.progress = self.initial_progress(pipeline_modules)
+
+        # 只依据列名验证整个流程，在读取数据之前发现配置错误
+        self._report('validating')
+        self.validate_pipeline_data(pipeline, DatasetStore.get_columns(pipeline.input_dataset), pipeline_modules)
+        self._check_cancelled()
+        self._report('loading')
+
+        # 编译并优化执行计划：过滤提前并下推到读取中，只读取用到的列，融合连续的转换
+        plan = build_plan(pipeline.input_dataset, pipeline_modules)
+        scan_filters = [condition for _, condition in plan.scan_filters]
+
+        # 记录原始数据条数和下推过滤后实际读取的条数
+        original_count = DatasetStore.count_rows(pipeline.input_dataset)
+        scan_count = DatasetStore.count_rows(pipeline.input_dataset, filters=scan_filters) \
+            if scan_filters else original_count
+
+        # 列式存储的大数据集按数据块流式执行，内存占用与数据量无关
+        out_of_core = plan.column_types is not None and scan_count > get_out_of_core_rows()
+        self.progress['execution'] = 'out_of_core' if out_of_core else 'in_memory'
+
+        self._check_cancelled()
+        self._report('processing')
+
+        # 已下推的过滤模块按累计条件统计每一步的记录数
+        before_count = original_count
+        for position, (planned, _) in enumerate(plan.scan_filters):
+            started = time.perf_counter()
+            if position == len(plan.scan_filters) - 1:
+                after_count = scan_count
+            else:
+                after_count = DatasetStore.count_rows(
+                    pipeline.input_dataset,
+                    filters=scan_filters[:position + 1]
+                )
+            self._finish_module(planned.index, 'pushed_down', before_count, after_count,
+                                time.perf_counter() - started)
+            before_count = after_count
+
+        # 结果不会被用到的模块直接跳过
+        for planned, _ in plan.eliminated:
+            self._finish_module(planned.index, 'skipped', scan_count, scan_count, 0)
+
+        if out_of_core:
+            output_dataset, records_created = self._run_out_of_core(pipeline, plan)
+        else:
+            df = DatasetStore.read_dataframe(
+                pipeline.input_dataset,
+                columns=plan.scan_columns,
+                filters=scan_filters
+            )
+            self.datetime_cache.bind_scan(df, get_scan_key(pipeline.input_dataset, scan_filters))
+
+            df = self._run_in_memory(df, plan)
+
+            # 写入输出数据集：先在事务外落盘，再原子地切换到新数据
+            self._check_cancelled()
+            self._report('writing')
+            output_dataset, records_created = self._write_output(pipeline, df)
+
+        # 创建处理流程执行活动记录
+        create_pipeline_activity(
+            user=self.user,
+            pipeline_name=pipeline.name,
+            pipeline_id=pipeline.id,
+            action='executed'
+        )
+
+        logger.info(f"Pipeline {pipeline.name} executed successfully. "
+                    f"Processed {original_count} -> {records_created} records")
+
+        self._report('done')
+        execution_log = [
+            {key: entry[key] for key in ('module', 'type', 'before_count', 'after_count', 'records_affected')}
+            for entry in self.progress['modules']
+        ]
+        return {
+            'message': '处理流程执行成功',
+            'original_records': original_count,
+            'processed_records': records_created,
+            'output_dataset': output_dataset.name,
+            'output_dataset_id': output_dataset.id,
+            'output_data_type': output_dataset.data_type,
+            'execution': self.progress['execution'],
+            'execution_log': execution_log
+        }
+
+    def _run_in_memory(self, df, plan):
+        """在内存中依次执行计划的各步骤，数据量足够大时逐行模块和可合并的聚合按行分区并行执行"""
+        for kind, segment in self._segment_steps(plan.steps, parallel=is_parallel_enabled(len(df))):
+            self._check_cancelled()
+            for planned in segment:
+                self.progress['modules'][planned.index]['status'] = 'running'
+            self._report()
+
+            # 逐行模块较少时分区、传输的开销大于并行的收益，仍在当前进程执行
+            if kind == 'partitioned' and is_parallel_enabled(len(df)):
+                started = time.perf_counter()
+                df, counts = apply_partitioned(df, [(planned.type, planned.config) for planned in segment])
+                # 同一分区内各模块交替执行，只记录总耗时
+                duration = time.perf_counter() - started
+                for planned, (before_count, after_count) in zip(segment, counts):
+                    self._finish_module(planned.index, 'done', before_count, after_count, duration)
+                continue
+
+            # 融合的转换步骤在同一个 DataFrame 上依次执行各模块
+            for planned in segment:
+                started = time.perf_counter()
+                before_count = len(df)
+                if planned.type == 'aggregate' and is_parallel_enabled(len(df)):
+                    df = self._aggregate_partitioned(df, planned.config)
+                else:
+                    df = self._apply_module(df, planned.type, planned.config)
+                self._finish_module(planned.index, 'done', before_count, len(df),
+                                    time.perf_counter() - started)
+        return df
+
+    @staticmethod
+    def _segment_steps(steps, parallel):
+        """
+        把计划步骤分为执行段，产出 (段类型, 模块列表)
+
+        启用分区执行时连续的逐行模块合并为一个 'partitioned' 段，每个分区只需传输一次；
+        其余步骤保持原样为 'serial' 段。
+        """
+        segment = []
+        for step in steps:
+            if parallel and all(is_row_local(planned) for planned in step.modules):
+                segment.extend(step.modules)
+                continue
+            if segment:
+                yield 'partitioned', segment
+                segment = []
+            yield 'serial', step.modules
+        if segment:
+            yield 'partitioned', segment
+
+    def _aggregate_partitioned(self, df, config):
+        """可合并的聚合在各行分区上并行计算部分结果后合并，其余情况按原方式聚合"""
+        resolved = resolve_aggregations(config, df.columns)
+        if resolved is None:
+            return self._apply_aggregate(df, config)
+        group_by, aggregations = resolved
+        if not all(operation in MERGEABLE_AGGREGATIONS for _, _, operation in aggregations):
+            return self._apply_aggregate(df, config)
+        return aggregate_partitioned(df, group_by, aggregations)
+
+    def _run_out_of_core(self, pipeline, plan):
+        """按数据块流式执行计划并边处理边写入输出数据集，返回 (输出数据集, 写入行数)"""
+        counters = {planned.index: [0, 0] for step in plan.steps for planned in step.modules}
+        for planned in counters:
+            self.progress['modules'][planned]['status'] = 'running'
+        started = time.perf_counter()
+
+        with SpillArea() as spill:
+            frames = self._stream_plan(plan, spill, counters)
+            output_dataset, records_created = self._write_output(pipeline, frames)
+
+        # 流式执行时各模块交替处理数据块，只记录总耗时
+        duration = time.perf_counter() - started
+        for index in sorted(counters):
+            before_count, after_count = counters[index]
+            self._finish_module(index, 'done', before_count, after_count, duration)
+        return output_dataset, records_created
+
+    def _stream_plan(self, plan, spill, counters):
+        """把计划组装为数据块生成器链"""
+        frames = self._track_input(DatasetStore.iter_dataframes(
+            plan.dataset,
+            columns=plan.scan_columns,
+            filters=[condition for _, condition in plan.scan_filters],
+            batch_size=get_chunk_rows()
+        ))
+        for kind, segment in self._segment_steps(plan.steps, parallel=is_parallel_enabled()):
+            if kind == 'partitioned':
+                frames = self._stream_partitioned(frames, segment, counters)
+                continue
+            for planned in segment:
+                counter = counters[planned.index]
+                frames = self._count_rows(frames, counter, 0)
+                frames = self._stream_module(frames, planned, spill)
+                frames = self._count_rows(frames, counter, 1)
+        return frames
+
+    @staticmethod
+    def _stream_partitioned(frames, segment, counters):
+        """连续的逐行模块在进程池中逐块执行，数据块按输入顺序产出"""
+        modules = [(planned.type, planned.config) for planned in segment]
+        for df, counts in map_partitions(frames, modules):
+            for planned, (before_count, after_count) in zip(segment, counts):
+                counters[planned.index][0] += before_count
+                counters[planned.index][1] += after_count
+            yield df
+
+    def _track_input(self, frames):
+        """逐块读取输入时检查取消请求并报告已读取的行数"""
+        self.progress['rows_read'] = 0
+        for df in frames:
+            self._check_cancelled()
+            yield df
+            self.progress['rows_read'] += len(df)
+            self._report()
+
+    @staticmethod
+    def _count_rows(frames, counter, slot):
+        for df in frames:
+            counter[slot] += len(df)
+            yield df
+
+    def _stream_module(self, frames, planned, spill):
+        """流式执行一个模块：逐行模块逐块处理，其余模块使用外存算法"""
+        config = planned.config
+        if planned.type == 'aggregate':
+            return self._stream_aggregate(frames, config, spill)
+        if planned.type == 'sort':
+            return self._stream_sort(frames, config, spill)
+        if planned.type == 'clean' and config.get('operation') == 'remove_duplicates':
+            return drop_duplicates_stream(frames, config.get('field', ''))
+        if planned.type == 'transform' and not is_row_wise_transform(config):
+            return self._stream_column_transform(frames, config, spill)
+        return (self._apply_module(df, planned.type, config) for df in frames)
+
+    def _stream_aggregate(self, frames, config, spill):
+        first, frames = peek(frames)
+        if first is None:
+            return
+        resolved = resolve_aggregations(config, first.columns)
+        if resolved is None:
+            # 聚合不会生效时数据保持不变
+            yield from frames
+            return
+
+        group_by, aggregations = resolved
+        if all(operation in MERGEABLE_AGGREGATIONS for _, _, operation in aggregations):
+            if is_parallel_enabled():
+                result = combine_states(map_partial_states(frames, group_by, aggregations), group_by, aggregations)
+            else:
+                result = partial_aggregate(frames, group_by, aggregations)
+        else:
+            result = partitioned_aggregate(frames, group_by, spill, lambda df: self._apply_aggregate(df, config))
+        if result is not None:
+            yield from split_frame(result)
+
+    def _stream_sort(self, frames, config, spill):
+        first, frames = peek(frames)
+        if first is None:
+            return
+        sort_fields = [
+            sort_config for sort_config in config.get('sort_fields', [])
+            if sort_config.get('field') in first.columns
+        ]
+        by = [sort_config['field'] for sort_config in sort_fields]
+        ascending = [sort_config.get('order', 'asc') != 'desc' for sort_config in sort_fields]
+
+        limit_type = config.get('limit_type', 'top')
+        if config.get('enable_limit', False) and limit_type in ['top', 'bottom', 'range']:
+            yield from limited_sort(
+                frames, by, ascending, limit_type,
+                limit_count=int(config.get('limit_count', 10)),
+                start_row=int(config.get('start_row', 0)),
+                end_row=int(config.get('end_row', 10))
+            )
+        elif by:
+            yield from external_sort(frames, by, ascending, spill)
+        else:
+            yield from frames
+
+    def _stream_column_transform(self, frames, config, spill):
+        """依赖整列统计量的转换：先溢写并统计整列，再逐块转换"""
+        fields, _ = get_transform_config(config)
+        if config.get('operation', '').startswith('extract_') and config.get('time_format', 'auto') == 'auto':
+            yield from self._stream_datetime_transform(frames, config, fields)
+            return
+        run, column_stats = spill_with_stats(frames, fields, spill)
+        for df in run.drain():
+            yield self._apply_transform(df, config, column_stats=column_stats)
+
+    def _stream_datetime_transform(self, frames, config, fields):
+        """自动格式的时间提取：缓存开头的数据块，从整列开头推断一次格式后逐块按该格式解析"""
+        frames = iter(frames)
+        head, rows = [], 0
+        for df in frames:
+            head.append(df)
+            rows += len(df)
+            if rows >= SAMPLE_SCAN_ROWS:
+                break
+        if not head:
+            return
+        sample = concat_frames(head).head(SAMPLE_SCAN_ROWS)
+        column_stats = {
+            field: {'format': infer_datetime_format(sample[field].astype(str))}
+            for field in fields if field in sample.columns and not is_datetime64_any_dtype(sample[field])
+        }
+        for df in itertools.chain(head, frames):
+            yield self._apply_transform(df, config, column_stats=column_stats)
+
+    def _write_output(self, pipeline, df):
+        """
+        把处理结果写入输出数据集，返回 (输出数据集, 写入行数)，df 也可以是数据块迭代器
+
+        结果先完整写成新的列式存储版本，这一步不占用数据库事务；
+        随后在一个短事务中创建输出数据集（如需要）并切换存储路径，旧数据在事务提交后删除，
+        写入失败时原有输出保持不变。
+        """
+        output_dataset = pipeline.output_dataset
+
+        if not output_dataset:
+            output_dataset_name = pipeline.output_dataset_name or f"{pipeline.name}_输出"
+
+            # 根据输出数据类型准备数据集，写入完成后再保存
+            output_dataset = Dataset(
+                name=output_dataset_name,
+                description=f"由处理流程 {pipeline.name} 生成",
+                # 使用现有的 data_type 字段
+                data_type=pipeline.output_data_type,
+                data_structure={},  # 可以根据需要设置数据结构
+                created_by=self.user
+            )
+
+        with DatasetStore.open_writer(output_dataset) as writer:
+            for frame in ([df] if isinstance(df, pd.DataFrame) else df):
+                writer.write_frame(frame)
+            writer.stage()
+
+            with transaction.atomic():
+                if output_dataset.pk is None:
+                    # 使用输入数据集的数据源，或者创建一个虚拟的数据源
+                    input_dataset = pipeline.input_dataset
+                    data_source = input_dataset.data_source if input_dataset.data_source else None
+
+                    if not data_source:
+                        from datasets.models import DataSource
+                        data_source, created = DataSource.objects.get_or_create(
+                            name="处理流程数据源",
+                            type='manual',
+                            defaults={
+                                'description': '由数据处理流程自动创建的数据源',
+                                'created_by': self.user
+                            }
+                        )
+
+                    output_dataset.data_source = data_source
+                    output_dataset.save()
+                    pipeline.output_dataset = output_dataset
+                    pipeline.save()
+
+                records_created = writer.commit()
+
+        return output_dataset, records_created
+
+    def _apply_module(self, df, module_type, config):
+        """根据模块类型执行不同的处理"""
+        if module_type == 'filter':
+            return self._apply_filter(df, config)
+        elif module_type == 'transform':
+            return self._apply_transform(df, config)
+        elif module_type == 'aggregate':
+            return self._apply_aggregate(df, config)
+        elif module_type == 'clean':
+            return self._apply_clean(df, config)
+        elif module_type == 'select':
+            return self._apply_select(df, config)
+        elif module_type == 'sort':
+            return self._apply_sort(df, config)
+        return df
+
+    def _apply_filter(self, df, config):
+        """应用数据过滤"""
+        field = config.get('field', '')
+        operator = config.get('operator', '')
+        value = config.get('value', '')
+
+        if not field or field not in df.columns or not operator:
+            return df
+
+        try:
+            if operator in ['>', '>=', '<', '<=']:
+                df[field] = pd.to_numeric(df[field], errors='coerce')
+                value = float(value)
+
+            if operator == '==':
+                return df[df[field] == value]
+            elif operator == '!=':
+                return df[df[field] != value]
+            elif operator == '>':
+                return df[df[field] > value]
+            elif operator == '>=':
+                return df[df[field] >= value]
+            elif operator == '<':
+                return df[df[field] < value]
+            elif operator == '<=':
+                return df[df[field] <= value]
+            elif operator == 'contains':
+                return df[df[field].astype(str).str.contains(str(value), na=False)]
+            elif operator == 'not_contains':
+                return df[~df[field].astype(str).str.contains(str(value), na=False)]
+            elif operator == 'in':
+                value_list = [v.strip() for v in str(value).split(',')]
+                return df[df[field].isin(value_list)]
+            elif operator == 'not_in':
+                value_list = [v.strip() for v in str(value).split(',')]
+                return df[~df[field].isin(value_list)]
+            elif operator == 'is_null':
+                return df[df[field].isna()]
+            elif operator == 'not_null':
+                return df[df[field].notna()]
+            else:
+                return df
+
+        except Exception as e:
+            logger.warning(f"Filter operation failed: {str(e)}")
+            return df
+
+    def _apply_transform(self, df, config, column_stats=None):
+        """应用数据转换 - 支持多字段，column_stats 为流式执行时预先统计的整列统计量"""
+        fields, new_field_prefix = get_transform_config(config)
+        operation = config.get('operation', '')
+        time_format = config.get('time_format', 'auto')
+        decimal_places = config.get('decimal_places', 2)
+
+        if not fields or not operation:
+            return df
+
+        try:
+            # 处理每个选中的字段
+            for field in fields:
+                if field not in df.columns:
+                    logger.warning(f"字段 '{field}' 在数据集中不存在，跳过")
+                    continue
+
+                # 确定目标字段名
+                if new_field_prefix:
+                    target_field = f"{new_field_prefix}_{field}"
+                else:
+                    target_field = field  # 覆盖原字段
+
+                if operation == 'uppercase':
+                    df[target_field] = df[field].astype(str).str.upper()
+                elif operation == 'lowercase':
+                    df[target_field] = df[field].astype(str).str.lower()
+                elif operation == 'trim':
+                    df[target_field] = df[field].astype(str).str.strip()
+                elif operation == 'round':
+                    df[target_field] = pd.to_numeric(df[field], errors='coerce').round(decimal_places)
+                elif operation == 'abs':
+                    df[target_field] = pd.to_numeric(df[field], errors='coerce').abs()
+                elif operation == 'standardize':
+                    # 字段只转换一次数值，统计量和结果共用
+                    numeric = pd.to_numeric(df[field], errors='coerce')
+                    stats = (column_stats or {}).get(field)
+                    mean = stats['mean'] if stats else numeric.mean()
+                    std = stats['std'] if stats else numeric.std()
+                    df[target_field] = (numeric - mean) / std
+                elif operation == 'normalize':
+                    numeric = pd.to_numeric(df[field], errors='coerce')
+                    stats = (column_stats or {}).get(field)
+                    min_val = stats['min'] if stats else numeric.min()
+                    max_val = stats['max'] if stats else numeric.max()
+                    df[target_field] = (numeric - min_val) / (max_val - min_val)
+
+                # 添加百分比转换操作
+                elif operation == 'percent_to_decimal':
+                    df[target_field] = self._convert_percent_to_decimal(df[field], decimal_places)
+                elif operation == 'decimal_to_percent':
+                    df[target_field] = self._convert_decimal_to_percent(df[field], decimal_places)
+
+                # 时间数据提取操作
+                elif operation.startswith('extract_'):
+                    df[target_field] = self._extract_time_component(
+                        df[field], operation, time_format, (column_stats or {}).get(field)
+                    )
+
+            return df
+        except Exception as e:
+            logger.warning(f"Transform operation failed: {str(e)}")
+            return df
+
+    def _convert_percent_to_decimal(self, series, decimal_places=2):
+        """将百分比字符串转换为小数，无法解析的值保持原样"""
+        try:
+            # 处理各种百分比格式：50%, 50.5%, 50.55% 等
+            return percent_to_decimal(series, decimal_places)
+        except Exception as e:
+            logger.warning(f"Percent to decimal conversion failed: {str(e)}")
+            return series
+
+    def _convert_decimal_to_percent(self, series, decimal_places=2):
+        """将小数转换为百分比，无法解析的值保持原样"""
+        try:
+            return decimal_to_percent(series, decimal_places)
+        except Exception as e:
+            logger.warning(f"Decimal to percent conversion failed: {str(e)}")
+            return series
+
+    def _extract_time_component(self, series, operation, time_format='auto', stats=None):
+        """提取时间组件，stats 为流式执行时预先统计的整列统计量"""
+        try:
+            # 同一字段、同一格式在本次执行中只解析一次
+            parsed_dates = self.datetime_cache.parse(series, time_format, stats)
+
+            # 根据操作类型提取不同的时间组件
+            if operation == 'extract_year':
+                return parsed_dates.dt.year
+            elif operation == 'extract_month':
+                return parsed_dates.dt.month
+            elif operation == 'extract_day':
+                return parsed_dates.dt.day
+            elif operation == 'extract_hour':
+                return parsed_dates.dt.hour
+            elif operation == 'extract_minute':
+                return parsed_dates.dt.minute
+            elif operation == 'extract_second':
+                return parsed_dates.dt.second
+            elif operation == 'extract_quarter':
+                return parsed_dates.dt.quarter
+            elif operation == 'extract_weekday':
+                # 返回星期几 (0-6, 0=周一)
+                return parsed_dates.dt.dayofweek
+            else:
+                return series
+
+        except Exception as e:
+            logger.warning(f"Time extraction failed: {str(e)}")
+            return series
+
+    def _apply_aggregate(self, df, config):
+        """应用数据聚合 - 支持多字段分组和多字段聚合"""
+        group_by, aggregations = get_aggregate_config(config)
+
+        # 验证配置
+        if not group_by:
+            logger.warning("聚合操作缺少分组字段")
+            return df
+
+        if not aggregations:
+            logger.warning("聚合操作缺少聚合配置")
+            return df
+
+        # 验证分组字段是否存在
+        for field in group_by:
+            if field not in df.columns:
+                logger.warning(f"分组字段 '{field}' 在数据集中不存在")
+                return df
+
+        try:
+            # 构建聚合配置字典
+            agg_dict = {}
+            output_columns = list(group_by)  # 保留分组字段
+
+            for agg_config in aggregations:
+                field = agg_config.get('field', '')
+                operation = agg_config.get('operation', '')
+                output_name = agg_config.get('output_name', '')
+
+                if not field or not operation:
+                    continue
+
+                if field not in df.columns:
+                    logger.warning(f"聚合字段 '{field}' 在数据集中不存在")
+                    continue
+
+                # 转换数值类型
+                if operation != 'count':  # count 不需要数值转换
+                    df[field] = pd.to_numeric(df[field], errors='coerce')
+
+                # 设置默认输出名称
+                output_name = get_aggregate_output_name(field, operation, output_name)
+
+                pandas_operation = AGGREGATE_OPERATIONS.get(operation)
+                if pandas_operation:
+                    agg_dict[output_name] = (field, pandas_operation)
+                    output_columns.append(output_name)
+
+            if not agg_dict:
+                logger.warning("没有有效的聚合配置")
+                return df
+
+            # 执行分组聚合
+            grouped = df.groupby(group_by)
+
+            # 构建聚合表达式
+            agg_expressions = {}
+            for output_name, (field, operation) in agg_dict.items():
+                if operation == 'first':
+                    agg_expressions[output_name] = grouped[field].first()
+                elif operation == 'last':
+                    agg_expressions[output_name] = grouped[field].last()
+                else:
+                    agg_expressions[output_name] = getattr(grouped[field], operation)()
+
+            # 执行聚合
+            result = pd.DataFrame(agg_expressions).reset_index()
+
+            # 确保列顺序正确
+            result = result[output_columns]
+
+            logger.info(f"聚合操作完成: 分组字段={group_by}, 聚合配置={len(aggregations)}个")
+            return result
+
+        except Exception as e:
+            logger.error(f"Aggregate operation failed: {str(e)}")
+            import traceback
+            logger.error(f"详细错误: {traceback.format_exc()}")
+            return df
+
+    def _apply_select(self, df, config):
+        """应用数据截取 - 选择特定字段"""
+        selected_fields = config.get('selected_fields', [])
+        mode = config.get('mode', 'include')  # include 或 exclude
+        rename_mapping = config.get('rename_mapping', {})
+
+        if not selected_fields:
+            logger.warning("数据截取操作未选择任何字段")
+            return df
+
+        try:
+            # 根据模式处理字段选择
+            if mode == 'include':
+                # 只保留选中的字段
+                # 确保选中的字段在数据集中存在
+                existing_fields = [field for field in selected_fields if field in df.columns]
+                if not existing_fields:
+                    logger.warning("选中的字段在数据集中都不存在")
+                    return df
+                result_df = df[existing_fields].copy()
+            elif mode == 'exclude':
+                # 排除选中的字段
+                # 确保排除后还有字段剩余
+                remaining_fields = [field for field in df.columns if field not in selected_fields]
+                if not remaining_fields:
+                    logger.warning("排除所有字段后没有剩余字段")
+                    return df
+                result_df = df[remaining_fields].copy()
+            else:
+                logger.warning(f"未知的数据截取模式: {mode}")
+                return df
+
+            # 应用字段重命名
+            if rename_mapping:
+                rename_dict = {}
+                for old_name, new_name in rename_mapping.items():
+                    if old_name in result_df.columns and new_name and new_name.strip():
+                        rename_dict[old_name] = new_name.strip()
+
+                if rename_dict:
+                    result_df = result_df.rename(columns=rename_dict)
+                    logger.info(f"重命名字段: {rename_dict}")
+
+            logger.info(f"数据截取完成: 模式={mode}, 字段数={len(result_df.columns)}")
+            return result_df
+
+        except Exception as e:
+            logger.error(f"数据截取操作失败: {str(e)}")
+            import traceback
+            logger.error(f"详细错误: {traceback.format_exc()}")
+            return df
+
+    def _apply_clean(self, df, config):
+        """应用数据清洗"""
+        field = config.get('field', '')
+        operation = config.get('operation', '')
+        value = config.get('value', '')
+
+        if not field or field not in df.columns:
+            return df
+
+        try:
+            if operation == 'fill_na':
+                fill_value = value if value != '' else 0
+                df[field] = df[field].fillna(fill_value)
+            elif operation == 'remove_duplicates':
+                df = df.drop_duplicates(subset=[field])
+            elif operation == 'remove_na':
+                df = df.dropna(subset=[field])
+
+            return df
+        except Exception as e:
+            logger.warning(f"Clean operation failed: {str(e)}")
+            return df
+
+    def _apply_sort(self, df, config):
+        """应用数据排序，并按配置截取排序后的部分行"""
+        sort_fields = [
+            sort_config for sort_config in config.get('sort_fields', [])
+            if sort_config.get('field') in df.columns
+        ]
+
+        try:
+            if sort_fields:
+                df = df.sort_values(
+                    by=[sort_config['field'] for sort_config in sort_fields],
+                    ascending=[sort_config.get('order', 'asc') != 'desc' for sort_config in sort_fields],
+                    kind='mergesort',
+                    na_position='last'
+                )
+
+            if config.get('enable_limit', False):
+                limit_type = config.get('limit_type', 'top')
+                if limit_type == 'top':
+                    df = df.head(int(config.get('limit_count', 10)))
+                elif limit_type == 'bottom':
+                    df = df.tail(int(config.get('limit_count', 10)))
+                elif limit_type == 'range':
+                    # 与页面预览一致：第 start_row 行到第 end_row 行（含）
+                    start_row = int(config.get('start_row', 0))
+                    end_row = int(config.get('end_row', 10))
+                    df = df.iloc[start_row:end_row + 1]
+
+            return df.reset_index(drop=True)
+        except Exception as e:
+            logger.warning(f"Sort operation failed: {str(e)}")
+            return df
+
+    def validate_pipeline_data(self, pipeline, columns, pipeline_modules=None):
+        """
+        只依据列名验证处理流程，返回流程输出的列名列表
+
+        每个模块按 processing.schema 中登记的规则检查引用的字段并推导输出列，
+        不读取也不执行数据；模块配置不合法时抛出 ValidationError。
+        """
+        if pipeline_modules is None:
+            pipeline_modules = PipelineModule.objects.filter(pipeline=pipeline).order_by('order')
+
+        return infer_pipeline_schema(pipeline_modules, columns)
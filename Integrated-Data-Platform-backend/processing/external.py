@@ -0,0 +1,443 @@
+# Copyright (c) 2025 YycKop
+# MIT License
+# Integrated-Data-Platform-backend/processing/external.py
+"""
+处理流程的外存执行算法
+
+输入数据超过 PIPELINE_OUT_OF_CORE_ROWS 行时，流程按数据块流式执行（PipelineExecutor._stream_plan）：
+逐行模块直接逐块处理，需要看到全部数据的模块使用这里的算法，内存占用与数据总量无关：
+
+- 排序：有截取时只保留当前排在最前（或最后）的 N 行；否则每 PIPELINE_SORT_RUN_ROWS 行排序后
+  溢写为一个有序段，再分块多路归并；
+- 聚合：逐块做部分聚合并合并到按分组的中间状态；含中位数等无法合并的操作时，
+  按分组键哈希分区溢写，再逐个分区完整聚合；
+- 去重：只记录已出现过的值；
+- 依赖整列统计量的转换（标准化、归一化、时间戳提取）：先溢写并统计，再逐块转换。
+
+溢写文件是 pickle 格式的数据块，可以保存任意列类型；执行结束后整个溢写目录被删除。
+"""
+import math
+import os
+import shutil
+import tempfile
+import warnings
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+# 可以由部分结果合并得到的聚合操作
+MERGEABLE_AGGREGATIONS = ['sum', 'count', 'max', 'min', 'mean', 'std', 'var', 'first', 'last']
+
+
+def get_out_of_core_rows():
+    return int(getattr(settings, 'PIPELINE_OUT_OF_CORE_ROWS', 2000000))
+
+
+def get_chunk_rows():
+    return max(1, int(getattr(settings, 'PIPELINE_CHUNK_ROWS', 200000)))
+
+
+def get_sort_run_rows():
+    return max(1, int(getattr(settings, 'PIPELINE_SORT_RUN_ROWS', 1000000)))
+
+
+def get_spill_partitions():
+    return max(1, int(getattr(settings, 'PIPELINE_SPILL_PARTITIONS', 16)))
+
+
+def concat_frames(frames):
+    """按顺序拼接数据块，行号重新从 0 开始"""
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    with warnings.catch_warnings():
+        # 各数据块列类型不一致时由 pandas 统一类型，忽略合并类型提示
+        warnings.simplefilter('ignore', FutureWarning)
+        return pd.concat(frames, ignore_index=True, sort=False)
+
+
+def split_frame(df, rows=None):
+    """把 DataFrame 切分为数据块"""
+    rows = rows or get_chunk_rows()
+    for start in range(0, len(df), rows):
+        yield df.iloc[start:start + rows]
+
+
+def peek(frames):
+    """取出第一个数据块，返回 (第一个数据块, 包含它的完整数据块迭代器)，没有数据块时第一项为 None"""
+    frames = iter(frames)
+    first = next(frames, None)
+    if first is None:
+        return None, iter(())
+
+    def chained():
+        yield first
+        yield from frames
+
+    return first, chained()
+
+
+class SpillRun:
+    """按写入顺序保存在磁盘上的一组数据块"""
+
+    def __init__(self, path):
+        os.makedirs(path)
+        self.path = path
+        self.blocks = []
+        self.rows = 0
+
+    def append(self, df):
+        if len(df) == 0:
+            return
+        path = os.path.join(self.path, f'{len(self.blocks):06d}.pkl')
+        df.to_pickle(path)
+        self.blocks.append(path)
+        self.rows += len(df)
+
+    def load(self, index):
+        """读取第 index 个数据块，读取后删除文件"""
+        path = self.blocks[index]
+        df = pd.read_pickle(path)
+        os.remove(path)
+        return df
+
+    def drain(self):
+        """按顺序读出全部数据块"""
+        for index in range(len(self.blocks)):
+            yield self.load(index)
+
+
+class SpillArea:
+    """一次流程执行使用的溢写目录"""
+
+    def __init__(self):
+        spill_dir = getattr(settings, 'PIPELINE_SPILL_DIR', None)
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+        self.path = tempfile.mkdtemp(prefix='pipeline-spill-', dir=spill_dir)
+        self._runs = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.cleanup()
+        return False
+
+    def new_run(self):
+        self._runs += 1
+        return SpillRun(os.path.join(self.path, f'run-{self._runs:05d}'))
+
+    def cleanup(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def sort_frame(df, by, ascending):
+    """与 _apply_sort 相同的稳定排序"""
+    return df.sort_values(by=by, ascending=ascending, kind='mergesort', na_position='last')
+
+
+def _sort_positions(df, by, ascending):
+    return sort_frame(df[by].reset_index(drop=True), by, ascending).index.to_numpy()
+
+
+def external_sort(frames, by, ascending, spill, run_rows=None, block_rows=None):
+    """
+    外部归并排序，结果与对全部数据做一次稳定排序相同
+
+    每 run_rows 行排序后写成一个有序段（按 block_rows 行分块保存），全部数据只有一个段时不溢写；
+    归并时各段每次载入若干数据块，所有段的缓冲合计约 run_rows 行。
+    """
+    run_rows = run_rows or get_sort_run_rows()
+    block_rows = block_rows or max(1000, run_rows // 64)
+    runs = []
+    buffer, buffered = [], 0
+
+    def write_run():
+        run = spill.new_run()
+        for block in split_frame(sort_frame(concat_frames(buffer), by, ascending), block_rows):
+            run.append(block)
+        runs.append(run)
+
+    for df in frames:
+        buffer.append(df)
+        buffered += len(df)
+        if buffered >= run_rows:
+            write_run()
+            buffer, buffered = [], 0
+
+    if not runs:
+        # 全部数据放得下一个有序段，不需要溢写
+        if buffered:
+            yield sort_frame(concat_frames(buffer), by, ascending)
+        return
+
+    if buffered:
+        write_run()
+    yield from _merge_runs(runs, by, ascending, max(1, run_rows // (block_rows * len(runs))))
+
+
+def _merge_runs(runs, by, ascending, blocks_per_load=1):
+    """
+    分块多路归并
+
+    每段缓冲 blocks_per_load 个数据块。还有后续数据块的段中，缓冲区最后一行是该段已载入的最大值，
+    其中最小的一个作为本轮界限：严格小于界限的行不会再有更小的后续数据，可以输出。
+    界限行作为哨兵放在最前面参与稳定排序，排在哨兵之前的行就是严格小于界限的行；
+    同值的行按段的先后（即原始输入顺序）输出，保持排序的稳定性。
+    """
+    positions = [0] * len(runs)
+
+    def load(index):
+        end = min(positions[index] + blocks_per_load, len(runs[index].blocks))
+        blocks = [runs[index].load(position) for position in range(positions[index], end)]
+        positions[index] = end
+        return concat_frames(blocks)
+
+    def has_more(index):
+        return positions[index] < len(runs[index].blocks)
+
+    buffers = [load(index) for index in range(len(runs))]
+
+    while True:
+        live = [index for index in range(len(runs)) if len(buffers[index])]
+        if not live:
+            return
+        open_runs = [index for index in live if has_more(index)]
+        if not open_runs:
+            yield sort_frame(concat_frames([buffers[index] for index in live]), by, ascending)
+            return
+
+        lasts = concat_frames([buffers[index].iloc[-1:] for index in open_runs])
+        first = _sort_positions(lasts, by, ascending)[0]
+        limiting_run = open_runs[first]
+
+        combined = concat_frames([lasts.iloc[[first]]] + [buffers[index] for index in live])
+        owners = np.concatenate([[-1]] + [np.full(len(buffers[index]), index) for index in live])
+        order = _sort_positions(combined, by, ascending)
+        emitted = order[:int(np.flatnonzero(order == 0)[0])]
+
+        if len(emitted) == 0:
+            # 缓冲的行都不小于界限，继续载入界限所在段的下一个数据块
+            buffers[limiting_run] = concat_frames([buffers[limiting_run], load(limiting_run)])
+            continue
+
+        yield combined.iloc[emitted]
+        # 每段输出的行是其缓冲区的前缀
+        emitted_owners = owners[emitted]
+        for index in live:
+            buffers[index] = buffers[index].iloc[int((emitted_owners == index).sum()):]
+        for index in open_runs:
+            if len(buffers[index]) == 0:
+                buffers[index] = load(index)
+
+
+def limited_sort(frames, by, ascending, limit_type, limit_count=10, start_row=0, end_row=10):
+    """排序后只截取部分行：逐块合并并只保留可能进入结果的行"""
+    if limit_type == 'range':
+        keep, from_head = end_row + 1, True
+    else:
+        keep, from_head = limit_count, limit_type == 'top'
+
+    kept = None
+    for df in frames:
+        combined = df if kept is None else concat_frames([kept, df])
+        if by:
+            combined = sort_frame(combined, by, ascending)
+        kept = combined.head(keep) if from_head else combined.tail(keep)
+
+    if kept is None:
+        return
+    if limit_type == 'range':
+        kept = kept.iloc[start_row:]
+    yield kept.reset_index(drop=True)
+
+
+def drop_duplicates_stream(frames, field):
+    """按字段去重并保留第一次出现的行，与 drop_duplicates(subset=[field]) 相同，空值视为同一个值"""
+    seen = set()
+    seen_null = False
+    for df in frames:
+        if field not in df.columns:
+            yield df
+            continue
+
+        values = df[field]
+        notnull = values.notna().to_numpy()
+        in_seen = np.full(len(df), seen_null)
+        in_seen[notnull] = values[notnull].map(seen.__contains__).to_numpy(dtype=bool)
+        keep = ~values.duplicated().to_numpy() & ~in_seen
+
+        seen.update(values[notnull & keep].tolist())
+        seen_null = seen_null or not notnull.all()
+        yield df[keep]
+
+
+def partial_state(df, group_by, aggregations):
+    """一个数据块的部分聚合结果，以分组键为索引，列名为 '<聚合序号>:<中间量>'"""
+    # 与 _apply_aggregate 一样，除计数外的聚合字段先转换为数值
+    numeric_fields = {field for _, field, operation in aggregations if operation != 'count'}
+    df = df.assign(**{field: pd.to_numeric(df[field], errors='coerce') for field in numeric_fields})
+    grouped = df.groupby(group_by, sort=False)
+    columns = {}
+    for position, (_, field, operation) in enumerate(aggregations):
+        values = grouped[field]
+        if operation == 'mean':
+            columns[f'{position}:sum'] = values.sum()
+            columns[f'{position}:count'] = values.count()
+        elif operation in ['std', 'var']:
+            count = values.count()
+            columns[f'{position}:count'] = count
+            columns[f'{position}:mean'] = values.mean()
+            columns[f'{position}:m2'] = values.var(ddof=0) * count
+        else:
+            columns[f'{position}:{operation}'] = getattr(values, operation)()
+    return pd.DataFrame(columns)
+
+
+def merge_states(states):
+    """合并多个部分聚合结果；方差按分组用各部分的均值和离差平方和合并"""
+    combined = pd.concat(states)
+    levels = list(range(combined.index.nlevels))
+    grouped = combined.groupby(level=levels, sort=False)
+
+    merged = {}
+    for column in combined.columns:
+        kind = column.split(':')[1]
+        if kind in ['sum', 'count']:
+            merged[column] = grouped[column].sum()
+        elif kind in ['min', 'max', 'first', 'last']:
+            merged[column] = getattr(grouped[column], kind)()
+
+    for column in combined.columns:
+        if not column.endswith(':m2'):
+            continue
+        prefix = column[:-len(':m2')]
+        count = combined[f'{prefix}:count']
+        mean = combined[f'{prefix}:mean']
+        weighted = (count * mean.fillna(0)).groupby(level=levels, sort=False).sum()
+        total_mean = weighted / merged[f'{prefix}:count']
+        deviation = combined[column].fillna(0) + (count * (mean - total_mean.reindex(combined.index)) ** 2).fillna(0)
+        merged[f'{prefix}:mean'] = total_mean
+        merged[column] = deviation.groupby(level=levels, sort=False).sum()
+
+    return pd.DataFrame(merged)
+
+
+def partial_aggregate(frames, group_by, aggregations):
+    """
+    逐块部分聚合再合并，aggregations 为 [(输出名称, 字段, 操作)]，只支持 MERGEABLE_AGGREGATIONS 中的操作
+
+    结果与 _apply_aggregate 对全部数据聚合的结果相同：按分组键排序，空分组键被忽略。
+    """
+    return combine_states((partial_state(df, group_by, aggregations) for df in frames), group_by, aggregations)
+
+
+def combine_states(partials, group_by, aggregations):
+    """
+    合并各数据块的部分聚合结果并计算最终聚合值
+
+    各部分结果累积到与当前分组数相当时才合并一次，合并的总开销与数据块数成线性关系。
+    """
+    state = None
+    pending, pending_rows = [], 0
+
+    for partial in partials:
+        pending.append(partial)
+        pending_rows += len(partial)
+        if pending_rows >= (len(state) if state is not None else 0):
+            state = merge_states(([state] if state is not None else []) + pending)
+            pending, pending_rows = [], 0
+
+    if pending:
+        state = merge_states(([state] if state is not None else []) + pending)
+    return finalize_state(state, group_by, aggregations)
+
+
+def finalize_state(state, group_by, aggregations):
+    """由合并后的部分聚合结果计算最终聚合值，按分组键排序"""
+    names = [output_name for output_name, _, _ in aggregations]
+    if state is None:
+        return pd.DataFrame(columns=list(group_by) + names)
+
+    result = {}
+    for position, (output_name, _, operation) in enumerate(aggregations):
+        if operation == 'mean':
+            result[output_name] = state[f'{position}:sum'] / state[f'{position}:count']
+        elif operation in ['std', 'var']:
+            count = state[f'{position}:count']
+            variance = (state[f'{position}:m2'] / (count - 1)).where(count > 1)
+            result[output_name] = variance if operation == 'var' else np.sqrt(variance)
+        else:
+            result[output_name] = state[f'{position}:{operation}']
+
+    frame = pd.DataFrame(result).sort_index().reset_index()
+    return frame[list(group_by) + names]
+
+
+def partitioned_aggregate(frames, group_by, spill, aggregate, partitions=None):
+    """
+    按分组键哈希分区溢写后逐个分区聚合，用于中位数等无法由部分结果合并的操作
+
+    同一分组的行都落在同一分区且保持输入顺序，aggregate(分区数据) 的结果合并后按分组键排序。
+    """
+    partitions = partitions or get_spill_partitions()
+    runs = [spill.new_run() for _ in range(partitions)]
+
+    for df in frames:
+        keys = pd.util.hash_pandas_object(df[group_by], index=False).to_numpy() % partitions
+        for partition in np.unique(keys):
+            runs[partition].append(df[keys == partition])
+
+    results = [aggregate(concat_frames(list(run.drain()))) for run in runs if run.rows]
+    if not results:
+        return None
+    return sort_frame(concat_frames(results), list(group_by), True).reset_index(drop=True)
+
+
+class ColumnStats:
+    """逐块累计一列数值的统计量，与对整列调用 mean()/std()/min()/max() 的结果一致"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def update(self, values):
+        values = values.dropna()
+        count = len(values)
+        if count == 0:
+            return
+        mean = float(values.mean())
+        m2 = float(values.var(ddof=0)) * count
+        total = self.count + count
+        delta = mean - self.mean
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.mean += delta * count / total
+        self.count = total
+
+        low, high = values.min(), values.max()
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    def result(self):
+        return {
+            'mean': self.mean if self.count else math.nan,
+            'std': math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else math.nan,
+            'min': self.min if self.min is not None else math.nan,
+            'max': self.max if self.max is not None else math.nan,
+        }
+
+
+def spill_with_stats(frames, fields, spill):
+    """把数据块溢写到磁盘，同时统计 fields 中各字段的数值统计量，返回 (溢写段, {字段: 统计量})"""
+    run = spill.new_run()
+    stats = {}
+    for df in frames:
+        for field in fields:
+            if field in df.columns:
+                stats.setdefault(field, ColumnStats()).update(pd.to_numeric(df[field], errors='coerce'))
+        run.append(df)
+    return run, {field: column_stats.result() for field, column_stats in stats.items()}
@@ -0,0 +1,255 @@
+# Copyright (c) 2025 YycKop
+# MIT License
+# Integrated-Data-Platform-backend/processing/jobs.py
+"""
+处理流程后台执行
+
+PipelineRun 表本身就是任务队列：执行请求只创建一条 queued 状态的记录，
+本地进程池中的工作进程通过条件更新（queued -> running）领取任务，因此多个 Web 进程
+或独立的 run_pipeline_worker 进程同时派发同一任务也只会执行一次，不依赖外部消息中间件。
+
+执行中任务的 updated_at 同时作为租约：执行进程在报告进度、模块之间以及后台心跳线程中不断刷新它。
+执行进程（Web 进程或工作进程）异常退出后租约不再刷新，超过 PIPELINE_RUN_LEASE_SECONDS
+仍未刷新的 running 任务由新启动的进程池或 run_pipeline_worker 标记为失败。
+
+PIPELINE_EXECUTION_MODE:
+    local  - Web 进程内按需启动本地进程池并在事务提交后派发任务（默认）
+    worker - 只入队，由 `python manage.py run_pipeline_worker` 领取执行
+    sync   - 在请求中直接执行，便于调试
+"""
+import functools
+import logging
+import multiprocessing
+import os
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .executor import PipelineCancelled, PipelineExecutor
+from .models import PipelineModule, PipelineRun
+from .worker import init_worker, run_job
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_execution_mode():
+    return getattr(settings, 'PIPELINE_EXECUTION_MODE', 'local')
+
+
+def get_worker_processes():
+    return max(1, int(getattr(settings, 'PIPELINE_WORKER_PROCESSES', 2)))
+
+
+def get_lease_seconds():
+    """执行中任务的租约时长（秒）"""
+    return max(1, int(getattr(settings, 'PIPELINE_RUN_LEASE_SECONDS', 300)))
+
+
+def create_pool(max_workers=None):
+    """创建本地工作进程池，使用 spawn 避免子进程继承父进程的数据库连接"""
+    return ProcessPoolExecutor(
+        max_workers=max_workers or get_worker_processes(),
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=init_worker
+    )
+
+
+def _ensure_pool():
+    """确保 Web 进程内的共享进程池已创建；新建时接管遗留的排队任务并返回 True"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            return False
+        _pool = create_pool()
+    expire_stale_runs()
+    for run_id in PipelineRun.objects.filter(status='queued').order_by('created_at').values_list('id', flat=True):
+        _submit(run_id)
+    return True
+
+
+def _submit(run_id):
+    global _pool
+    try:
+        future = _pool.submit(run_job, run_id)
+    except BrokenProcessPool:
+        # 工作进程异常退出后进程池不可再用，重建一次
+        with _pool_lock:
+            _pool = create_pool()
+        future = _pool.submit(run_job, run_id)
+    future.add_done_callback(functools.partial(handle_job_done, run_id))
+    return future
+
+
+def handle_job_done(run_id, future):
+    """工作进程异常退出时，把未结束的任务标记为失败"""
+    error = future.exception()
+    if error is None:
+        return
+    logger.error(f"流程执行任务 #{run_id} 异常退出: {error}")
+    now = timezone.now()
+    PipelineRun.objects.filter(pk=run_id, status__in=['queued', 'running']).update(
+        status='failed',
+        error=f'处理流程执行失败: 执行进程异常退出 ({error})',
+        finished_at=now,
+        updated_at=now
+    )
+
+
+def expire_stale_runs():
+    """租约过期（执行进程已退出）的执行中任务标记为失败，返回处理的任务数"""
+    now = timezone.now()
+    expired = PipelineRun.objects.filter(
+        status='running', updated_at__lt=now - timedelta(seconds=get_lease_seconds())
+    ).update(
+        status='failed',
+        error='处理流程执行失败: 执行进程已退出或失去响应',
+        finished_at=now,
+        updated_at=now
+    )
+    if expired:
+        logger.warning(f"{expired} 个执行任务的租约已过期，已标记为失败")
+    return expired
+
+
+def renew_lease(run_id):
+    """刷新执行中任务的租约"""
+    PipelineRun.objects.filter(pk=run_id, status='running').update(updated_at=timezone.now())
+
+
+class LeaseHeartbeat(threading.Thread):
+    """执行期间在后台定期刷新租约，单个模块执行时间超过租约时长时任务也不会被判定为失去响应"""
+
+    def __init__(self, run_id):
+        super().__init__(name=f'pipeline-run-{run_id}-heartbeat', daemon=True)
+        self.run_id = run_id
+        self.interval = get_lease_seconds() / 3
+        self._stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self._stopped.wait(self.interval):
+                renew_lease(self.run_id)
+        except Exception as e:
+            logger.warning(f"执行任务 #{self.run_id} 刷新租约失败: {str(e)}")
+        finally:
+            connection.close()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def dispatch(run_id):
+    """把任务交给本地进程池"""
+    if not _ensure_pool():
+        _submit(run_id)
+
+
+def enqueue_run(pipeline, user):
+    """创建执行任务并按执行模式派发，返回 PipelineRun"""
+    pipeline_modules = list(PipelineModule.objects.filter(pipeline=pipeline).order_by('order'))
+    run = PipelineRun.objects.create(
+        pipeline=pipeline,
+        created_by=user,
+        progress=PipelineExecutor.initial_progress(pipeline_modules)
+    )
+
+    mode = get_execution_mode()
+    if mode == 'sync':
+        run_claimed(run.id)
+        run.refresh_from_db()
+    elif mode == 'local':
+        transaction.on_commit(lambda: dispatch(run.id))
+    return run
+
+
+def claim_run(run_id):
+    """领取排队中的任务，只有一个进程能领取成功"""
+    now = timezone.now()
+    return PipelineRun.objects.filter(pk=run_id, status='queued').update(
+        status='running',
+        started_at=now,
+        updated_at=now,
+        worker_pid=os.getpid()
+    ) == 1
+
+
+def _finish_run(run_id, status, result=None, error=''):
+    now = timezone.now()
+    PipelineRun.objects.filter(pk=run_id).update(
+        status=status,
+        result=result,
+        error=error,
+        finished_at=now,
+        updated_at=now
+    )
+
+
+def execute_run(run_id):
+    """在工作进程中执行一个任务"""
+    close_old_connections()
+    try:
+        run_claimed(run_id)
+    finally:
+        close_old_connections()
+
+
+def run_claimed(run_id):
+    """领取并执行任务，任务已被其他进程领取或已取消时直接返回"""
+    if not claim_run(run_id):
+        return
+
+    run = PipelineRun.objects.select_related('pipeline', 'pipeline__input_dataset', 'created_by').get(pk=run_id)
+
+    def on_progress(progress):
+        PipelineRun.objects.filter(pk=run_id).update(progress=progress, updated_at=timezone.now())
+
+    def should_cancel():
+        # 模块之间检查取消请求时顺便刷新租约
+        renew_lease(run_id)
+        return PipelineRun.objects.filter(pk=run_id, cancel_requested=True).exists()
+
+    executor = PipelineExecutor(run.pipeline, run.created_by, on_progress=on_progress, should_cancel=should_cancel)
+    heartbeat = LeaseHeartbeat(run_id)
+    heartbeat.start()
+    try:
+        result = executor.run()
+    except PipelineCancelled:
+        _finish_run(run_id, 'cancelled', error='处理流程已取消')
+    except ValidationError as e:
+        logger.error(f"Pipeline validation error: {str(e)}")
+        _finish_run(run_id, 'failed', error=f'数据验证失败: {"; ".join(e.messages)}')
+    except Exception as e:
+        logger.error(f"Pipeline execution error: {str(e)}")
+        logger.error(f"详细错误信息: {traceback.format_exc()}")
+        _finish_run(run_id, 'failed', error=f'处理流程执行失败: {str(e)}')
+    else:
+        _finish_run(run_id, 'succeeded', result=result)
+    finally:
+        heartbeat.stop()
+
+
+def request_cancel(run):
+    """请求取消任务：排队中的任务直接取消，执行中的任务在下一个模块开始前停止"""
+    now = timezone.now()
+    cancelled = PipelineRun.objects.filter(pk=run.pk, status='queued').update(
+        status='cancelled',
+        cancel_requested=True,
+        error='处理流程已取消',
+        finished_at=now,
+        updated_at=now
+    )
+    if not cancelled:
+        PipelineRun.objects.filter(pk=run.pk, status='running').update(cancel_requested=True, updated_at=now)
+    run.refresh_from_db()
+    return run
@@ -0,0 +1,100 @@
+# Copyright (c) 2025 YycKop
+# MIT License
+# Integrated-Data-Platform-backend/processing/kernels.py
+"""
+转换模块的向量化内核
+
+文本列先转换为 Arrow 字符串数组，用 Arrow 的字符串和类型转换内核整列处理，
+避免对每个值调用 Python 函数；数值列直接按列计算。
+与原来逐值 float() 解析的结果保持一致：无法解析的值（以及空值）原样保留。
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+
+# float() 能够解析的十进制数字和 inf/nan 字面量
+NUMBER_PATTERN = r'^[+-]?(?:(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?|(?i:inf|infinity|nan))$'
+# NUMBER_PATTERN 只匹配 ASCII 数字；不匹配且含非 ASCII 字符或下划线的值（'1_000'、全角数字、
+# 阿拉伯-印度数字等）float() 也可能解析，这类值通常很少，逐个用 float() 解析
+FALLBACK_PATTERN = r'[^\x00-\x7f]|_'
+
+
+def parse_numbers(series, strip=''):
+    """
+    把文本列解析为 float64，返回 (数值, 是否解析成功)
+
+    每个值先转换为字符串并去掉 strip 中的字符和首尾空白，解析失败的位置为 NaN。
+    """
+    text = pa.array(series.astype(str).to_numpy(), type=pa.string())
+    for char in strip:
+        text = pc.replace_substring(text, char, '')
+    text = pc.utf8_trim_whitespace(text)
+
+    parsed = pc.match_substring_regex(text, NUMBER_PATTERN)
+    values = pc.cast(pc.if_else(parsed, text, None), pa.float64()).to_numpy(zero_copy_only=False)
+    fallback = pc.and_(pc.invert(parsed), pc.match_substring_regex(text, FALLBACK_PATTERN))
+    parsed = parsed.to_numpy(zero_copy_only=False)
+
+    positions = np.flatnonzero(fallback.to_numpy(zero_copy_only=False))
+    if len(positions):
+        values, parsed = values.copy(), parsed.copy()
+        for position, value in zip(positions, text.take(positions).to_pylist()):
+            try:
+                values[position] = float(value)
+            except ValueError:
+                continue
+            parsed[position] = True
+    return pd.Series(values, index=series.index), pd.Series(parsed, index=series.index)
+
+
+def restore_unparsed(series, converted, parsed):
+    """解析失败的位置换回原值；没有需要保留的非空值时直接返回数值列"""
+    keep = ~parsed
+    if not (keep & series.notna()).any():
+        return converted
+    result = converted.astype(object)
+    result[keep] = series[keep]
+    return result
+
+
+def round_values(values, decimal_places):
+    """
+    与 Python round() 结果一致的按列舍入，values 为 float64 Series
+
+    按列缩放舍入时乘法的误差可能改变恰好处在 .5 附近的值的舍入方向，
+    这些值（通常只占很少一部分）逐个用 round() 重新计算。
+    """
+    scale = 10.0 ** decimal_places
+    scaled = values.to_numpy(dtype='float64') * scale
+    rounded = np.round(scaled) / scale
+
+    with np.errstate(invalid='ignore'):
+        near_tie = np.abs(scaled - np.floor(scaled) - 0.5) <= np.maximum(np.abs(scaled), 1.0) * 1e-9
+    positions = np.flatnonzero(near_tie)
+    if len(positions):
+        raw = values.to_numpy(dtype='float64')
+        rounded[positions] = [round(value, decimal_places) for value in raw[positions].tolist()]
+    return pd.Series(rounded, index=values.index)
+
+
+def percent_to_decimal(series, decimal_places=2):
+    """百分比（如 '50%'、'12.5 %'、0.5）除以 100 并保留指定小数位数"""
+    if is_bool_dtype(series):
+        # 布尔值不是数字，原样保留
+        return series
+    if is_numeric_dtype(series):
+        return round_values(series.astype('float64') / 100.0, decimal_places)
+
+    numbers, parsed = parse_numbers(series, strip='%')
+    return restore_unparsed(series, round_values(numbers / 100.0, decimal_places), parsed)
+
+
+def decimal_to_percent(series, decimal_places=2):
+    """小数乘以 100 并保留指定小数位数"""
+    if is_numeric_dtype(series):
+        return round_values(series.astype('float64') * 100.0, decimal_places)
+
+    numbers, parsed = parse_numbers(series)
+    return restore_unparsed(series, round_values(numbers * 100.0, decimal_places), parsed)
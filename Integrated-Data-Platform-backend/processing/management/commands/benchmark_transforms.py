@@ -0,0 +1,98 @@
+# Copyright (c) 2025 YycKop
+# MIT License
+# Integrated-Data-Platform-backend/processing/management/commands/benchmark_transforms.py
+import time
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+
+from processing.kernels import decimal_to_percent, percent_to_decimal
+
+
+def build_series(rows, seed=0):
+    """构造测试数据：百分比文本列、小数文本列和数值列，混入空值和无法解析的值"""
+    rng = np.random.default_rng(seed)
+    values = (rng.random(rows) * 200 - 50).round(3)
+    percent = pd.Series([f'{value}%' for value in values], dtype=object)
+    decimal = pd.Series([str(value / 100) for value in values], dtype=object)
+
+    for series in (percent, decimal):
+        series[rng.random(rows) < 0.02] = None
+        series[rng.random(rows) < 0.01] = rng.choice(['N/A', '--', '约50%', '']).item()
+    percent[rng.random(rows) < 0.1] = ' 12.5 % '
+
+    return {
+        '百分比文本 -> 小数': (percent, legacy_percent_to_decimal, percent_to_decimal),
+        '小数文本 -> 百分比': (decimal, legacy_decimal_to_percent, decimal_to_percent),
+        '数值列 -> 百分比': (pd.Series(values / 100), legacy_decimal_to_percent, decimal_to_percent),
+    }
+
+
+def legacy_percent_to_decimal(series, decimal_places=2):
+    """原 _convert_percent_to_decimal 中逐值 apply 的实现，作为对比基准"""
+    def convert_value(value):
+        if pd.isna(value):
+            return value
+        str_value = str(value).strip().replace('%', '')
+        try:
+            return round(float(str_value) / 100.0, decimal_places)
+        except (ValueError, TypeError):
+            return value
+
+    return series.apply(convert_value)
+
+
+def legacy_decimal_to_percent(series, decimal_places=2):
+    """原 _convert_decimal_to_percent 中逐值 apply 的实现，作为对比基准"""
+    def convert_value(value):
+        if pd.isna(value):
+            return value
+        try:
+            return round(float(value) * 100.0, decimal_places)
+        except (ValueError, TypeError):
+            return value
+
+    return series.apply(convert_value)
+
+
+def count_mismatches(expected, actual):
+    """逐值比较两种实现的结果，数值允许浮点舍入误差"""
+    mismatches = 0
+    for left, right in zip(expected.tolist(), actual.tolist()):
+        if pd.isna(left) and pd.isna(right):
+            continue
+        if isinstance(left, float) and isinstance(right, float):
+            if abs(left - right) <= 1e-9 * max(1.0, abs(left)):
+                continue
+        elif left == right and type(left) is type(right):
+            continue
+        mismatches += 1
+    return mismatches
+
+
+class Command(BaseCommand):
+    help = '对比逐值 apply 与向量化实现的百分比/小数转换吞吐量（行/秒），并检查结果是否一致'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help='测试数据行数')
+        parser.add_argument('--decimal-places', type=int, default=2, help='保留的小数位数')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        decimal_places = options['decimal_places']
+        self.stdout.write(f'测试数据: {rows} 行')
+
+        for label, (series, legacy, vectorized) in build_series(rows).items():
+            timings = []
+            results = []
+            for func in (legacy, vectorized):
+                started = time.perf_counter()
+                results.append(func(series, decimal_places))
+                timings.append(time.perf_counter() - started)
+
+            mismatches = count_mismatches(*results)
+            self.stdout.write(
+                f'{label}: 原实现 {rows / timings[0]:,.0f} 行/秒, 向量化 {rows / timings[1]:,.0f} 行/秒, '
+                f'{timings[0] / timings[1]:.1f}x, 结果不一致 {mismatches} 行'
+            )
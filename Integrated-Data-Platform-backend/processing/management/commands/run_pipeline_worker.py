@@ -0,0 +1,50 @@
+# Copyright (c) 2025 YycKop
+# MIT License
+# Integrated-Data-Platform-backend/processing/management/commands/run_pipeline_worker.py
+import functools
+import time
+
+from django.core.management.base import BaseCommand
+
+from processing.jobs import create_pool, expire_stale_runs, get_worker_processes, handle_job_done
+from processing.worker import run_job
+from processing.models import PipelineRun
+
+
+class Command(BaseCommand):
+    help = '从数据库任务队列中领取处理流程执行任务，在本地进程池中执行'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='工作进程数，默认使用 PIPELINE_WORKER_PROCESSES')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='查询排队任务的间隔（秒）')
+
+    def handle(self, *args, **options):
+        workers = options['workers'] or get_worker_processes()
+        pool = create_pool(workers)
+        in_flight = {}
+        self.stdout.write(self.style.SUCCESS(f'流程执行进程已启动，工作进程数: {workers}'))
+
+        try:
+            while True:
+                for run_id in [run_id for run_id, future in in_flight.items() if future.done()]:
+                    in_flight.pop(run_id)
+
+                # 其他执行进程异常退出后遗留的执行中任务
+                expire_stale_runs()
+
+                free = workers - len(in_flight)
+                if free > 0:
+                    queued = PipelineRun.objects.filter(status='queued').exclude(
+                        id__in=list(in_flight)
+                    ).order_by('created_at').values_list('id', flat=True)[:free]
+                    for run_id in queued:
+                        future = pool.submit(run_job, run_id)
+                        future.add_done_callback(functools.partial(handle_job_done, run_id))
+                        in_flight[run_id] = future
+                        self.stdout.write(f'派发任务 #{run_id}')
+
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('正在等待执行中的任务结束...')
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,104 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("processing", "0005_remove_processingpipeline_output_dataset_type_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PipelineRun",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("queued", "排队中"),
+                            ("running", "执行中"),
+                            ("succeeded", "执行成功"),
+                            ("failed", "执行失败"),
+                            ("cancelled", "已取消"),
+                        ],
+                        db_index=True,
+                        default="queued",
+                        max_length=20,
+                        verbose_name="状态",
+                    ),
+                ),
+                (
+                    "progress",
+                    models.JSONField(blank=True, default=dict, verbose_name="执行进度"),
+                ),
+                (
+                    "result",
+                    models.JSONField(blank=True, null=True, verbose_name="执行结果"),
+                ),
+                ("error", models.TextField(blank=True, verbose_name="错误信息")),
+                (
+                    "cancel_requested",
+                    models.BooleanField(default=False, verbose_name="请求取消"),
+                ),
+                (
+                    "worker_pid",
+                    models.IntegerField(blank=True, null=True, verbose_name="执行进程"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="创建时间"),
+                ),
+                (
+                    "started_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="开始时间"
+                    ),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="结束时间"
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="更新时间"),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="创建者",
+                    ),
+                ),
+                (
+                    "pipeline",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="runs",
+                        to="processing.processingpipeline",
+                        verbose_name="处理流程",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "流程执行任务",
+                "verbose_name_plural": "流程执行任务",
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
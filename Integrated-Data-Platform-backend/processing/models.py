@@ -3,6 +3,7 @@
 # Integrated-Data-Platform-backend/processing/models.py
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from datasets.models import Dataset
 
 
@@ -50,4 +51,50 @@ class PipelineModule(models.Model):
         ordering = ['order']
 
     def __str__(self):
-        return f"{self.name or '未命名模块'} ({self.get_type_display()})"
\ No newline at end of file
+        return f"{self.name or '未命名模块'} ({self.get_type_display()})"
+
+class PipelineRun(models.Model):
+    """处理流程的一次执行任务，同时作为本地任务队列的队列项"""
+    STATUS_CHOICES = [
+        ('queued', '排队中'),
+        ('running', '执行中'),
+        ('succeeded', '执行成功'),
+        ('failed', '执行失败'),
+        ('cancelled', '已取消'),
+    ]
+    FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+
+    pipeline = models.ForeignKey(ProcessingPipeline, on_delete=models.CASCADE, related_name='runs',
+                                 verbose_name="处理流程")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued', db_index=True,
+                              verbose_name="状态")
+    progress = models.JSONField(default=dict, blank=True, verbose_name="执行进度")
+    result = models.JSONField(null=True, blank=True, verbose_name="执行结果")
+    error = models.TextField(blank=True, verbose_name="错误信息")
+    cancel_requested = models.BooleanField(default=False, verbose_name="请求取消")
+    worker_pid = models.IntegerField(null=True, blank=True, verbose_name="执行进程")
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name="创建者")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="开始时间")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="结束时间")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    class Meta:
+        verbose_name = "流程执行任务"
+        verbose_name_plural = verbose_name
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.pipeline.name} #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def is_finished(self):
+        return self.status in self.FINISHED_STATUSES
+
+    @property
+    def duration(self):
+        """执行耗时（秒），尚未开始时为 None"""
+        if not self.started_at:
+            return None
+        end = self.finished_at or timezone.now()
+        return round((end - self.started_at).total_seconds(), 3)
@@ -0,0 +1,175 @@
+# Copyright (c) 2025 YycKop
+# MIT License
+# Integrated-Data-Platform-backend/processing/parallel.py
+"""
+处理流程的多进程分区执行
+
+数据量达到 PIPELINE_PARALLEL_MIN_ROWS 行时，连续的逐行模块（过滤、逐行转换、字段选择、
+填充和删除空值）把数据按行切分为分区，在进程池中并行执行后按原顺序拼接；
+可合并的聚合在各分区上并行计算部分聚合结果，再在当前进程中合并。
+流式执行时每个数据块就是一个分区，进程池按顺序返回结果，同时在途的数据块数量有上限。
+
+进程池以 spawn 方式启动，在进程内复用，空闲 PIPELINE_PARALLEL_IDLE_SECONDS 秒后关闭。
+工作进程数由 PIPELINE_PARALLEL_WORKERS 配置，为 1 时不启用分区执行；为 0 时自动确定：
+每个执行流程的进程（PIPELINE_WORKER_PROCESSES 个）各自有一个分区执行进程池，
+CPU 核数按这些进程平分，避免多个流程同时执行时进程数超过 CPU 核数。
+"""
+import collections
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from django.conf import settings
+
+from .external import combine_states, concat_frames
+from .worker import init_worker, run_partial_aggregate, run_partition
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+# 正在使用进程池的分区执行数和空闲关闭定时器
+_active = 0
+_idle_timer = None
+
+
+def get_parallel_workers():
+    """分区执行的工作进程数，配置为 0 时按流程执行进程数平分 CPU 核数"""
+    workers = int(getattr(settings, 'PIPELINE_PARALLEL_WORKERS', 0))
+    if workers > 0:
+        return workers
+    from .jobs import get_worker_processes
+    return max(1, (os.cpu_count() or 1) // get_worker_processes())
+
+
+def get_parallel_idle_seconds():
+    return float(getattr(settings, 'PIPELINE_PARALLEL_IDLE_SECONDS', 60))
+
+
+def get_parallel_min_rows():
+    return int(getattr(settings, 'PIPELINE_PARALLEL_MIN_ROWS', 200000))
+
+
+def is_parallel_enabled(rows=None):
+    """是否启用分区执行，rows 为待处理的行数"""
+    if get_parallel_workers() <= 1:
+        return False
+    return rows is None or rows >= get_parallel_min_rows()
+
+
+def get_pool():
+    """进程内共享的分区执行进程池"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=get_parallel_workers(),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker
+            )
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _acquire_pool():
+    """开始一次分区执行，取消等待中的空闲关闭"""
+    global _active, _idle_timer
+    with _pool_lock:
+        _active += 1
+        if _idle_timer is not None:
+            _idle_timer.cancel()
+            _idle_timer = None
+
+
+def _release_pool():
+    """结束一次分区执行，进程池不再被使用时在空闲一段时间后关闭"""
+    global _active, _idle_timer
+    with _pool_lock:
+        _active -= 1
+        if _active > 0 or _pool is None:
+            return
+        _idle_timer = threading.Timer(get_parallel_idle_seconds(), _shutdown_idle_pool)
+        _idle_timer.daemon = True
+        _idle_timer.start()
+
+
+def _shutdown_idle_pool():
+    global _pool, _idle_timer
+    with _pool_lock:
+        _idle_timer = None
+        if _active > 0 or _pool is None:
+            return
+        pool, _pool = _pool, None
+    logger.info("分区执行进程池空闲，关闭工作进程")
+    pool.shutdown(wait=False)
+
+
+def _submit(func, *args):
+    try:
+        return get_pool().submit(func, *args)
+    except BrokenProcessPool:
+        # 工作进程异常退出后进程池不可再用，重建一次
+        logger.warning("分区执行进程池已失效，重新创建")
+        _reset_pool()
+        return get_pool().submit(func, *args)
+
+
+def split_partitions(df, partitions=None):
+    """把 DataFrame 按行切分为若干连续分区"""
+    partitions = max(1, min(partitions or get_parallel_workers(), len(df)))
+    bounds = np.linspace(0, len(df), partitions + 1).astype(int)
+    return [df.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def _map_ordered(func, frames, *args, max_pending=None):
+    """在进程池中对每个数据块执行 func(*args, 数据块)，按数据块顺序产出结果，在途的数据块不超过 max_pending 个"""
+    max_pending = max_pending or get_parallel_workers() * 2
+    pending = collections.deque()
+    _acquire_pool()
+    try:
+        for df in frames:
+            pending.append(_submit(func, *args, df))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        _release_pool()
+
+
+def map_partitions(frames, modules):
+    """对每个分区依次执行 modules（[(模块类型, 配置), ...]），按分区顺序产出 (结果, [(处理前行数, 处理后行数), ...])"""
+    return _map_ordered(run_partition, frames, modules)
+
+
+def map_partial_states(frames, group_by, aggregations):
+    """按数据块顺序产出各块的部分聚合结果"""
+    return _map_ordered(run_partial_aggregate, frames, group_by, aggregations)
+
+
+def apply_partitioned(df, modules):
+    """把 DataFrame 按行分区并行执行 modules，返回 (拼接后的结果, [(处理前行数, 处理后行数), ...])"""
+    results = list(map_partitions(split_partitions(df), modules))
+    counts = [
+        tuple(int(sum(values)) for values in zip(*module_counts))
+        for module_counts in zip(*(partition_counts for _, partition_counts in results))
+    ]
+    return concat_frames([partition for partition, _ in results]), counts
+
+
+def aggregate_partitioned(df, group_by, aggregations):
+    """各行分区并行计算部分聚合结果，再在当前进程中合并"""
+    return combine_states(map_partial_states(split_partitions(df), group_by, aggregations), group_by, aggregations)
@@ -0,0 +1,364 @@
+# Copyright (c) 2025 YycKop
+# MIT License
+# Integrated-Data-Platform-backend/processing/plan.py
+"""
+处理流程执行计划
+
+流程执行前先编译为逻辑计划（读取输入数据集 + 按顺序的执行步骤），再依次做以下优化：
+
+1. 过滤提前：过滤模块越过与它可交换的逐行模块（逐行转换、填充空值、不截取的排序、字段选择），
+   越早减少行数，后续模块处理的数据越少；
+2. 过滤下推：计划开头能按列类型原样表达的过滤模块作为读取条件下推到数据集扫描中；
+3. 列裁剪：从流程输出倒推每一步真正需要的列，只读取这些列，并跳过结果不会被用到的转换和填充；
+4. 转换融合：连续的转换模块合并为一个步骤，在同一个 DataFrame 上依次完成。
+
+所有优化都只依据模块配置和列名（processing.schema）判断，保证与逐个模块顺序执行的结果一致。
+"""
+import copy
+
+from datasets.storage import DatasetStore
+from .schema import get_aggregate_config, get_transform_config, infer_module_schema
+
+# 会把字段原地转换为数值的过滤运算符
+NUMERIC_FILTER_OPERATORS = ['>', '>=', '<', '<=']
+
+# 依赖整列统计量的转换操作，结果与行的集合有关，过滤模块不能越过
+COLUMN_WISE_TRANSFORMS = ['standardize', 'normalize']
+
+
+class PlannedModule:
+    """计划中的一个模块：在流程中的序号、模块对象以及优化后实际使用的配置"""
+
+    def __init__(self, index, pipeline_module):
+        self.index = index
+        self.module = pipeline_module
+        self.config = copy.deepcopy(pipeline_module.configuration or {})
+
+    @property
+    def name(self):
+        return self.module.name
+
+    @property
+    def type(self):
+        return self.module.type
+
+    def describe(self):
+        return {'index': self.index, 'module': self.name, 'type': self.type}
+
+
+class PlanStep:
+    """计划中的一个执行步骤，融合后的转换步骤包含多个模块"""
+
+    def __init__(self, operator, modules):
+        self.operator = operator
+        self.modules = modules
+
+    @property
+    def name(self):
+        return '、'.join(planned.name for planned in self.modules)
+
+
+class PipelinePlan:
+    """处理流程的逻辑计划"""
+
+    def __init__(self, dataset, columns, column_types):
+        self.dataset = dataset
+        self.columns = list(columns)
+        self.column_types = column_types
+        self.scan_columns = None  # None 表示读取全部列
+        self.scan_filters = []  # [(PlannedModule, 读取条件)]
+        self.steps = []
+        self.eliminated = []  # [(PlannedModule, 原因)]
+        self.optimizations = []
+
+    def step_schemas(self):
+        """每个步骤的输入列，最后一项为流程输出列"""
+        schemas = [list(self.columns)]
+        for step in self.steps:
+            columns = schemas[-1]
+            for planned in step.modules:
+                columns = infer_module_schema(planned.type, planned.config, columns)
+            schemas.append(columns)
+        return schemas
+
+    @property
+    def output_columns(self):
+        return self.step_schemas()[-1]
+
+    def explain(self):
+        """计划的可读描述"""
+        schemas = self.step_schemas()
+        steps = []
+        for position, step in enumerate(self.steps):
+            steps.append({
+                'operator': step.operator,
+                'modules': [planned.describe() for planned in step.modules],
+                'fused': len(step.modules) > 1,
+                'configurations': [planned.config for planned in step.modules],
+                'output_columns': schemas[position + 1]
+            })
+
+        return {
+            'input_dataset': {'id': self.dataset.id, 'name': self.dataset.name},
+            'scan': {
+                'columns': self.scan_columns,
+                'filters': [
+                    {**planned.describe(), 'condition': list(condition)}
+                    for planned, condition in self.scan_filters
+                ]
+            },
+            'steps': steps,
+            'eliminated': [
+                {**planned.describe(), 'reason': reason}
+                for planned, reason in self.eliminated
+            ],
+            'output_columns': schemas[-1],
+            'optimizations': self.optimizations
+        }
+
+
+def build_plan(dataset, pipeline_modules, optimize=True):
+    """把处理流程编译为逻辑计划，optimize=False 时保持模块原有顺序逐个执行"""
+    column_types = DatasetStore.get_column_types(dataset)
+    columns = list(column_types) if column_types is not None else DatasetStore.get_columns(dataset)
+
+    plan = PipelinePlan(dataset, columns, column_types)
+    plan.steps = [
+        PlanStep(pipeline_module.type, [PlannedModule(index, pipeline_module)])
+        for index, pipeline_module in enumerate(pipeline_modules)
+    ]
+
+    if optimize:
+        push_filters_forward(plan)
+        push_filters_into_scan(plan)
+        # 旧数据集的列名只从前几条记录中收集，可能不完整，不做列裁剪
+        if column_types is not None:
+            prune_columns(plan)
+        fuse_transforms(plan)
+    return plan
+
+
+def is_row_wise_transform(config):
+    """
+    转换的结果是否只取决于每一行自身
+
+    时间提取的时间戳单位和自动时间格式都按整列推断，分区、分块或提前过滤后推断结果可能不同。
+    """
+    operation = config.get('operation', '')
+    return operation not in COLUMN_WISE_TRANSFORMS and not (
+        operation.startswith('extract_') and config.get('time_format', 'auto') in ['timestamp', 'auto']
+    )
+
+
+def is_row_local(planned):
+    """模块是否逐行独立处理，可以把数据按行分区后分别执行再按顺序拼接"""
+    if planned.type in ['filter', 'select']:
+        return True
+    if planned.type == 'transform':
+        return is_row_wise_transform(planned.config)
+    if planned.type == 'clean':
+        return planned.config.get('operation') != 'remove_duplicates'
+    return False
+
+
+def get_module_effects(planned):
+    """模块读取的字段、写入的字段，以及过滤模块能否越过它"""
+    config = planned.config
+
+    if planned.type == 'transform':
+        fields, prefix = get_transform_config(config)
+        writes = {f"{prefix}_{field}" if prefix else field for field in fields}
+        return set(fields), writes, is_row_wise_transform(config)
+
+    if planned.type == 'clean':
+        field = config.get('field', '')
+        operation = config.get('operation', '')
+        if operation == 'fill_na':
+            return {field}, {field}, True
+        if operation == 'remove_duplicates':
+            return {field}, set(), False
+        return {field}, set(), True
+
+    if planned.type == 'sort':
+        fields = {sort_config.get('field', '') for sort_config in config.get('sort_fields', [])}
+        return fields, set(), not config.get('enable_limit', False)
+
+    if planned.type == 'select':
+        rename_mapping = config.get('rename_mapping') or {}
+        renamed = {new_name.strip() for new_name in rename_mapping.values() if new_name and new_name.strip()}
+        return set(), renamed, True
+
+    return set(), set(), False
+
+
+def can_filter_cross(filter_module, planned, columns_in, columns_out):
+    """过滤模块移到 planned 之前是否不改变结果"""
+    field = filter_module.config.get('field', '')
+    operator = filter_module.config.get('operator', '')
+
+    # 字段在两个位置上必须同样存在（或同样不存在），过滤才等价
+    if (field in columns_in) != (field in columns_out):
+        return False
+
+    reads, writes, row_wise = get_module_effects(planned)
+    if not row_wise or field in writes:
+        return False
+    # 数值比较会把字段原地转换为数值，不能提前到读取该字段的模块之前
+    if operator in NUMERIC_FILTER_OPERATORS and field in reads:
+        return False
+    return True
+
+
+def push_filters_forward(plan):
+    """把过滤模块提前到可交换的逐行模块之前，过滤模块之间保持原有顺序"""
+    for position in range(len(plan.steps)):
+        step = plan.steps[position]
+        filter_module = step.modules[0]
+        if step.operator != 'filter' or not filter_module.config.get('field') \
+                or not filter_module.config.get('operator'):
+            continue
+
+        schemas = plan.step_schemas()
+        target = position
+        while target > 0:
+            previous = plan.steps[target - 1]
+            if previous.operator == 'filter' or not can_filter_cross(
+                    filter_module, previous.modules[0], schemas[target - 1], schemas[target]):
+                break
+            target -= 1
+
+        if target != position:
+            plan.steps.insert(target, plan.steps.pop(position))
+            plan.optimizations.append(
+                f"过滤模块「{filter_module.name}」提前到「{plan.steps[target + 1].name}」之前执行"
+            )
+
+
+def get_pushdown_condition(config, column_types):
+    """把过滤模块转换为数据集读取条件，无法保证与 _apply_filter 结果一致时返回 None"""
+    field = config.get('field', '')
+    operator = config.get('operator', '')
+    value = config.get('value', '')
+    column_type = column_types.get(field)
+
+    if not field or not operator or column_type is None:
+        return None
+
+    if operator in ['is_null', 'not_null']:
+        return (field, operator, None)
+
+    if operator in NUMERIC_FILTER_OPERATORS:
+        if column_type not in ['int64', 'double']:
+            return None
+        try:
+            return (field, operator, float(value))
+        except (TypeError, ValueError):
+            return None
+
+    if operator in ['==', '!=']:
+        if column_type == 'string' and isinstance(value, str):
+            return (field, operator, value)
+        if column_type in ['int64', 'double'] and isinstance(value, (int, float)) and not isinstance(value, bool):
+            return (field, operator, value)
+        return None
+
+    if operator in ['in', 'not_in'] and column_type == 'string':
+        value_list = [v.strip() for v in str(value).split(',')]
+        return (field, 'in' if operator == 'in' else 'not in', value_list)
+
+    return None
+
+
+def push_filters_into_scan(plan):
+    """计划开头连续的过滤模块如果能按列类型原样表达，则作为读取条件下推"""
+    if plan.column_types is None:
+        return
+
+    while plan.steps and plan.steps[0].operator == 'filter':
+        filter_module = plan.steps[0].modules[0]
+        condition = get_pushdown_condition(filter_module.config, plan.column_types)
+        if condition is None:
+            break
+        plan.scan_filters.append((filter_module, condition))
+        plan.steps.pop(0)
+        plan.optimizations.append(f"过滤模块「{filter_module.name}」下推为数据集读取条件")
+
+
+def prune_columns(plan):
+    """从流程输出倒推每一步需要的列，确定读取的列并去掉结果不会被用到的转换和填充"""
+    schemas = plan.step_schemas()
+    needed = set(schemas[-1])
+
+    for position in range(len(plan.steps) - 1, -1, -1):
+        step = plan.steps[position]
+        planned = step.modules[0]
+        config = planned.config
+        columns_in, columns_out = schemas[position], schemas[position + 1]
+
+        if step.operator == 'filter':
+            needed.add(config.get('field', ''))
+
+        elif step.operator == 'sort':
+            reads, _, _ = get_module_effects(planned)
+            needed.update(reads)
+
+        elif step.operator == 'transform':
+            fields, prefix = get_transform_config(config)
+            kept = [field for field in fields if (f"{prefix}_{field}" if prefix else field) in needed]
+            if not kept:
+                plan.steps.pop(position)
+                plan.eliminated.append((planned, '转换结果未被后续模块或输出使用'))
+                continue
+            if len(kept) < len(fields):
+                config['fields'] = kept
+                config['new_field_prefix'] = prefix
+                plan.optimizations.append(
+                    f"转换模块「{planned.name}」只处理后续用到的字段: {', '.join(kept)}"
+                )
+            needed.difference_update(f"{prefix}_{field}" for field in kept if prefix)
+            needed.update(kept)
+
+        elif step.operator == 'clean':
+            field = config.get('field', '')
+            if config.get('operation') == 'fill_na' and field not in needed:
+                plan.steps.pop(position)
+                plan.eliminated.append((planned, '填充的字段未被后续模块或输出使用'))
+                continue
+            needed.add(field)
+
+        elif step.operator == 'select' and columns_out != columns_in:
+            rename_mapping = config.get('rename_mapping') or {}
+            original_names = {
+                new_name.strip(): old_name for old_name, new_name in rename_mapping.items()
+                if new_name and new_name.strip()
+            }
+            if config.get('mode', 'include') == 'include':
+                needed = {field for field in config.get('selected_fields', []) if field in columns_in}
+            else:
+                needed = {original_names.get(field, field) for field in needed}
+
+        elif step.operator == 'aggregate' and columns_out != columns_in:
+            group_by, aggregations = get_aggregate_config(config)
+            needed = set(group_by) | {agg_config.get('field', '') for agg_config in aggregations}
+
+    scan_columns = [column for column in plan.columns if column in needed]
+    if len(scan_columns) < len(plan.columns):
+        plan.scan_columns = scan_columns
+        plan.optimizations.append(
+            f"只读取用到的 {len(scan_columns)}/{len(plan.columns)} 列"
+        )
+
+
+def fuse_transforms(plan):
+    """连续的转换模块合并为一个步骤"""
+    fused = []
+    for step in plan.steps:
+        if step.operator == 'transform' and fused and fused[-1].operator == 'transform':
+            fused[-1].modules.extend(step.modules)
+            continue
+        fused.append(PlanStep(step.operator, list(step.modules)))
+
+    for step in fused:
+        if len(step.modules) > 1:
+            plan.optimizations.append(f"连续的转换模块「{step.name}」融合为一个步骤")
+    plan.steps = fused
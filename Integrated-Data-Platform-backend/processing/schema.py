@@ -0,0 +1,254 @@
+# Copyright (c) 2025 YycKop
+# MIT License
+# Integrated-Data-Platform-backend/processing/schema.py
+"""
+处理模块的结构推导
+
+每种模块类型在 SCHEMA_RULES 中登记一个规则函数 rule(config, columns)：
+检查配置引用的字段是否存在（不满足时抛出 ValidationError），并返回模块执行后的列名列表。
+规则只依据列名推导，与 PipelineExecutor 中对应 _apply_* 方法的列变化保持一致，
+因此验证整个流程只需遍历一次模块，不需要读取或执行任何数据。
+"""
+from django.core.exceptions import ValidationError
+
+# 聚合操作 -> pandas 聚合函数
+AGGREGATE_OPERATIONS = {
+    'sum': 'sum',
+    'mean': 'mean',
+    'count': 'count',
+    'max': 'max',
+    'min': 'min',
+    'std': 'std',
+    'var': 'var',
+    'median': 'median',
+    'first': 'first',
+    'last': 'last'
+}
+
+# 未设置输出名称时使用的聚合操作名称
+AGGREGATE_OPERATION_NAMES = {
+    'sum': '总和',
+    'mean': '平均值',
+    'count': '计数',
+    'max': '最大值',
+    'min': '最小值',
+    'std': '标准差',
+    'var': '方差',
+    'median': '中位数',
+    'first': '第一个值',
+    'last': '最后一个值'
+}
+
+# 会写入目标字段的转换操作（extract_* 时间提取操作另行判断）
+TRANSFORM_OPERATIONS = [
+    'uppercase', 'lowercase', 'trim', 'round', 'abs', 'standardize', 'normalize',
+    'percent_to_decimal', 'decimal_to_percent'
+]
+
+
+def get_aggregate_config(config):
+    """返回 (分组字段列表, 聚合配置列表)，兼容旧版本的单字段配置"""
+    group_by = config.get('group_by', [])
+    aggregations = config.get('aggregations', [])
+
+    if isinstance(group_by, str) and group_by:
+        aggregate_field = config.get('aggregate_field', '')
+        operation = config.get('operation', '')
+        if aggregate_field and operation:
+            group_by = [group_by]
+            aggregations = [{
+                'field': aggregate_field,
+                'operation': operation,
+                'output_name': f"{aggregate_field}_{operation}"
+            }]
+
+    # 确保 group_by 是列表
+    if isinstance(group_by, str):
+        group_by = [group_by] if group_by else []
+
+    # 确保 aggregations 是列表
+    if isinstance(aggregations, dict):
+        aggregations = [aggregations]
+
+    return group_by, aggregations
+
+
+def get_aggregate_output_name(field, operation, output_name=''):
+    return output_name or f"{field}_{AGGREGATE_OPERATION_NAMES.get(operation, operation)}"
+
+
+def resolve_aggregations(config, columns):
+    """聚合模块实际生效的 (分组字段, [(输出名称, 字段, 操作), ...])，聚合不会生效时返回 None"""
+    group_by, aggregations = get_aggregate_config(config)
+    if not group_by or not aggregations or any(field not in columns for field in group_by):
+        return None
+
+    resolved = {}
+    for agg_config in aggregations:
+        field = agg_config.get('field', '')
+        operation = agg_config.get('operation', '')
+        if not field or field not in columns or operation not in AGGREGATE_OPERATIONS:
+            continue
+        resolved[get_aggregate_output_name(field, operation, agg_config.get('output_name', ''))] = (field, operation)
+
+    if not resolved:
+        return None
+    return group_by, [(output_name, field, operation) for output_name, (field, operation) in resolved.items()]
+
+
+def get_transform_config(config):
+    """返回 (转换字段列表, 新字段前缀)，兼容旧版本的单字段配置"""
+    fields = config.get('fields', [])
+    new_field_prefix = config.get('new_field_prefix', '')
+
+    if not fields and 'field' in config:
+        fields = [config.get('field', '')]
+        new_field = config.get('new_field', '')
+        if new_field and len(fields) == 1:
+            new_field_prefix = new_field
+
+    return fields, new_field_prefix
+
+
+def filter_schema(config, columns):
+    field = config.get('field', '')
+    if field and field not in columns:
+        raise ValidationError(f"字段 '{field}' 在数据集中不存在")
+    return columns
+
+
+def clean_schema(config, columns):
+    return filter_schema(config, columns)
+
+
+def transform_schema(config, columns):
+    filter_schema(config, columns)
+
+    fields, new_field_prefix = get_transform_config(config)
+    operation = config.get('operation', '')
+    if not fields or not new_field_prefix:
+        return columns
+    if operation not in TRANSFORM_OPERATIONS and not operation.startswith('extract_'):
+        return columns
+
+    result = list(columns)
+    for field in fields:
+        target_field = f"{new_field_prefix}_{field}"
+        if field in result and target_field not in result:
+            result.append(target_field)
+    return result
+
+
+def aggregate_schema(config, columns):
+    group_by, aggregations = get_aggregate_config(config)
+
+    # 验证分组字段
+    for field in group_by:
+        if field and field not in columns:
+            raise ValidationError(f"分组字段 '{field}' 在数据集中不存在")
+
+    # 验证聚合字段
+    for agg_config in aggregations:
+        field = agg_config.get('field', '')
+        if field and field not in columns:
+            raise ValidationError(f"聚合字段 '{field}' 在数据集中不存在")
+
+    if not group_by or not aggregations or any(field not in columns for field in group_by):
+        return columns
+
+    output_columns = list(group_by)
+    for agg_config in aggregations:
+        field = agg_config.get('field', '')
+        operation = agg_config.get('operation', '')
+        if field and operation in AGGREGATE_OPERATIONS:
+            output_columns.append(get_aggregate_output_name(field, operation, agg_config.get('output_name', '')))
+
+    # 没有有效的聚合配置时聚合模块不改变数据
+    return output_columns if len(output_columns) > len(group_by) else columns
+
+
+def select_schema(config, columns):
+    selected_fields = config.get('selected_fields', [])
+    mode = config.get('mode', 'include')
+    rename_mapping = config.get('rename_mapping', {})
+
+    if not selected_fields:
+        raise ValidationError("数据截取模块必须选择至少一个字段")
+
+    if mode == 'include':
+        for field in selected_fields:
+            if field and field not in columns:
+                raise ValidationError(f"数据截取字段 '{field}' 在数据集中不存在")
+        result = [field for field in selected_fields if field in columns]
+    elif mode == 'exclude':
+        result = [field for field in columns if field not in selected_fields]
+    else:
+        return columns
+
+    if not result:
+        return columns
+
+    # 应用字段重命名
+    rename_dict = {
+        old_name: new_name.strip()
+        for old_name, new_name in (rename_mapping or {}).items()
+        if old_name in result and new_name and new_name.strip()
+    }
+    return [rename_dict.get(field, field) for field in result]
+
+
+def sort_schema(config, columns):
+    sort_fields = config.get('sort_fields', [])
+
+    if not sort_fields:
+        raise ValidationError("排序模块必须配置至少一个排序条件")
+
+    # 验证排序字段是否存在
+    for sort_config in sort_fields:
+        field = sort_config.get('field', '')
+        if field and field not in columns:
+            raise ValidationError(f"排序字段 '{field}' 在数据集中不存在")
+
+    # 验证截取配置
+    if config.get('enable_limit', False):
+        limit_type = config.get('limit_type', 'top')
+        if limit_type in ['top', 'bottom']:
+            if config.get('limit_count', 10) <= 0:
+                raise ValidationError("截取行数必须大于0")
+        elif limit_type == 'range':
+            start_row = config.get('start_row', 0)
+            end_row = config.get('end_row', 10)
+            if start_row < 0:
+                raise ValidationError("起始行不能为负数")
+            if start_row >= end_row:
+                raise ValidationError("起始行必须小于结束行")
+        else:
+            raise ValidationError(f"未知的截取类型: {limit_type}")
+
+    return columns
+
+
+SCHEMA_RULES = {
+    'filter': filter_schema,
+    'transform': transform_schema,
+    'aggregate': aggregate_schema,
+    'clean': clean_schema,
+    'select': select_schema,
+    'sort': sort_schema,
+}
+
+
+def infer_module_schema(module_type, config, columns):
+    """推导单个模块执行后的列名列表，未知模块类型不改变列"""
+    rule = SCHEMA_RULES.get(module_type)
+    if rule is None:
+        return list(columns)
+    return list(rule(config or {}, list(columns)))
+
+
+def infer_pipeline_schema(pipeline_modules, columns):
+    """依次推导每个模块，返回流程输出的列名列表"""
+    columns = list(columns)
+    for pipeline_module in pipeline_modules:
+        columns = infer_module_schema(pipeline_module.type, pipeline_module.configuration, columns)
+    return columns
@@ -2,8 +2,9 @@
 # MIT License
 # Integrated-Data-Platform-backend/processing/serializers.py
 from rest_framework import serializers
-from .models import ProcessingPipeline, PipelineModule
+from .models import ProcessingPipeline, PipelineModule, PipelineRun
 from datasets.models import Dataset
+from datasets.catalog import get_column_names
 
 
 class PipelineModuleSerializer(serializers.ModelSerializer):
@@ -52,9 +53,7 @@ class ProcessingPipelineSerializer(serializers.ModelSerializer):
         """获取输入数据集的列名"""
         if obj.input_dataset:
             try:
-                first_record = obj.input_dataset.datarecord_set.first()
-                if first_record:
-                    return list(first_record.data.keys())
+                return get_column_names(obj.input_dataset)
             except Exception:
                 pass
         return []
@@ -123,4 +122,19 @@ class ProcessingPipelineSerializer(serializers.ModelSerializer):
                     'modules': modules_serializer.errors
                 })
 
-        return result
\ No newline at end of file
+        return result
+
+class PipelineRunSerializer(serializers.ModelSerializer):
+    pipeline_name = serializers.CharField(source='pipeline.name', read_only=True)
+    created_by = serializers.StringRelatedField(read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    duration = serializers.FloatField(read_only=True)
+    is_finished = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = PipelineRun
+        fields = [
+            'id', 'pipeline', 'pipeline_name', 'status', 'status_display', 'progress', 'result', 'error',
+            'cancel_requested', 'is_finished', 'created_by', 'created_at', 'started_at', 'finished_at', 'duration'
+        ]
+        read_only_fields = fields
@@ -1,6 +1,342 @@
 # Copyright (c) 2025 YycKop
 # MIT License
 # Integrated-Data-Platform-backend/processing/tests.py
-from django.test import TestCase
+import os
+import warnings
+from datetime import timedelta
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from datasets.storage import DatasetStore
+from datasets.tests import QueryCountMixin, StorageTestMixin, create_dataset
+from users.models import UserProfile
+from .executor import PipelineExecutor
+from .external import (
+    SpillArea, concat_frames, external_sort, limited_sort, merge_states, partial_aggregate, partial_state,
+    sort_frame, split_frame
+)
+from .datetimes import parse_datetimes
+from .jobs import expire_stale_runs
+from .kernels import decimal_to_percent, percent_to_decimal
+from .parallel import get_parallel_workers, is_parallel_enabled
+from .plan import build_plan
+from .models import ProcessingPipeline, PipelineModule, PipelineRun
+
+
+class PipelineListQueryTests(QueryCountMixin, TestCase):
+
+    def create_pipeline(self):
+        user = self.make_user()
+        pipeline = ProcessingPipeline.objects.create(
+            name=f'{user.username}-pipeline',
+            input_dataset=create_dataset(user),
+            output_dataset=create_dataset(self.make_user()),
+            created_by=user
+        )
+        PipelineModule.objects.create(pipeline=pipeline, name='过滤', type='filter', order=1, configuration={})
+        return pipeline
+
+    def test_pipeline_list(self):
+        def add_rows(count):
+            for _ in range(count):
+                self.create_pipeline()
+
+        self.assertListQueries('/api/processing-pipelines/', 2, add_rows)
+
+    def test_pipeline_run_list(self):
+        def add_rows(count):
+            for _ in range(count):
+                PipelineRun.objects.create(pipeline=self.create_pipeline(), created_by=self.make_user())
+
+        self.assertListQueries('/api/pipeline-runs/', 1, add_rows)
+
+
+class PipelineRunLeaseTests(TestCase):
+
+    def test_expired_running_runs_fail(self):
+        user = UserProfile.objects.create(username='admin', role='admin')
+        pipeline = ProcessingPipeline.objects.create(name='lease', input_dataset=create_dataset(user), created_by=user)
+        stale = PipelineRun.objects.create(pipeline=pipeline, created_by=user, status='running')
+        alive = PipelineRun.objects.create(pipeline=pipeline, created_by=user, status='running')
+        queued = PipelineRun.objects.create(pipeline=pipeline, created_by=user)
+        # updated_at 为 auto_now，用 update() 模拟执行进程退出后不再刷新的租约
+        PipelineRun.objects.filter(pk__in=[stale.pk, queued.pk]).update(updated_at=timezone.now() - timedelta(hours=1))
+
+        with self.settings(PIPELINE_RUN_LEASE_SECONDS=60):
+            self.assertEqual(expire_stale_runs(), 1)
+
+        statuses = dict(PipelineRun.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses, {stale.pk: 'failed', alive.pk: 'running', queued.pk: 'queued'})
+
+
+class ParallelBudgetTests(TestCase):
+
+    def test_auto_workers_share_cpus_between_job_processes(self):
+        cpus = os.cpu_count() or 1
+        with self.settings(PIPELINE_PARALLEL_WORKERS=0, PIPELINE_WORKER_PROCESSES=2):
+            self.assertEqual(get_parallel_workers(), max(1, cpus // 2))
+        with self.settings(PIPELINE_PARALLEL_WORKERS=0, PIPELINE_WORKER_PROCESSES=cpus * 2):
+            self.assertEqual(get_parallel_workers(), 1)
+            self.assertFalse(is_parallel_enabled())
+        with self.settings(PIPELINE_PARALLEL_WORKERS=3):
+            self.assertEqual(get_parallel_workers(), 3)
+
+
+def convert_each(series, convert):
+    """原来逐值调用 float() 的转换方式，作为向量化内核的对照"""
+    def convert_value(value):
+        if pd.isna(value):
+            return value
+        try:
+            return convert(value)
+        except (ValueError, TypeError):
+            return value
+    return series.apply(convert_value)
+
+
+class PercentKernelTests(TestCase):
+    VALUES = ['50%', ' 12.5 %', '-0.5%', '1e2%', 'inf%', '1_000', '５０%', '١٢', '٣%', '５０％', '_', 'abc', '', None, 7]
+
+    def test_matches_float_parsing(self):
+        series = pd.Series(self.VALUES, dtype=object)
+        expected = convert_each(series, lambda value: round(float(str(value).strip().replace('%', '')) / 100.0, 2))
+        self.assertEqual(percent_to_decimal(series).tolist(), expected.tolist())
+
+        expected = convert_each(series, lambda value: round(float(value) * 100.0, 2))
+        self.assertEqual(decimal_to_percent(series).tolist(), expected.tolist())
+
+
+class DatetimeFormatTests(TestCase):
+
+    def test_inference_does_not_warn(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            parsed = parse_datetimes(pd.Series(['13/02/2024', '05/03/2024', None]))
+        self.assertEqual(parsed.dt.month.tolist()[:2], [2, 3])
+        self.assertEqual([str(warning.message) for warning in caught], [])
+
+
+def random_frame(seed, rows=240):
+    """带空值、重复值的随机数据：分组键和排序键中都有空值，数值保留一位小数以产生相同的值"""
+    rng = np.random.default_rng(seed)
+    x = rng.normal(0, 10, rows).round(1)
+    x[rng.random(rows) < 0.15] = np.nan
+    return pd.DataFrame({
+        'id': np.arange(rows),
+        'g': pd.Series(rng.choice(['a', 'b', 'c', 'd'], rows), dtype=object).where(rng.random(rows) > 0.1),
+        'h': rng.choice(['x', 'y'], rows),
+        'x': x,
+        'y': rng.integers(0, 10, rows),
+        's': pd.Series(rng.choice(['p', ' q ', 'r'], rows), dtype=object).where(rng.random(rows) > 0.2),
+    })
+
+
+def make_modules(specs):
+    return [
+        PipelineModule(name=f'{module_type}-{order}', type=module_type, order=order, configuration=config)
+        for order, (module_type, config) in enumerate(specs)
+    ]
+
+
+AGGREGATIONS = [
+    {'field': 'x', 'operation': operation, 'output_name': f'x_{operation}'}
+    for operation in ['sum', 'count', 'mean', 'std', 'var', 'min', 'max', 'first', 'last']
+] + [{'field': 'y', 'operation': 'sum', 'output_name': 'y_sum'}]
+
+# 覆盖各项计划优化和外存算子的流程
+PIPELINES = {
+    'filters_and_fusion': [
+        ('transform', {'fields': ['s'], 'operation': 'uppercase'}),
+        ('transform', {'fields': ['x'], 'operation': 'round', 'decimal_places': 0}),
+        ('filter', {'field': 'y', 'operator': '>', 'value': '3'}),
+        ('clean', {'field': 'x', 'operation': 'fill_na', 'value': 0}),
+        ('transform', {'fields': ['id'], 'operation': 'abs', 'new_field_prefix': 'abs'}),
+        ('filter', {'field': 'g', 'operator': '==', 'value': 'b'}),
+        ('filter', {'field': 's', 'operator': 'not_null'}),
+        ('select', {'mode': 'include', 'selected_fields': ['g', 'x', 'y', 's']}),
+    ],
+    'filter_blocked_by_numeric_read': [
+        ('transform', {'fields': ['x'], 'operation': 'abs'}),
+        ('filter', {'field': 'x', 'operator': '>=', 'value': '5'}),
+        ('select', {'mode': 'exclude', 'selected_fields': ['h'], 'rename_mapping': {'y': 'yy'}}),
+        ('filter', {'field': 'yy', 'operator': 'in', 'value': '1, 2, 3'}),
+    ],
+    'descending_multi_key_sort': [
+        ('filter', {'field': 'id', 'operator': '!=', 'value': 3}),
+        ('sort', {'sort_fields': [{'field': 'g', 'order': 'desc'}, {'field': 'x', 'order': 'asc'},
+                                  {'field': 'y', 'order': 'desc'}]}),
+        ('transform', {'fields': ['s'], 'operation': 'trim'}),
+        ('transform', {'fields': ['s'], 'operation': 'uppercase', 'new_field_prefix': 'upper'}),
+    ],
+    'limited_sorts': [
+        ('sort', {'sort_fields': [{'field': 'x', 'order': 'desc'}], 'enable_limit': True,
+                  'limit_type': 'range', 'start_row': 5, 'end_row': 40}),
+        ('sort', {'sort_fields': [{'field': 'g', 'order': 'asc'}], 'enable_limit': True,
+                  'limit_type': 'bottom', 'limit_count': 20}),
+        ('sort', {'sort_fields': [{'field': 'y', 'order': 'asc'}], 'enable_limit': True,
+                  'limit_type': 'top', 'limit_count': 9}),
+    ],
+    'mergeable_aggregate': [
+        ('filter', {'field': 'x', 'operator': 'not_null'}),
+        ('aggregate', {'group_by': ['g', 'h'], 'aggregations': AGGREGATIONS}),
+    ],
+    'median_aggregate': [
+        ('aggregate', {'group_by': ['g'], 'aggregations': [
+            {'field': 'x', 'operation': 'median', 'output_name': 'x_median'},
+            {'field': 'y', 'operation': 'mean', 'output_name': 'y_mean'},
+        ]}),
+    ],
+    'column_wise': [
+        ('clean', {'field': 'g', 'operation': 'remove_duplicates'}),
+        ('transform', {'fields': ['x'], 'operation': 'standardize'}),
+    ],
+}
+
+
+@override_settings(DATASET_ROW_GROUP_SIZE=16, PIPELINE_PARALLEL_WORKERS=1)
+class PipelinePlanEquivalenceTests(StorageTestMixin, TestCase):
+    """优化后的计划、流式执行的结果与逐个模块顺序执行的结果一致"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = UserProfile.objects.create(username='admin', role='admin')
+
+    def run_plan(self, dataset, specs, optimize=True, out_of_core=False):
+        modules = make_modules(specs)
+        plan = build_plan(dataset, modules, optimize=optimize)
+        executor = PipelineExecutor(None, None)
+        executor.progress = PipelineExecutor.initial_progress(modules)
+        filters = [condition for _, condition in plan.scan_filters]
+        if out_of_core:
+            counters = {planned.index: [0, 0] for step in plan.steps for planned in step.modules}
+            with SpillArea() as spill:
+                frames = list(executor._stream_plan(plan, spill, counters))
+            return plan, concat_frames(frames) if frames else pd.DataFrame()
+        df = DatasetStore.read_dataframe(dataset, columns=plan.scan_columns, filters=filters)
+        return plan, executor._run_in_memory(df, plan).reset_index(drop=True)
+
+    def assertSameResult(self, actual, expected, message):
+        self.assertEqual(list(actual.columns), list(expected.columns), message)
+        pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected.reset_index(drop=True),
+                                      check_dtype=False, obj=message)
+
+    def assertPlanEquivalent(self, dataset, specs, message):
+        """优化后的计划和流式执行的结果都与顺序执行相同，返回优化后的计划"""
+        plan, expected = self.run_plan(dataset, specs, optimize=False)
+        self.assertEqual(plan.optimizations, [])
+        plan, actual = self.run_plan(dataset, specs)
+        self.assertSameResult(actual, expected, f'{message} 优化后')
+        with self.settings(PIPELINE_CHUNK_ROWS=7, PIPELINE_SORT_RUN_ROWS=20, PIPELINE_SPILL_PARTITIONS=3):
+            _, streamed = self.run_plan(dataset, specs, out_of_core=True)
+        self.assertSameResult(streamed, expected, f'{message} 流式执行')
+        return plan, expected
+
+    def test_plans_match_sequential_execution(self):
+        optimized = set()
+        for seed in range(3):
+            dataset = create_dataset(self.user, records=0)
+            DatasetStore.write_dataframe(dataset, random_frame(seed))
+            for name, specs in PIPELINES.items():
+                plan, _ = self.assertPlanEquivalent(dataset, specs, f'{name} (seed {seed})')
+                optimized.update(plan.optimizations)
+
+        # 各项优化都被覆盖到
+        text = '\n'.join(optimized)
+        for keyword in ['提前到', '下推为数据集读取条件', '只读取用到的', '融合为一个步骤']:
+            self.assertIn(keyword, text)
+
+    def test_auto_time_format_is_inferred_on_whole_column(self):
+        # 开头的值既可以按月/日也可以按日/月解析，后面的值只能按日/月解析
+        dates = ['01/02/2024'] * 1500 + ['13/02/2024', '05/03/2024'] * 750
+        dataset = create_dataset(self.user, records=0)
+        DatasetStore.write_dataframe(dataset, pd.DataFrame({'id': range(len(dates)), 'd': dates}))
+        specs = [
+            ('transform', {'fields': ['d'], 'operation': 'extract_month', 'new_field_prefix': 'month'}),
+            ('filter', {'field': 'id', 'operator': '>=', 'value': '1500'}),
+        ]
+        plan, expected = self.assertPlanEquivalent(dataset, specs, 'auto_time_format')
+        self.assertEqual(plan.scan_filters, [])
+        self.assertEqual(expected['month_d'].isna().sum(), 750)
+        self.assertEqual(set(expected['month_d'].dropna()), {5})
+
+    def test_plan_eliminates_unused_transform(self):
+        dataset = create_dataset(self.user, records=0)
+        DatasetStore.write_dataframe(dataset, random_frame(0))
+        plan = build_plan(dataset, make_modules(PIPELINES['filters_and_fusion']))
+        self.assertEqual([planned.type for planned, _ in plan.eliminated], ['transform'])
+        self.assertEqual(plan.scan_columns, ['g', 'x', 'y', 's'])
+        self.assertEqual([condition for _, condition in plan.scan_filters],
+                         [('y', '>', 3.0), ('g', '==', 'b')])
+        # 大写转换写入 s，s 的空值过滤不能越过它
+        self.assertEqual([step.operator for step in plan.steps], ['transform', 'filter', 'transform', 'clean', 'select'])
+
+
+class ExternalOperatorTests(TestCase):
+    """外存算子与直接在 pandas 中计算的结果一致"""
+
+    SORT_KEYS = [
+        (['x'], [True]),
+        (['x'], [False]),
+        (['g', 'x'], [False, True]),
+        (['g', 'y', 'x'], [False, False, True]),
+        (['s', 'g'], [True, False]),
+    ]
+
+    def test_external_sort(self):
+        for seed in range(2):
+            df = random_frame(seed, rows=120)
+            for by, ascending in self.SORT_KEYS:
+                for run_rows, block_rows in [(10, 3), (25, 2), (1000, 7)]:
+                    with SpillArea() as spill:
+                        chunks = list(external_sort(split_frame(df, 7), by, ascending, spill,
+                                                    run_rows=run_rows, block_rows=block_rows))
+                    pd.testing.assert_frame_equal(
+                        concat_frames(chunks), sort_frame(df, by, ascending).reset_index(drop=True),
+                        obj=f'seed={seed} by={by} ascending={ascending} run={run_rows} block={block_rows}'
+                    )
+
+    def test_partial_aggregate(self):
+        executor = PipelineExecutor(None, None)
+        aggregations = [(config['output_name'], config['field'], config['operation']) for config in AGGREGATIONS]
+        for seed in range(2):
+            df = random_frame(seed)
+            for group_by in [['g'], ['g', 'h'], ['y']]:
+                expected = executor._apply_aggregate(df.copy(), {'group_by': group_by, 'aggregations': AGGREGATIONS})
+                for rows in [2, 7, 1000]:
+                    actual = partial_aggregate(split_frame(df, rows), group_by, aggregations)
+                    pd.testing.assert_frame_equal(actual, expected, check_dtype=False,
+                                                  obj=f'seed={seed} group_by={group_by} rows={rows}')
+
+    def test_merge_states_is_order_independent(self):
+        df = random_frame(5)
+        aggregations = [(config['output_name'], config['field'], config['operation']) for config in AGGREGATIONS]
+        states = [partial_state(chunk, ['g'], aggregations) for chunk in split_frame(df, 11)]
+        forward = merge_states(states).sort_index()
+        nested = merge_states([merge_states(states[:3]), merge_states(states[3:])]).sort_index()
+        whole = partial_state(df, ['g'], aggregations).sort_index()
+        for merged in [forward, nested]:
+            for column in [column for column in whole.columns if not column.endswith((':first', ':last'))]:
+                pd.testing.assert_series_equal(merged[column], whole[column], check_dtype=False, obj=column)
+
+    def test_limited_sort(self):
+        executor = PipelineExecutor(None, None)
+        configs = [
+            {'limit_type': 'top', 'limit_count': 12},
+            {'limit_type': 'bottom', 'limit_count': 30},
+            {'limit_type': 'range', 'start_row': 3, 'end_row': 50},
+            {'limit_type': 'top', 'limit_count': 1000},
+        ]
+        for seed in range(2):
+            df = random_frame(seed, rows=120)
+            for by, ascending in self.SORT_KEYS + [([], [])]:
+                for limit in configs:
+                    config = dict(limit, enable_limit=True, sort_fields=[
+                        {'field': field, 'order': 'asc' if order else 'desc'} for field, order in zip(by, ascending)
+                    ])
+                    expected = executor._apply_sort(df.copy(), config)
+                    chunks = list(limited_sort(split_frame(df, 9), by, ascending, **limit))
+                    pd.testing.assert_frame_equal(concat_frames(chunks), expected,
+                                                  obj=f'seed={seed} by={by} limit={limit}')
@@ -0,0 +1,41 @@
+# Copyright (c) 2025 YycKop
+# MIT License
+# Integrated-Data-Platform-backend/processing/worker.py
+"""
+工作进程入口
+
+spawn 方式启动的子进程在反序列化任务时会导入任务函数所在的模块，此时 Django 尚未初始化，
+因此这里不能在模块级导入任何模型，初始化完成后再在任务函数内导入 processing.jobs 等模块。
+"""
+import os
+
+
+def init_worker():
+    """工作进程初始化：加载 Django"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Integrated-Data-Platform.settings')
+    import django
+    django.setup()
+
+
+def run_job(run_id):
+    """在工作进程中执行一个流程执行任务"""
+    from processing.jobs import execute_run
+    execute_run(run_id)
+
+
+def run_partition(modules, df):
+    """在工作进程中依次对一个行分区执行逐行模块，返回 (结果, [(处理前行数, 处理后行数), ...])"""
+    from processing.executor import PipelineExecutor
+    executor = PipelineExecutor(None, None)
+    counts = []
+    for module_type, config in modules:
+        before_count = len(df)
+        df = executor._apply_module(df, module_type, config)
+        counts.append((before_count, len(df)))
+    return df, counts
+
+
+def run_partial_aggregate(group_by, aggregations, df):
+    """在工作进程中计算一个行分区的部分聚合结果"""
+    from processing.external import partial_state
+    return partial_state(df, group_by, aggregations)
@@ -7,3 +7,4 @@ from .models import *
 admin.site.register(ChartType)
 admin.site.register(Visualization)
 admin.site.register(Dashboard)
+admin.site.register(ChartRollup)
@@ -7,3 +7,6 @@ from django.apps import AppConfig
 class VisualizationConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "visualization"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,131 @@
+# Copyright (c) 2025 YycKop
+# MIT License
+# Integrated-Data-Platform-backend/visualization/batch.py
+"""
+看板图表数据的批量生成
+
+一次请求生成看板中全部图表的数据：
+- 命中图表数据缓存的图表直接返回；
+- 使用图表汇总的图表（柱状图、饼图、地图）不读取数据集；
+- 其余图表按数据集分组，每个数据集只读取一次，读取的列为这些图表用到的列的并集
+  （有图表需要全部列时读取全部列）。
+
+数据集读取和各图表的计算在线程池中并发执行，每个图表完成后立即产出结果，
+调用方可以把结果逐个流式返回给前端。
+"""
+import concurrent.futures
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from datasets.storage import DatasetStore
+from .rollups import get_visualization_spec, is_rollup_enabled
+
+
+def get_dashboard_workers():
+    """并发计算看板图表的线程数"""
+    return max(int(getattr(settings, 'VISUALIZATION_DASHBOARD_WORKERS', 4)), 1)
+
+
+def _union_columns(current, columns):
+    """合并需要读取的列，None 表示全部列"""
+    if current is None or columns is None:
+        return None
+    return current + [column for column in columns if column not in current]
+
+
+def _in_thread(func, *args):
+    """在线程池中执行，结束时关闭该线程的数据库连接"""
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        connection.close()
+
+
+def _load_dataset(dataset, columns):
+    return DatasetStore.read_dataframe(dataset, columns=columns)
+
+
+def _build_from_frame(builder, visualization, frame, columns):
+    """从共享的数据集数据中取出图表用到的列（复制一份，图表处理函数会修改数据）生成图表"""
+    if columns is None:
+        df = frame.copy()
+    else:
+        df = frame[[column for column in columns if column in frame.columns]].copy()
+    return builder.build_chart_payload(visualization, df)
+
+
+def iter_dashboard_payloads(visualizations, builder, get_columns):
+    """
+    依次产出 (可视化, 响应内容或 None, 错误或 None)，顺序为完成顺序
+
+    builder 提供 get_cached_payload(visualization) 和 build_chart_payload(visualization, df=None)，
+    get_columns(visualization) 返回图表需要读取的列（None 表示全部列）。
+    """
+    pending_charts = {}  # 数据集ID -> [(可视化, 需要的列)]
+    datasets = {}  # 数据集ID -> (数据集, 读取的列)
+    rollup_charts = []
+
+    for visualization in visualizations:
+        try:
+            payload = builder.get_cached_payload(visualization)
+        except Exception as e:
+            yield visualization, None, e
+            continue
+        if payload is not None:
+            yield visualization, payload, None
+            continue
+
+        if is_rollup_enabled() and get_visualization_spec(visualization) is not None:
+            rollup_charts.append(visualization)
+            continue
+
+        dataset = visualization.dataset
+        columns = get_columns(visualization)
+        pending_charts.setdefault(dataset.pk, []).append((visualization, columns))
+        if dataset.pk in datasets:
+            datasets[dataset.pk] = (dataset, _union_columns(datasets[dataset.pk][1], columns))
+        else:
+            datasets[dataset.pk] = (dataset, list(columns) if columns is not None else None)
+
+    if not rollup_charts and not datasets:
+        return
+
+    executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=get_dashboard_workers(), thread_name_prefix='dashboard-chart'
+    )
+    futures = {}  # future -> ('dataset', 数据集ID) 或 ('chart', 可视化)
+    try:
+        for visualization in rollup_charts:
+            future = executor.submit(_in_thread, builder.build_chart_payload, visualization)
+            futures[future] = ('chart', visualization)
+        for dataset_id, (dataset, columns) in datasets.items():
+            futures[executor.submit(_in_thread, _load_dataset, dataset, columns)] = ('dataset', dataset_id)
+
+        while futures:
+            done, _ = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                kind, target = futures.pop(future)
+                error = future.exception()
+
+                if kind == 'chart':
+                    yield target, None if error else future.result()[0], error
+                    continue
+
+                # 数据集读取完成后提交使用它的图表
+                charts = pending_charts.pop(target)
+                if error is not None:
+                    for visualization, _ in charts:
+                        yield visualization, None, error
+                    continue
+                frame = future.result()
+                for visualization, columns in charts:
+                    chart_future = executor.submit(
+                        _in_thread, _build_from_frame, builder, visualization, frame, columns
+                    )
+                    futures[chart_future] = ('chart', visualization)
+                del frame
+    finally:
+        # 调用方提前结束（例如客户端断开）时取消尚未开始的任务
+        executor.shutdown(wait=False, cancel_futures=True)
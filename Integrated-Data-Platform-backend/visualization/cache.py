@@ -0,0 +1,117 @@
+# Copyright (c) 2025 YycKop
+# MIT License
+# Integrated-Data-Platform-backend/visualization/cache.py
+"""
+图表数据缓存
+
+图表数据只由图表类型、可视化配置和数据集内容决定，因此以 (数据集, 内容版本 Dataset.content_version, 配置哈希)
+为键缓存 VisualizationViewSet.data 生成的图表数据：配置相同的可视化共用缓存，
+数据集被重新导入、追加或改写后内容版本变化，旧版本的缓存不会再被命中，在写入新版本的结果时清除。
+
+缓存保存在进程内，总大小按图表数据序列化为 JSON 后的字节数估算，
+超过 VISUALIZATION_CACHE_MAX_BYTES 时淘汰最久未使用的条目，配置为 0 时不缓存。
+"""
+import collections
+import hashlib
+import json
+import threading
+
+from django.conf import settings
+
+
+def get_cache_max_bytes():
+    return int(getattr(settings, 'VISUALIZATION_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+
+def get_config_hash(chart_type_name, config):
+    """图表类型和可视化配置的哈希"""
+    payload = json.dumps({'chart_type': chart_type_name, 'config': config or {}},
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def get_cache_key(visualization):
+    dataset = visualization.dataset
+    return (
+        dataset.pk,
+        dataset.content_version,
+        get_config_hash(visualization.chart_type.name, visualization.configuration)
+    )
+
+
+class ChartDataCache:
+    """按内存预算做 LRU 淘汰的图表数据缓存，线程安全"""
+
+    def __init__(self):
+        self._entries = collections.OrderedDict()  # 键 -> (图表数据, 字节数)
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """返回缓存的图表数据，未命中时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, chart_data):
+        max_bytes = get_cache_max_bytes()
+        size = len(json.dumps(chart_data, ensure_ascii=False, default=str).encode('utf-8'))
+        if size > max_bytes:
+            return
+
+        with self._lock:
+            # 同一数据集旧版本的结果不会再被命中，写入新版本时一并清除
+            stale = [cached for cached in self._entries if cached[0] == key[0] and cached[1] != key[1]]
+            for cached in stale + [key]:
+                self._discard(cached)
+            self.invalidations += len(stale)
+            self._entries[key] = (chart_data, size)
+            self.size += size
+            while self.size > max_bytes:
+                evicted_key = next(iter(self._entries))
+                self._discard(evicted_key)
+                self.evictions += 1
+
+    def invalidate_dataset(self, dataset_id):
+        """删除某个数据集的全部缓存"""
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == dataset_id]
+            for key in keys:
+                self._discard(key)
+            self.invalidations += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'size_bytes': self.size,
+                'max_bytes': get_cache_max_bytes(),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+
+chart_data_cache = ChartDataCache()
@@ -0,0 +1,138 @@
+# Copyright (c) 2025 YycKop
+# MIT License
+# Integrated-Data-Platform-backend/visualization/downsampling.py
+"""
+折线图和散点图的服务端降采样
+
+数据点超过图表的点数预算时：
+- 折线图按 LTTB（Largest-Triangle-Three-Buckets）算法挑选保留形状的点，多条系列共用分类轴，
+  各系列按分到的点数挑选后取并集，保留的分类数不超过预算；
+- 散点图把点按网格分箱，每个非空网格输出一个点 [x 均值, y 均值, 点数]，
+  点数作为第三维（前端按第三维调整点的大小）。
+
+点数预算默认取 VISUALIZATION_LINE_MAX_POINTS / VISUALIZATION_SCATTER_MAX_POINTS，
+可视化配置中的 maxPoints 可以调小，不能超过全局预算，因此响应大小与数据行数无关。
+"""
+import math
+
+import numpy as np
+from django.conf import settings
+
+# LTTB 至少保留首尾两点和一个中间点
+MIN_POINTS = 3
+
+
+def get_point_budget(chart_type_name, config):
+    """图表的点数预算"""
+    if chart_type_name == '散点图':
+        budget = int(getattr(settings, 'VISUALIZATION_SCATTER_MAX_POINTS', 5000))
+    else:
+        budget = int(getattr(settings, 'VISUALIZATION_LINE_MAX_POINTS', 2000))
+    try:
+        requested = int((config or {}).get('maxPoints') or 0)
+    except (TypeError, ValueError):
+        requested = 0
+    if requested > 0:
+        budget = min(budget, requested)
+    return max(budget, MIN_POINTS)
+
+
+def lttb_indices(y, threshold, x=None):
+    """
+    LTTB 降采样，返回保留点的位置（升序）
+
+    y 中的空值不参与挑选；x 为空时按位置等距。保留点数不超过 threshold。
+    """
+    y = np.asarray(y, dtype='float64')
+    x = np.arange(len(y), dtype='float64') if x is None else np.asarray(x, dtype='float64')
+    valid = np.flatnonzero(~np.isnan(y))
+    if len(valid) <= threshold:
+        return valid
+    if threshold < MIN_POINTS:
+        return valid[[0, -1]] if threshold == 2 else valid[:threshold]
+
+    xs, ys = x[valid], y[valid]
+    n = len(valid)
+    # 首尾两点之外的点按位置均分为 threshold - 2 个桶，每个桶保留一个点
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # 下一个桶的平均点（最后一个桶用末尾点）
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+            avg_x, avg_y = xs[next_start:next_end].mean(), ys[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = xs[-1], ys[-1]
+
+        # 与上一个保留点、下一个桶平均点构成的三角形面积最大的点
+        px, py = xs[previous], ys[previous]
+        areas = np.abs((px - avg_x) * (ys[start:end] - py) - (px - xs[start:end]) * (avg_y - py))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+
+    return valid[selected]
+
+
+def downsample_series(columns, budget):
+    """
+    多条共用分类轴的系列一起降采样，返回需要保留的分类位置（升序），不需要降采样时返回 None
+
+    columns 为各系列按分类顺序排列的数值，每条系列分得 budget // 系列数 个点，结果取并集，
+    因此保留的分类数不超过 budget。系列太多、每条分不到 MIN_POINTS 个点时，
+    改为对各系列逐分类的均值曲线做 LTTB。
+    """
+    columns = [np.asarray(column, dtype='float64') for column in columns]
+    if not columns or len(columns[0]) <= budget:
+        return None
+    share = budget // len(columns)
+    if share < MIN_POINTS:
+        columns, share = [_mean_series(columns)], budget
+    positions = [lttb_indices(column, share) for column in columns]
+    return np.unique(np.concatenate(positions))
+
+
+def _mean_series(columns):
+    """各系列逐分类的均值，忽略空值，全部为空的分类仍为空值"""
+    stacked = np.vstack(columns)
+    present = ~np.isnan(stacked)
+    counts = present.sum(axis=0)
+    totals = np.where(present, stacked, 0.0).sum(axis=0)
+    return np.where(counts > 0, totals / np.maximum(counts, 1), np.nan)
+
+
+def bin_points(x, y, budget):
+    """
+    散点网格分箱，返回 [[x 均值, y 均值, 点数], ...]
+
+    网格为 floor(sqrt(budget)) × floor(sqrt(budget))，非空网格数不超过 budget。空值和无穷大的点不参与分箱。
+    """
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    finite = np.isfinite(x) & np.isfinite(y)
+    x, y = x[finite], y[finite]
+    if len(x) == 0:
+        return []
+    size = max(int(math.isqrt(budget)), 1)
+
+    def cell(values):
+        low, high = values.min(), values.max()
+        if high <= low:
+            return np.zeros(len(values), dtype=np.int64)
+        return np.minimum(((values - low) / (high - low) * size).astype(np.int64), size - 1)
+
+    codes = cell(x) * size + cell(y)
+    counts = np.bincount(codes, minlength=size * size)
+    occupied = np.flatnonzero(counts)
+    counts = counts[occupied]
+    mean_x = np.bincount(codes, weights=x, minlength=size * size)[occupied] / counts
+    mean_y = np.bincount(codes, weights=y, minlength=size * size)[occupied] / counts
+    return np.column_stack([mean_x, mean_y, counts.astype('float64')]).tolist()
+
+
+def sampling_info(method, source_points, points):
+    """附加在图表数据中的降采样说明"""
+    return {'method': method, 'source_points': int(source_points), 'points': int(points)}
@@ -0,0 +1,77 @@
+# Copyright (c) 2025 YycKop
+# MIT License
+# Integrated-Data-Platform-backend/visualization/management/commands/benchmark_charts.py
+import contextlib
+import io
+import json
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+
+from visualization.views import VisualizationViewSet
+
+PROVINCES = ['北京', '上海', '广东', '江苏', '浙江', '四川', '湖北', '湖南', '河南', '山东',
+             '新疆', '西藏', '内蒙古', '广西', '宁夏', '黑龙江', '云南', '福建', '安徽', '重庆']
+
+# 图表类型 -> (可视化配置, 需要的列)
+CHARTS = {
+    '柱状图': ({'xField': 'category', 'yField': 'value', 'group_by': 'group'}, ['category', 'value', 'group']),
+    '折线图': ({'xField': 'step', 'yFields': ['value', 'amount']}, ['step', 'value', 'amount']),
+    '饼图': ({'nameField': 'category', 'valueField': 'amount'}, ['category', 'amount']),
+    '散点图': ({'xField': 'value', 'yField': 'amount', 'group_by': 'group'}, ['value', 'amount', 'group']),
+    '雷达图': ({'categoryField': 'group', 'indicatorFields': ['value', 'amount', 'score']},
+            ['group', 'value', 'amount', 'score']),
+    '地图': ({'regionField': 'region', 'valueField': 'amount'}, ['region', 'amount']),
+}
+
+
+def build_frame(rows, seed=0):
+    """构造测试数据：分类、分组、地区、递增序号和数值列，数值列混入空值"""
+    rng = np.random.default_rng(seed)
+    categories = np.array([f'类别{i}' for i in range(200)], dtype=object)
+    groups = np.array(['A', 'B', 'C', 'D', 'E'], dtype=object)
+    df = pd.DataFrame({
+        'category': categories[rng.integers(0, len(categories), rows)],
+        'group': groups[rng.integers(0, len(groups), rows)],
+        'region': np.array(PROVINCES, dtype=object)[rng.integers(0, len(PROVINCES), rows)],
+        'step': np.arange(rows),
+        'value': rng.normal(100, 20, rows),
+        'amount': rng.random(rows) * 1000,
+        'score': rng.integers(0, 100, rows),
+    })
+    df.loc[rng.random(rows) < 0.01, 'value'] = np.nan
+    return df
+
+
+class Command(BaseCommand):
+    help = '测量各图表类型在不同数据行数下生成图表数据的耗时和响应大小'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', default='100000,1000000,10000000', help='逗号分隔的测试数据行数')
+        parser.add_argument('--charts', default=','.join(CHARTS), help='逗号分隔的图表类型')
+        parser.add_argument('--repeat', type=int, default=1, help='每项测量的重复次数，取最短耗时')
+
+    def handle(self, *args, **options):
+        charts = [name for name in options['charts'].split(',') if name]
+        view = VisualizationViewSet()
+
+        for rows in [int(value) for value in options['rows'].split(',') if value]:
+            df = build_frame(rows)
+            self.stdout.write(f'测试数据: {rows:,} 行')
+            for name in charts:
+                config, columns = CHARTS[name]
+                timings = []
+                for _ in range(max(options['repeat'], 1)):
+                    frame = df[columns].copy()
+                    started = time.perf_counter()
+                    # 图表数据处理函数会打印调试信息，测量时丢弃
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        chart_data = view._prepare_chart_data(frame, config, SimpleNamespace(name=name))
+                    timings.append(time.perf_counter() - started)
+
+                size = len(json.dumps(chart_data, ensure_ascii=False, default=str).encode('utf-8'))
+                self.stdout.write(f'  {name}: {min(timings) * 1000:,.1f} ms, 响应 {size / 1024:,.1f} KB')
+            del df
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("datasets", "0005_dataset_content_version"),
+        ("visualization", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChartRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "spec_hash",
+                    models.CharField(max_length=64, verbose_name="汇总规格哈希"),
+                ),
+                (
+                    "group_fields",
+                    models.JSONField(default=list, verbose_name="分组字段"),
+                ),
+                (
+                    "value_field",
+                    models.CharField(max_length=200, verbose_name="数值字段"),
+                ),
+                (
+                    "content_version",
+                    models.PositiveBigIntegerField(verbose_name="数据集内容版本"),
+                ),
+                (
+                    "column_types",
+                    models.JSONField(blank=True, null=True, verbose_name="字段类型"),
+                ),
+                (
+                    "parts",
+                    models.JSONField(
+                        blank=True, null=True, verbose_name="已汇总的分片"
+                    ),
+                ),
+                (
+                    "source_rows",
+                    models.BigIntegerField(default=0, verbose_name="汇总的行数"),
+                ),
+                (
+                    "group_count",
+                    models.BigIntegerField(default=0, verbose_name="分组数"),
+                ),
+                (
+                    "storage_file",
+                    models.CharField(max_length=500, verbose_name="汇总文件"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="更新时间"),
+                ),
+                (
+                    "dataset",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="chart_rollups",
+                        to="datasets.dataset",
+                        verbose_name="数据集",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "图表汇总",
+                "verbose_name_plural": "图表汇总",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("dataset", "spec_hash"), name="unique_chart_rollup_spec"
+                    )
+                ],
+            },
+        ),
+    ]
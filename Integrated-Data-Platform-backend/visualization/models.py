@@ -81,3 +81,28 @@ class DashboardItem(models.Model):
     class Meta:
         verbose_name = "看板项"
         verbose_name_plural = verbose_name
+
+
+class ChartRollup(models.Model):
+    """按图表需要的分组字段和数值字段物化的汇总结果，数据集内容版本变化后刷新"""
+    dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name='chart_rollups', verbose_name="数据集")
+    spec_hash = models.CharField(max_length=64, verbose_name="汇总规格哈希")
+    group_fields = models.JSONField(default=list, verbose_name="分组字段")
+    value_field = models.CharField(max_length=200, verbose_name="数值字段")
+    content_version = models.PositiveBigIntegerField(verbose_name="数据集内容版本")
+    column_types = models.JSONField(null=True, blank=True, verbose_name="字段类型")
+    parts = models.JSONField(null=True, blank=True, verbose_name="已汇总的分片")
+    source_rows = models.BigIntegerField(default=0, verbose_name="汇总的行数")
+    group_count = models.BigIntegerField(default=0, verbose_name="分组数")
+    storage_file = models.CharField(max_length=500, verbose_name="汇总文件")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    class Meta:
+        verbose_name = "图表汇总"
+        verbose_name_plural = verbose_name
+        constraints = [
+            models.UniqueConstraint(fields=['dataset', 'spec_hash'], name='unique_chart_rollup_spec')
+        ]
+
+    def __str__(self):
+        return f"{self.dataset} {'/'.join(self.group_fields)} -> {self.value_field}"
@@ -0,0 +1,297 @@
+# Copyright (c) 2025 YycKop
+# MIT License
+# Integrated-Data-Platform-backend/visualization/rollups.py
+"""
+图表汇总（物化的分组结果）
+
+柱状图、饼图和地图只需要 groupby(分组字段)[数值字段].sum() 的结果。可视化保存时按图表配置
+构建汇总：对数据集逐块做与 VisualizationViewSet._prepare_chart_data 相同的预处理（空值填 0、
+数值字段转为数值），按分组字段汇总出每组的和（__sum__）与有效数值个数（__count__），
+以 Parquet 文件保存在数据集存储目录的 rollups/ 下。相同分组字段和数值字段的图表共用一份汇总。
+
+请求图表数据时直接使用汇总结果，耗时只与分组数有关。数据集内容版本变化后在下一次请求时刷新：
+自汇总以来的变更（DatasetChange）都是列式存储上的追加且字段类型未变时，只汇总新增的分片
+并与原结果合并；否则重新构建。
+"""
+import hashlib
+import json
+import logging
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.db import transaction
+
+from datasets.models import DatasetChange
+from datasets.storage import DatasetStore, get_new_parts, get_storage_root
+from .models import ChartRollup
+
+logger = logging.getLogger(__name__)
+
+SUM_COLUMN = '__sum__'
+COUNT_COLUMN = '__count__'
+
+# 汇总文件的元数据中记录按 JSON 文本保存的列
+JSON_COLUMNS_KEY = b'json_columns'
+# Arrow 能按原类型保存的列（分组字段空值已填 0，不含空值）
+TYPED_COLUMNS = ('string', 'integer', 'floating', 'boolean', 'empty')
+
+
+def is_rollup_enabled():
+    return bool(getattr(settings, 'VISUALIZATION_ROLLUPS_ENABLED', True))
+
+
+def get_rollup_spec(chart_type_name, config, columns):
+    """图表需要的 (分组字段, 数值字段)，图表不使用汇总或字段不完整时返回 None"""
+    config = config or {}
+    if chart_type_name == '柱状图':
+        group_fields = [config.get('xField', '')]
+        group_by = config.get('group_by')
+        if group_by and group_by in columns:
+            group_fields.append(group_by)
+        value_field = config.get('yField', '')
+    elif chart_type_name == '饼图':
+        group_fields, value_field = [config.get('nameField', '')], config.get('valueField', '')
+    elif chart_type_name == '地图':
+        group_fields, value_field = [config.get('regionField', '')], config.get('valueField', '')
+    else:
+        return None
+
+    fields = group_fields + [value_field]
+    if not all(field and isinstance(field, str) and field in columns for field in fields) \
+            or len(set(fields)) != len(fields):
+        return None
+    return group_fields, value_field
+
+
+def get_spec_hash(group_fields, value_field):
+    payload = json.dumps({'group_fields': group_fields, 'value_field': value_field}, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def aggregate_frame(df, group_fields, value_field):
+    """一块数据的汇总，预处理与 _prepare_chart_data 和各图表的数据处理一致"""
+    df = df[group_fields + [value_field]].fillna(0)
+    values = pd.to_numeric(df[value_field], errors='coerce')
+    grouped = df[group_fields].assign(**{SUM_COLUMN: values, COUNT_COLUMN: values.notna()}) \
+        .groupby(group_fields, sort=False)
+    return grouped.agg(**{SUM_COLUMN: (SUM_COLUMN, 'sum'), COUNT_COLUMN: (COUNT_COLUMN, 'sum')}).reset_index()
+
+
+def combine_frames(frames, group_fields):
+    """合并多块汇总结果"""
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=group_fields + [SUM_COLUMN, COUNT_COLUMN])
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    return pd.concat(frames, ignore_index=True).groupby(group_fields, sort=False).sum().reset_index()
+
+
+def _aggregate_dataset(dataset, group_fields, value_field, parts=None):
+    """逐块读取数据集（或其中的部分分片）并汇总，返回 (汇总结果, 读取的行数)"""
+    frames, rows = [], 0
+    for df in DatasetStore.iter_dataframes(dataset, columns=group_fields + [value_field], parts=parts):
+        rows += len(df)
+        frames.append(aggregate_frame(df, group_fields, value_field))
+        # 各块结果累积较多时先合并，内存只与分组数有关
+        if len(frames) >= 16:
+            frames = [combine_frames(frames, group_fields)]
+    return combine_frames(frames, group_fields), rows
+
+
+def _get_field_types(dataset, fields):
+    column_types = DatasetStore.get_column_types(dataset)
+    if column_types is None:
+        return None
+    return {field: column_types.get(field) for field in fields}
+
+
+def _can_refresh_incrementally(rollup, dataset, manifest):
+    """自汇总以来的变更是否都是对同一份列式数据的追加"""
+    if manifest is None or rollup.parts is None:
+        return False
+    if rollup.column_types != _get_field_types(dataset, rollup.group_fields + [rollup.value_field]):
+        return False
+    operations = list(DatasetChange.objects.filter(
+        dataset=dataset, version__gt=rollup.content_version, version__lte=dataset.content_version
+    ).values_list('operation', flat=True))
+    if len(operations) != dataset.content_version - rollup.content_version:
+        return False
+    return all(operation == 'append' for operation in operations) \
+        and get_new_parts(manifest, rollup.parts) is not None
+
+
+def _rollup_path(storage_file):
+    return os.path.join(get_storage_root(), storage_file)
+
+
+def _to_json(value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def _write_rollup_file(frame, path):
+    """
+    把汇总结果写为 Parquet 文件
+
+    分组字段按原类型保存；混合类型的分组字段（例如文本列的空值填 0 后）逐个值保存为 JSON 文本，读取时还原。
+    """
+    arrays, encoded = {}, []
+    for name in frame.columns:
+        column = frame[name]
+        if column.dtype != object or pd.api.types.infer_dtype(column, skipna=True) in TYPED_COLUMNS:
+            arrays[name] = pa.array(column, from_pandas=True)
+        else:
+            arrays[name] = pa.array([_to_json(value) for value in column], type=pa.string())
+            encoded.append(name)
+    table = pa.table(arrays).replace_schema_metadata({JSON_COLUMNS_KEY: json.dumps(encoded)})
+    pq.write_table(table, path)
+
+
+def _read_rollup_file(storage_file):
+    table = pq.read_table(_rollup_path(storage_file))
+    encoded = json.loads((table.schema.metadata or {}).get(JSON_COLUMNS_KEY, b'[]'))
+    frame = table.to_pandas()
+    for name in encoded:
+        frame[name] = pd.Series([json.loads(value) for value in frame[name]], index=frame.index, dtype=object)
+    return frame
+
+
+def _remove_rollup_file(storage_file):
+    try:
+        os.remove(_rollup_path(storage_file))
+    except FileNotFoundError:
+        pass
+
+
+def _save_rollup(rollup, frame):
+    """
+    把汇总结果写入新文件后再切换，旧文件在切换后删除
+
+    切换时锁定汇总记录，并发刷新同一份汇总的请求依次切换，每次删除的都是切换前记录中的文件；
+    其他请求已经切换到相同或更新的内容版本时放弃本次结果，删除自己写入的文件。
+    """
+    storage_file = os.path.join(str(rollup.dataset_id), 'rollups', f'{rollup.spec_hash}-{uuid.uuid4().hex}.parquet')
+    path = _rollup_path(storage_file)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _write_rollup_file(frame, path)
+
+    with transaction.atomic():
+        current = ChartRollup.objects.select_for_update().get(pk=rollup.pk)
+        superseded = bool(current.storage_file) and current.content_version >= rollup.content_version \
+            and current.storage_file != rollup.storage_file
+        if not superseded:
+            old_file = current.storage_file
+            rollup.storage_file = storage_file
+            rollup.group_count = len(frame)
+            rollup.save()
+
+    if superseded:
+        _remove_rollup_file(storage_file)
+        rollup.refresh_from_db()
+    elif old_file:
+        _remove_rollup_file(old_file)
+
+
+def build_rollup(dataset, group_fields, value_field):
+    """构建（或重新构建）一份汇总"""
+    manifest = DatasetStore.load_manifest(dataset)
+    frame, rows = _aggregate_dataset(dataset, group_fields, value_field)
+    rollup, _ = ChartRollup.objects.get_or_create(
+        dataset=dataset,
+        spec_hash=get_spec_hash(group_fields, value_field),
+        defaults={'group_fields': group_fields, 'value_field': value_field, 'content_version': dataset.content_version}
+    )
+    rollup.content_version = dataset.content_version
+    rollup.column_types = _get_field_types(dataset, group_fields + [value_field])
+    rollup.parts = [part['file'] for part in manifest['parts']] if manifest else None
+    rollup.source_rows = rows
+    _save_rollup(rollup, frame)
+    logger.info(f"数据集 {dataset.pk} 的图表汇总 {group_fields} -> {value_field} 已构建: {rows} 行, {len(frame)} 组")
+    return rollup, frame
+
+
+def refresh_rollup(rollup, dataset):
+    """数据集内容版本变化后刷新汇总，能增量刷新时只汇总新增的分片"""
+    manifest = DatasetStore.load_manifest(dataset)
+    if not _can_refresh_incrementally(rollup, dataset, manifest):
+        return build_rollup(dataset, rollup.group_fields, rollup.value_field)
+
+    new_parts = get_new_parts(manifest, rollup.parts)
+    added, rows = _aggregate_dataset(dataset, rollup.group_fields, rollup.value_field, parts=new_parts)
+    frame = combine_frames([_read_rollup_file(rollup.storage_file), added], rollup.group_fields)
+
+    rollup.content_version = dataset.content_version
+    rollup.parts = [part['file'] for part in manifest['parts']]
+    rollup.source_rows += rows
+    _save_rollup(rollup, frame)
+    logger.info(f"数据集 {dataset.pk} 的图表汇总 {rollup.group_fields} -> {rollup.value_field} "
+                f"增量刷新: 新增 {rows} 行, 共 {len(frame)} 组")
+    return rollup, frame
+
+
+def get_visualization_spec(visualization):
+    dataset = visualization.dataset
+    return get_rollup_spec(
+        visualization.chart_type.name,
+        visualization.configuration,
+        DatasetStore.get_columns(dataset)
+    )
+
+
+def ensure_rollup(visualization):
+    """可视化保存后为其构建汇总（已有最新的汇总时不重复构建），图表不使用汇总时不做任何事"""
+    if not is_rollup_enabled():
+        return None
+    spec = get_visualization_spec(visualization)
+    if spec is None:
+        return None
+    get_rollup_frame(visualization, spec)
+    return spec
+
+
+def get_rollup_frame(visualization, spec=None):
+    """
+    返回可视化所需的汇总结果（分组字段, __sum__, __count__），必要时构建或刷新
+
+    图表不使用汇总、汇总被关闭或构建失败时返回 None，调用方按原方式读取数据集计算。
+    """
+    if not is_rollup_enabled():
+        return None
+    dataset = visualization.dataset
+    spec = spec or get_visualization_spec(visualization)
+    if spec is None:
+        return None
+    group_fields, value_field = spec
+
+    try:
+        rollup = ChartRollup.objects.filter(dataset=dataset, spec_hash=get_spec_hash(group_fields, value_field)).first()
+        # 早期版本以 pickle 保存的汇总不再读取，重新构建
+        if rollup is None or not rollup.storage_file.endswith('.parquet'):
+            return build_rollup(dataset, group_fields, value_field)[1]
+        if rollup.content_version != dataset.content_version:
+            return refresh_rollup(rollup, dataset)[1]
+        return _read_rollup_file(rollup.storage_file)
+    except Exception as e:
+        logger.warning(f"图表汇总不可用，改为直接计算: {str(e)}")
+        return None
+
+
+def to_chart_frame(frame, chart_type_name, group_fields, value_field):
+    """
+    把汇总结果转换为图表数据处理函数的输入：每组一行，数值字段为该组的和
+
+    饼图和地图会丢弃没有有效数值的行，这些组的数值置为空值，由图表处理函数同样丢弃。
+    """
+    result = frame[group_fields].copy()
+    sums = frame[SUM_COLUMN]
+    if chart_type_name != '柱状图':
+        sums = sums.where(frame[COUNT_COLUMN] > 0)
+    result[value_field] = sums
+    return result
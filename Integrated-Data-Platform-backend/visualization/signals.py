@@ -0,0 +1,14 @@
+# Copyright (c) 2025 YycKop
+# MIT License
+# Integrated-Data-Platform-backend/visualization/signals.py
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from datasets.models import Dataset
+from .cache import chart_data_cache
+
+
+@receiver(post_delete, sender=Dataset)
+def invalidate_dataset_charts(sender, instance, **kwargs):
+    """数据集删除后清除它的图表数据缓存，内容变化由缓存键中的内容版本区分"""
+    chart_data_cache.invalidate_dataset(instance.pk)
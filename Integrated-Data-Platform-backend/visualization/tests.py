@@ -1,6 +1,224 @@
 # Copyright (c) 2025 YycKop
 # MIT License
 # Integrated-Data-Platform-backend/visualization/tests.py
+import json
+import os
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from datasets.storage import DatasetStore
+from datasets.tests import QueryCountMixin, StorageTestMixin, create_dataset
+from users.models import UserProfile
+from .downsampling import MIN_POINTS, bin_points, downsample_series
+from .cache import chart_data_cache
+from .models import ChartType, ChartRollup, Visualization, Dashboard, DashboardItem
+from .views import VisualizationViewSet
+from .rollups import _read_rollup_file, _save_rollup, aggregate_frame, build_rollup, refresh_rollup
+
+
+class VisualizationListQueryTests(QueryCountMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.chart_type = ChartType.objects.create(name='柱状图', chart_library='echarts')
+
+    def create_visualization(self):
+        user = self.make_user()
+        return Visualization.objects.create(
+            name=f'{user.username}-chart',
+            dataset=create_dataset(user),
+            chart_type=self.chart_type,
+            configuration={'xField': 'name', 'yField': 'value'},
+            created_by=user
+        )
+
+    def test_visualization_list(self):
+        def add_rows(count):
+            for _ in range(count):
+                self.create_visualization()
+
+        self.assertListQueries('/api/visualizations/', 1, add_rows)
+
+    def test_dashboard_list(self):
+        def add_rows(count):
+            for _ in range(count):
+                user = self.make_user()
+                dashboard = Dashboard.objects.create(name=f'{user.username}-dashboard', created_by=user)
+                for index in range(2):
+                    DashboardItem.objects.create(
+                        dashboard=dashboard, visualization=self.create_visualization(),
+                        position_x=index, position_y=0, width=6, height=4
+                    )
+
+        self.assertListQueries('/api/dashboards/', 3, add_rows)
+
+
+class DownsampleSeriesTests(TestCase):
+
+    def series(self, count, length=5000):
+        rng = np.random.default_rng(0)
+        columns = np.full((count, length), np.nan)
+        # 每个分组只在自己的一段分类上有数据，各系列挑选的分类互不重叠
+        for index, block in enumerate(np.array_split(np.arange(length), count)):
+            columns[index, block] = rng.normal(size=len(block)).cumsum()
+        return list(columns)
+
+    def test_union_stays_within_budget(self):
+        for count in [1, 3, 100, 666, 667, 1000]:
+            positions = downsample_series(self.series(count), 2000)
+            self.assertLessEqual(len(positions), 2000, count)
+            self.assertGreaterEqual(len(positions), MIN_POINTS, count)
+            self.assertTrue(np.all(np.diff(positions) > 0), count)
+
+    def test_bin_points_skips_non_finite(self):
+        x = np.array([0.0, 1.0, np.inf, 2.0, np.nan, 3.0])
+        y = np.array([0.0, 1.0, 1.0, -np.inf, 1.0, 3.0])
+        data = bin_points(x, y, 4)
+        self.assertEqual(sum(point[2] for point in data), 3)
+        self.assertTrue(np.isfinite(np.array(data)).all())
+
+    def test_scatter_drops_infinite_values(self):
+        df = pd.DataFrame({'x': [str(i) for i in range(10)] + ['inf', '1'], 'y': ['1'] * 10 + ['2', '-inf']})
+        view = VisualizationViewSet()
+        for max_points in [4, 100]:
+            config = {'xField': 'x', 'yField': 'y', 'maxPoints': max_points}
+            chart_data = view._prepare_scatter_chart_data(df.copy(), config)
+            self.assertEqual(sum(point[2] for point in chart_data['data']), 10, max_points)
+            self.assertEqual('sampling' in chart_data, max_points == 4)
+
+    def test_small_series_are_kept(self):
+        self.assertIsNone(downsample_series(self.series(1000, length=2000), 2000))
+
+
+class RollupRefreshTests(StorageTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        user = UserProfile.objects.create(username='admin', role='admin')
+        self.dataset = create_dataset(user, records=0)
+        DatasetStore.write_dataframe(self.dataset, pd.DataFrame({'name': ['a', 'b', 'a'], 'value': [1, 2, 3]}))
+        self.dataset.refresh_from_db()
+
+    def rollup_files(self):
+        directory = os.path.join(self.storage_root, str(self.dataset.pk), 'rollups')
+        return sorted(os.path.join(str(self.dataset.pk), 'rollups', name) for name in os.listdir(directory))
+
+    def test_concurrent_refreshes_leave_one_file(self):
+        rollup, _ = build_rollup(self.dataset, ['name'], 'value')
+        # 两个请求读到同一份旧汇总，各自汇总完成后先后切换
+        first, second = ChartRollup.objects.get(pk=rollup.pk), ChartRollup.objects.get(pk=rollup.pk)
+        DatasetStore.append_records(self.dataset, [{'name': 'b', 'value': 4}])
+        self.dataset.refresh_from_db()
+        frame = aggregate_frame(DatasetStore.read_dataframe(self.dataset), ['name'], 'value')
+        for request in [first, second]:
+            request.content_version = self.dataset.content_version
+            _save_rollup(request, frame)
+
+        current = ChartRollup.objects.get(pk=rollup.pk)
+        self.assertEqual(self.rollup_files(), [current.storage_file])
+        self.assertEqual(second.storage_file, current.storage_file)
+        self.assertEqual(current.content_version, self.dataset.content_version)
+
+    def test_refresh_after_append(self):
+        rollup, _ = build_rollup(self.dataset, ['name'], 'value')
+        DatasetStore.append_records(self.dataset, [{'name': 'b', 'value': 4}])
+        self.dataset.refresh_from_db()
+        _, frame = refresh_rollup(rollup, self.dataset)
+        self.assertEqual(frame.set_index('name')['__sum__'].to_dict(), {'a': 4, 'b': 6})
+        self.assertEqual(self.rollup_files(), [ChartRollup.objects.get(pk=rollup.pk).storage_file])
+
+    def test_rollup_file_round_trip(self):
+        DatasetStore.write_dataframe(self.dataset, pd.DataFrame({
+            'name': ['a', None, 'b', None], 'group': [1, 2, 1, 2], 'value': [1.5, 2, None, 4],
+        }))
+        self.dataset.refresh_from_db()
+        rollup, frame = build_rollup(self.dataset, ['name', 'group'], 'value')
+        self.assertTrue(rollup.storage_file.endswith('.parquet'))
+
+        stored = pq.read_table(os.path.join(self.storage_root, rollup.storage_file))
+        self.assertEqual(stored.schema.field('group').type, pa.int64())
+        loaded = _read_rollup_file(rollup.storage_file)
+        # 文本列的空值填 0 后是混合类型，按值还原
+        self.assertEqual(loaded['name'].tolist(), ['a', 0, 'b'])
+        pd.testing.assert_frame_equal(loaded, frame, check_dtype=False)
+
+
+class ChartDataEndpointTests(StorageTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        chart_data_cache.clear()
+        self.addCleanup(chart_data_cache.clear)
+        self.user = UserProfile.objects.create(username='admin', role='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.chart_type = ChartType.objects.create(name='折线图', chart_library='echarts')
+        self.dataset = create_dataset(self.user, records=0)
+        DatasetStore.write_dataframe(self.dataset, pd.DataFrame({'name': ['a', 'b', 'c'], 'value': [1, 2, 3]}))
+        self.dataset.refresh_from_db()
+
+    def create_visualization(self, name, dataset=None):
+        return Visualization.objects.create(
+            name=name, dataset=dataset or self.dataset, chart_type=self.chart_type,
+            configuration={'xField': 'name', 'yField': 'value'}, created_by=self.user
+        )
+
+    def test_cache_hit_until_content_version_changes(self):
+        visualization = self.create_visualization('chart')
+        url = f'/api/visualizations/{visualization.id}/data/'
+
+        first = self.client.get(url)
+        second = self.client.get(url)
+        self.assertEqual((first.status_code, first['X-Chart-Cache']), (200, 'MISS'))
+        self.assertEqual(second['X-Chart-Cache'], 'HIT')
+        self.assertEqual(second.data['data'], first.data['data'])
+        # 配置相同的可视化共用缓存
+        self.assertEqual(self.client.get(f'/api/visualizations/{self.create_visualization("copy").id}/data/')
+                         ['X-Chart-Cache'], 'HIT')
+
+        DatasetStore.append_records(self.dataset, [{'name': 'd', 'value': 4}])
+        third = self.client.get(url)
+        self.assertEqual(third['X-Chart-Cache'], 'MISS')
+        self.assertNotEqual(third.data['data'], first.data['data'])
+        self.assertEqual(self.client.get(url)['X-Chart-Cache'], 'HIT')
+        stats = chart_data_cache.stats()
+        self.assertEqual((stats['entries'], stats['invalidations']), (1, 1))
+
+    def test_dashboard_streams_one_line_per_chart(self):
+        dashboard = Dashboard.objects.create(name='dashboard', created_by=self.user)
+        other = create_dataset(self.user, records=0)
+        DatasetStore.write_dataframe(other, pd.DataFrame({'name': ['x'], 'value': [9]}))
+        other.refresh_from_db()
+        visualizations = [self.create_visualization('first'), self.create_visualization('broken', other),
+                          self.create_visualization('second')]
+        for index, visualization in enumerate(visualizations):
+            DashboardItem.objects.create(dashboard=dashboard, visualization=visualization,
+                                         position_x=index, position_y=0, width=6, height=4)
+
+        prepare = VisualizationViewSet._prepare_chart_data
+
+        def prepare_or_fail(builder, df, config, chart_type, aggregated=False):
+            if 'x' in df['name'].tolist():
+                raise RuntimeError('chart failed')
+            return prepare(builder, df, config, chart_type, aggregated=aggregated)
+
+        with mock.patch.object(VisualizationViewSet, '_prepare_chart_data', prepare_or_fail):
+            response = self.client.get(f'/api/dashboards/{dashboard.id}/data/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['X-Dashboard-Charts'], '3')
+            lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
 
-# Create your tests here.
+        payloads = {payload['visualization_id']: payload for payload in map(json.loads, lines)}
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(set(payloads), {visualization.id for visualization in visualizations})
+        self.assertEqual(payloads[visualizations[1].id]['error'], '获取图表数据失败: chart failed')
+        for visualization in [visualizations[0], visualizations[2]]:
+            self.assertNotIn('error', payloads[visualization.id])
+            self.assertEqual(payloads[visualization.id]['chart_type'], '折线图')
+        self.assertEqual(payloads[visualizations[0].id]['data'], payloads[visualizations[2].id]['data'])
@@ -4,7 +4,8 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
-from django.db.models import Count
+from django.http import StreamingHttpResponse
+from django.db.models import Count, Prefetch
 from .models import ChartType, Visualization, Dashboard, DashboardItem
 from .serializers import (
     ChartTypeSerializer,
@@ -12,13 +13,46 @@ from .serializers import (
     DashboardSerializer,
     DashboardItemSerializer
 )
-from datasets.models import DataRecord
+from .batch import iter_dashboard_payloads
+from .cache import chart_data_cache, get_cache_key
+from .downsampling import bin_points, downsample_series, get_point_budget, sampling_info
+from .rollups import ensure_rollup, get_rollup_frame, get_visualization_spec, to_chart_frame
+from datasets.catalog import get_column_names
+from datasets.storage import DatasetStore
+import numpy as np
 import pandas as pd
 import json
 import math
 from django.db.models import Q
 from users.permissions import IsAdminOrAnalyst, IsCreatorOrAdmin
 
+# 各图表类型用到的字段配置项，读取数据集时只加载这些列
+CHART_FIELD_KEYS = {
+    '柱状图': ('xField', 'yField', 'group_by'),
+    '折线图': ('xField', 'yFields', 'yField', 'group_by'),
+    '饼图': ('nameField', 'valueField'),
+    '散点图': ('xField', 'yField', 'group_by'),
+    '雷达图': ('categoryField', 'indicatorFields'),
+    '地图': ('regionField', 'valueField'),
+}
+
+
+def get_chart_columns(config, chart_type_name):
+    """根据图表配置返回需要读取的列，未知图表类型返回 None 表示读取全部列"""
+    keys = CHART_FIELD_KEYS.get(chart_type_name)
+    if keys is None:
+        return None
+
+    columns = []
+    config = config or {}
+    for key in keys:
+        value = config.get(key)
+        fields = value if isinstance(value, (list, tuple)) else [value]
+        for field in fields:
+            if field and isinstance(field, str) and field not in columns:
+                columns.append(field)
+    return columns
+
 
 class IsAdminOrReadOnly(permissions.BasePermission):
     """管理员可以编辑，其他认证用户只能查看"""
@@ -43,7 +77,7 @@ class VisualizationViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         # 所有认证用户都可以看到所有可视化
-        return Visualization.objects.all()
+        return Visualization.objects.select_related('created_by', 'dataset', 'chart_type')
 
     def get_permissions(self):
         if self.request.method in ['GET', 'data']:
@@ -75,6 +109,19 @@ class VisualizationViewSet(viewsets.ModelViewSet):
         else:
             print(f"❌ 可视化活动记录创建失败")
 
+        self._build_rollup(visualization)
+
+    def perform_update(self, serializer):
+        visualization = serializer.save()
+        self._build_rollup(visualization)
+
+    def _build_rollup(self, visualization):
+        """保存可视化后预先构建图表汇总，失败时请求图表数据时再直接计算"""
+        try:
+            ensure_rollup(visualization)
+        except Exception as e:
+            print(f"⚠️ 图表汇总构建失败: {str(e)}")
+
     def perform_destroy(self, instance):
         # 检查权限：只有创建者或管理员可以删除
         if instance.created_by != self.request.user and self.request.user.role != 'admin':
@@ -88,41 +135,17 @@ class VisualizationViewSet(viewsets.ModelViewSet):
         """
         try:
             visualization = self.get_object()
-            dataset = visualization.dataset
-
-            # 获取数据集的所有记录
-            records = DataRecord.objects.filter(dataset=dataset)
-            if not records.exists():
-                print("❌ 数据集为空")
-                return Response({
-                    'visualization_id': visualization.id,
-                    'chart_type': visualization.chart_type.name,
-                    'data': {'categories': [], 'series': []},
-                    'config': visualization.configuration,
-                    'message': '数据集为空'
-                })
 
-            data = [record.data for record in records]
+            # 同一数据集版本上配置相同的图表直接使用缓存的结果
+            payload = self.get_cached_payload(visualization)
+            cache_status = 'HIT'
+            if payload is None:
+                payload, cache_status = self.build_chart_payload(visualization)
 
-            # 转换为DataFrame进行处理
-            df = pd.DataFrame(data)
-            print(f"✅ 原始数据形状: {df.shape}")
-            print(f"✅ 数据列: {df.columns.tolist()}")
-            print(f"✅ 数据前5行:\n{df.head()}")
-
-            # 根据可视化配置处理数据
-            config = visualization.configuration
-            chart_data = self._prepare_chart_data(df, config, visualization.chart_type)
-
-            print(f"✅ 生成的图表数据: {chart_data}")
-
-            return Response({
-                'visualization_id': visualization.id,
-                'chart_type': visualization.chart_type.name,
-                'data': chart_data,
-                'config': config,
-                'message': '数据加载成功'
-            })
+            response = Response(payload)
+            if cache_status:
+                response['X-Chart-Cache'] = cache_status
+            return response
 
         except Exception as e:
             print(f"❌ 获取图表数据错误: {str(e)}")
@@ -133,6 +156,63 @@ class VisualizationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    def _chart_payload(self, visualization, chart_data, message='数据加载成功'):
+        return {
+            'visualization_id': visualization.id,
+            'chart_type': visualization.chart_type.name,
+            'data': chart_data,
+            'config': visualization.configuration,
+            'message': message
+        }
+
+    def get_cached_payload(self, visualization):
+        """缓存中的图表数据响应内容，未命中时返回 None"""
+        chart_data = chart_data_cache.get(get_cache_key(visualization))
+        if chart_data is None:
+            return None
+        return self._chart_payload(visualization, chart_data)
+
+    def build_chart_payload(self, visualization, df=None):
+        """
+        生成图表数据并写入缓存，返回 (响应内容, 缓存状态)，数据集为空时缓存状态为 None
+
+        df 为调用方已经读取的数据集数据（包含图表用到的列，会被修改）时直接使用，
+        否则柱状图、饼图和地图使用预先汇总的分组结果，其余图表只读取图表配置用到的列。
+        """
+        cache_key = get_cache_key(visualization)
+        aggregated = False
+        if df is None:
+            spec = get_visualization_spec(visualization)
+            rollup = get_rollup_frame(visualization, spec) if spec else None
+            if rollup is not None:
+                df = to_chart_frame(rollup, visualization.chart_type.name, *spec)
+                aggregated = True
+            else:
+                columns = get_chart_columns(visualization.configuration, visualization.chart_type.name)
+                df = DatasetStore.read_dataframe(visualization.dataset, columns=columns)
+        if df.empty:
+            print("❌ 数据集为空")
+            return self._chart_payload(visualization, {'categories': [], 'series': []}, '数据集为空'), None
+
+        print(f"✅ 原始数据形状: {df.shape}")
+        print(f"✅ 数据列: {df.columns.tolist()}")
+        print(f"✅ 数据前5行:\n{df.head()}")
+
+        # 根据可视化配置处理数据
+        config = visualization.configuration
+        chart_data = self._prepare_chart_data(df, config, visualization.chart_type, aggregated=aggregated)
+
+        print(f"✅ 生成的图表数据: {chart_data}")
+        chart_data_cache.set(cache_key, chart_data)
+        return self._chart_payload(visualization, chart_data), 'MISS'
+
+    @action(detail=False, methods=['get'])
+    def cache_stats(self, request):
+        """图表数据缓存的命中统计，仅管理员可查看"""
+        if request.user.role != 'admin':
+            return Response({'error': '只有管理员可以查看缓存统计'}, status=status.HTTP_403_FORBIDDEN)
+        return Response(chart_data_cache.stats())
+
     @action(detail=False, methods=['get'])
     def dataset_columns(self, request):
         """根据数据集ID获取列名"""
@@ -147,24 +227,15 @@ class VisualizationViewSet(viewsets.ModelViewSet):
             if not dataset:
                 return Response({'columns': []})
 
-            # 复用数据处理模块的字段获取逻辑
-            records = dataset.datarecord_set.all()[:10]
-            if records:
-                all_columns = set()
-                for record in records:
-                    if record.data:
-                        all_columns.update(record.data.keys())
-                columns = list(all_columns)
-                return Response({'columns': columns})
-            else:
-                return Response({'columns': []})
+            # 复用数据集存储的字段获取逻辑
+            return Response({'columns': get_column_names(dataset)})
 
         except Exception as e:
             logger.error(f"Get dataset columns error: {str(e)}")
             return Response({'columns': []})
 
-    def _prepare_chart_data(self, df, config, chart_type):
-        """准备图表数据 - 修复版"""
+    def _prepare_chart_data(self, df, config, chart_type, aggregated=False):
+        """准备图表数据 - 修复版；aggregated 表示 df 是已经清理并按分组求和的图表汇总"""
         print(f"🔍 开始准备图表数据")
         print(f"🔍 图表类型: {chart_type.name}")
         print(f"🔍 配置: {config}")
@@ -174,8 +245,9 @@ class VisualizationViewSet(viewsets.ModelViewSet):
             return self._get_empty_chart_data(chart_type.name)
 
         try:
-            # 清理数据，处理NaN值
-            df = df.fillna(0)
+            # 清理数据，处理NaN值（图表汇总构建时已处理，其中的空值表示该组没有有效数值）
+            if not aggregated:
+                df = df.fillna(0)
             print(f"✅ 清理后数据形状: {df.shape}")
 
             if chart_type.name == '柱状图':
@@ -400,19 +472,11 @@ class VisualizationViewSet(viewsets.ModelViewSet):
             # 按地区字段分组并求和
             grouped_data = df_clean.groupby(region_field)[value_field].sum().reset_index()
 
-            # 转换为地图数据格式
-            map_data = []
-            for _, row in grouped_data.iterrows():
-                region_name = str(row[region_field])
-                value = float(row[value_field])
-
-                # 标准化地区名称
-                standardized_region = self._standardize_region_name(region_name)
-
-                map_data.append({
-                    'name': standardized_region,
-                    'value': value
-                })
+            # 转换为地图数据格式（按整行取值，与逐行读取时的类型一致），并标准化地区名称
+            rows = grouped_data.to_numpy()
+            names = [self._standardize_region_name(str(name)) for name in rows[:, 0].tolist()]
+            values = rows[:, 1].astype('float64').tolist()
+            map_data = [{'name': name, 'value': value} for name, value in zip(names, values)]
 
             print(f"✅ 地图数据生成成功，共 {len(map_data)} 个地区")
             print(f"✅ 地图数据示例: {map_data[:3]}")
@@ -480,23 +544,28 @@ class VisualizationViewSet(viewsets.ModelViewSet):
     def _prepare_simple_line_data(self, df, x_field, y_fields, config):
         """准备简单折线图数据（无分组）"""
         df_sorted = df.sort_values(by=x_field)
-        categories = df_sorted[x_field].dropna().unique().tolist()
+        # 每个分类取排序后的第一行
+        first_rows = df_sorted[df_sorted[x_field].notna()].drop_duplicates(subset=x_field)
+
+        # 分类数超过点数预算时按 LTTB 降采样
+        sampling = None
+        positions = downsample_series(
+            [first_rows[y_field] for y_field in y_fields if y_field in first_rows.columns],
+            get_point_budget('折线图', config)
+        )
+        if positions is not None:
+            sampling = sampling_info('lttb', len(first_rows), len(positions))
+            first_rows = first_rows.iloc[positions]
+        categories = first_rows[x_field].tolist()
 
         series = []
         line_styles = config.get('lineStyles', [])
 
         for i, y_field in enumerate(y_fields):
-            if y_field not in df_sorted.columns:
+            if y_field not in first_rows.columns:
                 continue
 
-            series_data = []
-            for category in categories:
-                value = df_sorted[df_sorted[x_field] == category][y_field]
-                if not value.empty:
-                    val = value.iloc[0]
-                    series_data.append(None if pd.isna(val) else float(val))
-                else:
-                    series_data.append(None)
+            series_data = [None if pd.isna(val) else float(val) for val in first_rows[y_field].tolist()]
 
             style_config = line_styles[i] if i < len(line_styles) else {}
 
@@ -513,10 +582,13 @@ class VisualizationViewSet(viewsets.ModelViewSet):
 
             series.append(series_item)
 
-        return {
+        chart_data = {
             'categories': categories,
             'series': series
         }
+        if sampling:
+            chart_data['sampling'] = sampling
+        return chart_data
 
     def _prepare_grouped_line_data(self, df, x_field, y_fields, group_by, config):
         """准备分组折线图数据"""
@@ -528,6 +600,15 @@ class VisualizationViewSet(viewsets.ModelViewSet):
             aggfunc='mean'
         )
 
+        # 分类数超过点数预算时按 LTTB 降采样，各分组系列挑选的分类取并集
+        sampling = None
+        positions = downsample_series(
+            [pivot_data[column] for column in pivot_data.columns], get_point_budget('折线图', config)
+        )
+        if positions is not None:
+            sampling = sampling_info('lttb', len(pivot_data), len(positions))
+            pivot_data = pivot_data.iloc[positions]
+
         categories = pivot_data.index.tolist()
         series = []
 
@@ -558,10 +639,13 @@ class VisualizationViewSet(viewsets.ModelViewSet):
 
                 series.append(series_item)
 
-        return {
+        chart_data = {
             'categories': categories,
             'series': series
         }
+        if sampling:
+            chart_data['sampling'] = sampling
+        return chart_data
 
     def _get_default_color(self, index):
         """获取默认颜色"""
@@ -608,12 +692,9 @@ class VisualizationViewSet(viewsets.ModelViewSet):
             # 按名称字段分组并求和
             grouped_data = df_clean.groupby(name_field)[value_field].sum()
 
-            data = []
-            for name, value in grouped_data.items():
-                data.append({
-                    'name': str(name),
-                    'value': float(value)
-                })
+            names = [str(name) for name in grouped_data.index.tolist()]
+            values = grouped_data.to_numpy(dtype='float64').tolist()
+            data = [{'name': name, 'value': value} for name, value in zip(names, values)]
 
             print(f"✅ 饼图数据生成成功，共 {len(data)} 个数据项")
             print(f"✅ 饼图数据示例: {data[:3]}")  # 打印前3个数据项
@@ -651,35 +732,42 @@ class VisualizationViewSet(viewsets.ModelViewSet):
             df[x_field] = pd.to_numeric(df[x_field], errors='coerce')
             df[y_field] = pd.to_numeric(df[y_field], errors='coerce')
 
-            # 清理数据
+            # 清理数据，空值和无穷大（例如文本 "inf"）都无法绘制
             df_clean = df.dropna(subset=[x_field, y_field])
+            df_clean = df_clean[np.isfinite(df_clean[x_field]) & np.isfinite(df_clean[y_field])]
 
             if df_clean.empty:
                 print("❌ 散点图清理后数据为空")
                 return {'data': [], 'xField': x_field, 'yField': y_field}
 
+            # 点数超过预算时按网格分箱，每个网格一个点，第三维为点数
+            budget = get_point_budget('散点图', config)
+            if len(df_clean) > budget:
+                data = bin_points(df_clean[x_field], df_clean[y_field], budget)
+                print(f"✅ 散点图分箱完成 - 原始点数: {len(df_clean)}, 分箱后: {len(data)}")
+                return {
+                    'data': data,
+                    'xField': x_field,
+                    'yField': y_field,
+                    'sampling': sampling_info('grid', len(df_clean), len(data))
+                }
+
             # 生成散点图数据格式: [[x1, y1], [x2, y2], ...]
-            data = []
-            for _, row in df_clean.iterrows():
-                x_val = float(row[x_field])
-                y_val = float(row[y_field])
-
-                # 如果有分组字段，可以作为第三维数据
-                point = [x_val, y_val]
-                if 'group_by' in config and config['group_by']:
-                    group_field = config['group_by']
-                    if group_field in df_clean.columns:
-                        # 使用分组作为第三维数据（用于点的大小或颜色）
-                        try:
-                            group_value = float(hash(str(row[group_field])) % 10 + 1)
-                            point.append(group_value)
-                        except:
-                            point.append(1)
+            x_values = df_clean[x_field].to_numpy(dtype='float64')
+            y_values = df_clean[y_field].to_numpy(dtype='float64')
+            if 'group_by' in config and config['group_by']:
+                group_field = config['group_by']
+                if group_field in df_clean.columns:
+                    # 使用分组作为第三维数据（用于点的大小或颜色），按整行取值与逐行读取时的类型一致
+                    group_values = df_clean.to_numpy()[:, df_clean.columns.get_loc(group_field)]
+                    codes, groups = pd.factorize(group_values, use_na_sentinel=False)
+                    sizes = np.array([float(hash(str(group)) % 10 + 1) for group in groups])[codes]
+                    data = np.column_stack([x_values, y_values, sizes]).tolist()
                 else:
-                    # 如果没有分组，默认大小为1
-                    point.append(1)
-
-                data.append(point)
+                    data = np.column_stack([x_values, y_values]).tolist()
+            else:
+                # 如果没有分组，默认大小为1
+                data = [[x_val, y_val, 1] for x_val, y_val in zip(x_values.tolist(), y_values.tolist())]
 
             print(f"✅ 散点图数据生成成功 - 点数: {len(data)}")
             print(f"✅ 数据示例: {data[:3]}")  # 打印前3个点
@@ -730,15 +818,12 @@ class VisualizationViewSet(viewsets.ModelViewSet):
 
             print(f"✅ 清理后数据形状: {df_clean.shape}")
 
+            # 每个类别取第一行
+            first_rows = df_clean.drop_duplicates(subset=category_field)
+            indicator_values = first_rows[indicator_fields].to_numpy(dtype='float64')
+
             # 关键修复：计算统一的最大值
-            all_values = []
-            for field in indicator_fields:
-                for category in df_clean[category_field].unique():
-                    category_data = df_clean[df_clean[category_field] == category]
-                    if len(category_data) > 0:
-                        row = category_data.iloc[0]
-                        value = float(row[field])
-                        all_values.append(value)
+            all_values = indicator_values.ravel().tolist()
 
             if all_values:
                 actual_max = max(all_values)
@@ -760,19 +845,10 @@ class VisualizationViewSet(viewsets.ModelViewSet):
                 })
 
             # 为每个类别创建系列数据
-            series_data = []
-            categories = df_clean[category_field].unique()
-
-            for category in categories:
-                category_data = df_clean[df_clean[category_field] == category]
-                if len(category_data) > 0:
-                    row = category_data.iloc[0]
-                    values = [float(row[field]) for field in indicator_fields]
-
-                    series_data.append({
-                        'name': str(category),
-                        'value': values
-                    })
+            series_data = [
+                {'name': str(category), 'value': values}
+                for category, values in zip(first_rows[category_field].tolist(), indicator_values.tolist())
+            ]
 
             print(f"✅ 雷达图数据生成成功")
             print(f"   - 统一最大值: {unified_max}")
@@ -796,7 +872,10 @@ class DashboardViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Dashboard.objects.all()
+        return Dashboard.objects.select_related('created_by').prefetch_related(
+            'visualizations',
+            Prefetch('dashboarditem_set', queryset=DashboardItem.objects.select_related('visualization'))
+        )
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve', 'data']:
@@ -827,83 +906,59 @@ class DashboardViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def data(self, request, pk=None):
         """
-        获取可视化图表数据 - 修复版
+        一次请求获取看板中全部图表的数据
+
+        每个数据集只读取一次（读取各图表用到的列的并集），各图表在线程池中并发计算，
+        以 NDJSON 流式返回：每完成一个图表输出一行，内容与可视化的 data 接口相同，失败的图表输出 error。
+        看板布局保存在前端时可以用 ?visualizations=1,2,3 指定要加载的可视化。
         """
+        dashboard = self.get_object()
         try:
-            visualization = self.get_object()
-            dataset = visualization.dataset
+            visualizations = self._get_dashboard_visualizations(dashboard, request.query_params.get('visualizations'))
+        except ValueError:
+            return Response({'error': 'visualizations 参数应为逗号分隔的可视化ID'}, status=status.HTTP_400_BAD_REQUEST)
+
+        builder = VisualizationViewSet()
+        payloads = iter_dashboard_payloads(
+            visualizations,
+            builder,
+            lambda visualization: get_chart_columns(visualization.configuration, visualization.chart_type.name)
+        )
 
-            # 获取数据集的所有记录
-            records = DataRecord.objects.filter(dataset=dataset)
-            if not records.exists():
-                print("❌ 数据集为空")
-                return Response({
+        def stream():
+            for visualization, payload, error in payloads:
+                if error is None:
+                    try:
+                        yield json.dumps(payload, ensure_ascii=False, allow_nan=False, default=str) + '\n'
+                        continue
+                    except ValueError as e:
+                        error = e
+                print(f"❌ 看板图表数据错误 (可视化 {visualization.id}): {str(error)}")
+                yield json.dumps({
                     'visualization_id': visualization.id,
                     'chart_type': visualization.chart_type.name,
-                    'data': {'categories': [], 'series': []},
-                    'config': visualization.configuration,
-                    'message': '数据集为空'
-                })
-
-            data = [record.data for record in records]
-
-            # 转换为DataFrame进行处理
-            df = pd.DataFrame(data)
-            print(f"✅ 原始数据形状: {df.shape}")
-            print(f"✅ 数据列: {df.columns.tolist()}")
-            print(f"✅ 数据前5行:\n{df.head()}")
-
-            # 根据可视化配置处理数据
-            config = visualization.configuration
-            chart_data = self._prepare_chart_data(df, config, visualization.chart_type)
-
-            print(f"✅ 生成的图表数据: {chart_data}")
-
-            # 如果是饼图，特别打印数据格式
-            if visualization.chart_type.name == '饼图':
-                print(f"🎯 饼图数据详情:")
-                print(f"   - 数据类型: {type(chart_data)}")
-                print(f"   - 数据键: {chart_data.keys() if hasattr(chart_data, 'keys') else '无键'}")
-                if 'data' in chart_data:
-                    print(f"   - data字段类型: {type(chart_data['data'])}")
-                    print(
-                        f"   - data字段长度: {len(chart_data['data']) if isinstance(chart_data['data'], list) else '非列表'}")
-                    if isinstance(chart_data['data'], list) and chart_data['data']:
-                        print(f"   - 第一个数据项: {chart_data['data'][0]}")
-                        print(f"   - 第一个数据项类型: {type(chart_data['data'][0])}")
-
-            return Response({
-                'visualization_id': visualization.id,
-                'chart_type': visualization.chart_type.name,
-                'data': chart_data,
-                'config': config,
-                'message': '数据加载成功'
-            })
-
-        except Exception as e:
-            print(f"❌ 获取图表数据错误: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return Response(
-                {'error': f'获取图表数据失败: {str(e)}'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-    def _prepare_chart_data(self, df, config, chart_type):
-        """准备图表数据（简化版，实际应该调用Visualization的相应方法）"""
-        # 这里简化实现，实际项目中应该复用Visualization中的数据处理逻辑
-        if chart_type.name == '柱状图':
-            x_field = config.get('xField', '')
-            y_field = config.get('yField', '')
-
-            if x_field and y_field in df.columns:
-                grouped = df.groupby(x_field)[y_field].sum()
-                return {
-                    'categories': grouped.index.tolist(),
-                    'series': [{'name': y_field, 'data': grouped.tolist()}]
-                }
-
-        return {'data': df.to_dict('records')}
+                    'error': f'获取图表数据失败: {str(error)}'
+                }, ensure_ascii=False) + '\n'
+
+        response = StreamingHttpResponse(stream(), content_type='application/x-ndjson; charset=utf-8')
+        response['X-Dashboard-Charts'] = str(len(visualizations))
+        return response
+
+    def _get_dashboard_visualizations(self, dashboard, requested_ids=None):
+        """看板中的可视化（按布局位置排序、去重），或按请求指定的ID顺序"""
+        queryset = Visualization.objects.select_related('dataset', 'chart_type')
+        if requested_ids:
+            ids = [int(value) for value in requested_ids.split(',') if value.strip()]
+            found = queryset.in_bulk(ids)
+            return [found[vid] for vid in dict.fromkeys(ids) if vid in found]
+
+        items = DashboardItem.objects.filter(dashboard=dashboard).select_related(
+            'visualization__dataset', 'visualization__chart_type'
+        ).order_by('position_y', 'position_x', 'id')
+        visualizations = {}
+        for item in items:
+            visualizations.setdefault(item.visualization_id, item.visualization)
+        return list(visualizations.values())
 
     def _create_dashboard_activity(self, dashboard, action):
         """创建看板活动记录的辅助方法"""
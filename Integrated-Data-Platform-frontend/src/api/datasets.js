@@ -20,11 +20,15 @@ export const datasetsAPI = {
   // 新增：数据集预览API
   getDatasetPreview: (id, params = {}) => api.get(`/datasets/${id}/preview/`, { params }),
 
+  // 数据集数据（按 cursor 键集分页，params: cursor、page_size、columns）
+  getDatasetData: (id, params = {}) => api.get(`/datasets/${id}/data/`, { params }),
+
   // 数据记录API（带分页和搜索）
   getDataRecords: (params = {}) => api.get('/data-records/', { params }),
   createDataRecord: (data) => api.post('/data-records/', data),
   bulkCreateDataRecords: (data) => api.post('/data-records/bulk_create/', data),
-  deleteDataRecord: (id) => api.delete(`/data-records/${id}/`),
+  // params.dataset 为记录所属数据集，列式存储的数据集不支持删除单条记录
+  deleteDataRecord: (id, params = {}) => api.delete(`/data-records/${id}/`, { params }),
 
   // 新增：导出API
   exportDatasetData: (id, params = {}) => {
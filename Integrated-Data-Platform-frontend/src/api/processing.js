@@ -9,6 +9,10 @@ export const processingAPI = {
   updatePipeline: (id, data) => api.put(`/processing-pipelines/${id}/`, data),
   deletePipeline: (id) => api.delete(`/processing-pipelines/${id}/`),
   executePipeline: (id) => api.post(`/processing-pipelines/${id}/execute/`),
+  explainPipeline: (id, params) => api.get(`/processing-pipelines/${id}/explain/`, { params }),
+  getPipelineRuns: (id) => api.get(`/processing-pipelines/${id}/runs/`),
+  getPipelineRun: (runId) => api.get(`/pipeline-runs/${runId}/`),
+  cancelPipelineRun: (runId) => api.post(`/pipeline-runs/${runId}/cancel/`),
   getDatasetColumns: (id) => api.get(`/processing-pipelines/${id}/dataset_columns/`),
   getDatasetColumnsById: (datasetId) => api.get(`/processing-pipelines/dataset_columns_by_id/?dataset_id=${datasetId}`),
 
@@ -13,6 +13,7 @@ export const visualizationAPI = {
   updateVisualization: (id, data) => api.put(`/visualizations/${id}/`, data),
   deleteVisualization: (id) => api.delete(`/visualizations/${id}/`),
   getVisualizationData: (id) => api.get(`/visualizations/${id}/data/`),
+  getChartCacheStats: () => api.get('/visualizations/cache_stats/'),
 
   // 看板管理
   getDashboards: () => api.get('/dashboards/'),
@@ -44,6 +45,28 @@ export const visualizationAPI = {
   },
   deleteDashboard: (id) => api.delete(`/dashboards/${id}/`),
   getDashboardData: (id) => api.get(`/dashboards/${id}/data/`),
+  // 批量获取看板全部图表数据：后端以 NDJSON 流式返回，每完成一个图表调用一次 onChart
+  streamDashboardData: async (id, onChart, visualizationIds = null) => {
+    const query = visualizationIds && visualizationIds.length ? `?visualizations=${visualizationIds.join(',')}` : ''
+    const response = await fetch(`${api.defaults.baseURL}/dashboards/${id}/data/${query}`, { credentials: 'include' })
+    if (!response.ok) {
+      throw new Error(`获取看板数据失败: ${response.status}`)
+    }
+    const reader = response.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ''
+    while (true) {
+      const { done, value } = await reader.read()
+      buffer += decoder.decode(value || new Uint8Array(), { stream: !done })
+      const lines = buffer.split('\n')
+      buffer = lines.pop()
+      lines.filter(line => line.trim()).forEach(line => onChart(JSON.parse(line)))
+      if (done) break
+    }
+    if (buffer.trim()) {
+      onChart(JSON.parse(buffer))
+    }
+  },
 
   // 数据集字段
   getDatasetColumns: (datasetId) => api.get(`/visualizations/dataset_columns/?dataset_id=${datasetId}`),